@@ -4,31 +4,73 @@ import subprocess
 import sys
 import threading
 import datetime
-import appdirs
-import pyotp
 import argparse
 import base64
 import hashlib
+import collections
+import functools
+import concurrent.futures
+import urllib.parse
 from configparser import ConfigParser
-from time import sleep
-
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-
-from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                           QLabel, QPushButton, QLineEdit, QTabWidget, QFrame, QTextEdit, 
-                           QProgressBar, QComboBox, QMessageBox, QGridLayout, QSplitter,
-                           QStackedWidget, QFileDialog)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QSize
-from PyQt5.QtGui import QFont, QIcon, QPixmap, QColor, QPalette
-
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from time import sleep, perf_counter
+
+# Reference point for startup metrics such as time-to-first-paint
+STARTUP_TIME = perf_counter()
+
+from offline_install import (REQUIREMENTS_PATH, WHEELHOUSE_MANIFEST, BUNDLED_DRIVER_NAME,
+                             install_requirements, file_sha256)
+
+try:
+    import appdirs
+    import pyotp
+    
+    from cryptography.fernet import Fernet
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+    
+    from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
+                               QLabel, QPushButton, QLineEdit, QTabWidget, QFrame, QTextEdit, 
+                               QProgressBar, QComboBox, QMessageBox, QGridLayout, QSplitter,
+                               QStackedWidget, QFileDialog, QListView, QAbstractItemView, QCheckBox)
+    from PyQt5.QtCore import (Qt, QObject, QRunnable, QThreadPool, pyqtSignal, QTimer, QSize,
+                              QAbstractListModel, QModelIndex)
+    from PyQt5.QtGui import QFont, QIcon, QPixmap, QColor, QPalette
+    
+    from selenium import webdriver
+    from webdriver_manager.chrome import ChromeDriverManager
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    
+    from selenium.common.exceptions import (NoSuchElementException, StaleElementReferenceException,
+                                            TimeoutException)
+except ImportError as e:
+    # A fresh machine has none of these yet; "install" must still work there
+    if __name__ == "__main__" and 'install' in sys.argv[1:]:
+        from offline_install import main as install_main
+        print(f"Missing dependency ({e.name}); running the standalone installer")
+        sys.exit(install_main(sys.argv[1:]))
+    raise
+
+from telemetry import LoginTrace, TelemetryStore, CommandRecorder, print_stats
+from session_probe import SessionStore, cookie_params
+from http_cache import ApiCache, load_cache_config, print_cache_stats
+from keepalive import KeepAliveScheduler, keepalive_enabled, set_keepalive_enabled
+from login_orchestrator import (prepare_login, fresh_totp_code, shared_event_loop, load_prewarm_config,
+                                preconnect)
+from browser_process import (BrowserMonitor, ProcessRegistry, ResourceGovernor, session_root_pids,
+                             expand_process_tree, kill_process_tree, format_reap_report)
+
+# Startup profiling markers (only active in builds made with --profile-startup)
+STARTUP_PROFILE_MODULE = "_autobrightspace_startup_profile"
+
+def startup_mark(name):
+    """Record the end of a startup phase when the profiler hook is present"""
+    profiler = sys.modules.get(STARTUP_PROFILE_MODULE)
+    if profiler:
+        profiler.mark(name)
+
+startup_mark("imports")
 
 # App constants
 APP_NAME = "AutoBrightspace"
@@ -40,15 +82,36 @@ ICON_PATH_WINDOWS = os.path.join(os.getcwd(), 'icon', 'AutoBrightspace.ico')
 ICON_PATH_MAC = os.path.join(os.getcwd(), 'icon', 'AutoBrightspace.icns')
 ICON_PATH_LINUX = os.path.join(os.getcwd(), 'icon', 'AutoBrightspace.png')
 
-# List of dependencies to check and install
-REQUIRED_MODULES = ['pyotp', 'selenium', 'appdirs', 'pyinstaller', 'webdriver-manager', 'pillow', 'PyQt5', 'cryptography']
+# ChromeDriver installed from an offline wheelhouse
+DRIVERS_DIR = os.path.join(CONFIG_DIR, 'drivers')
+BUNDLED_DRIVER_PATH = os.path.join(DRIVERS_DIR, BUNDLED_DRIVER_NAME)
+
+STARTUP_PROFILE_DIR = (os.environ.get('AUTOBRIGHTSPACE_STARTUP_PROFILE_DIR')
+                       or os.path.join(CONFIG_DIR, 'startup_profiles'))
+
+# Browser sessions we spawned, so a later start can reap leftovers of a crash
+PROCESS_REGISTRY = ProcessRegistry(os.path.join(CONFIG_DIR, 'browser_sessions.json'))
+
+# Login timings and outcomes for the "stats" command
+TELEMETRY = TelemetryStore(os.path.join(CONFIG_DIR, 'telemetry.sqlite3'))
 
 if not os.path.exists(CONFIG_DIR):
     os.makedirs(CONFIG_DIR)
 
+def startup_profile_finish(last_phase=None):
+    """Write the startup timeline when the profiler hook is present"""
+    profiler = sys.modules.get(STARTUP_PROFILE_MODULE)
+    if profiler:
+        if last_phase:
+            profiler.mark(last_phase)
+        profiler.finish(STARTUP_PROFILE_DIR)
+
 # Encryption helper functions
+@functools.lru_cache(maxsize=1)
 def get_encryption_key():
     """Generate or retrieve encryption key based on machine-specific data"""
+    # Cached: the PBKDF2 derivation is deliberately slow and the inputs never
+    # change within a process, so derive once instead of once per field
     # Create a unique key based on machine characteristics
     machine_id = f"{platform.node()}{platform.machine()}{platform.processor()}"
     # Use a fixed salt for consistency across runs
@@ -104,29 +167,384 @@ def is_encrypted(data):
     except:
         return False
 
-class LoginWorker(QThread):
-    """Worker thread for handling login process"""
+# Encrypted SSO cookies of the last successful login
+SESSION_STORE = SessionStore(os.path.join(CONFIG_DIR, 'session.enc'), encrypt_data, decrypt_data)
+API_CACHE_PATH = os.path.join(CONFIG_DIR, 'api-cache.sqlite3')
+
+def open_api_cache():
+    """The API response cache per the [ApiCache] section of config.ini, or None if disabled"""
+    enabled, max_bytes, min_fresh = load_cache_config(CONFIG_PATH)
+    return ApiCache(API_CACHE_PATH, max_bytes, min_fresh) if enabled else None
+
+def create_wheelhouse(output_dir, archive=False):
+    """Download every wheel from requirements.txt plus a pinned ChromeDriver"""
+    import json
+    import shutil
+    
+    output_dir = os.path.abspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Creating wheelhouse in {output_dir}...")
+    
+    try:
+        subprocess.check_call([sys.executable, "-m", "pip", "download",
+                               "--only-binary=:all:", "-d", output_dir,
+                               "-r", REQUIREMENTS_PATH])
+    except subprocess.CalledProcessError as e:
+        print(f"✗ Failed to download wheels: {e}")
+        return False
+    shutil.copy2(REQUIREMENTS_PATH, os.path.join(output_dir, 'requirements.txt'))
+    print("✓ Downloaded wheels")
+    
+    manifest = {
+        'platform': platform.system().lower(),
+        'machine': platform.machine(),
+        'python': platform.python_version(),
+        'chromedriver': None,
+        'files': {}
+    }
+    
+    # Pin the ChromeDriver matching the locally installed Chrome
+    try:
+        driver_path = ChromeDriverManager().install()
+        driver_dir = os.path.join(output_dir, 'chromedriver')
+        os.makedirs(driver_dir, exist_ok=True)
+        bundled = os.path.join(driver_dir, os.path.basename(driver_path))
+        shutil.copy2(driver_path, bundled)
+        
+        version = subprocess.run([driver_path, "--version"], capture_output=True,
+                                 text=True).stdout.strip()
+        manifest['chromedriver'] = {
+            'path': os.path.relpath(bundled, output_dir),
+            'version': version,
+            'platform': platform.system().lower()
+        }
+        print(f"✓ Bundled {version or 'ChromeDriver'}")
+    except Exception as e:
+        print(f"⚠ Could not bundle ChromeDriver: {e}")
+    
+    # Checked by the installer before pip sees any of them
+    for root, _, files in os.walk(output_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, output_dir)
+            if relative != WHEELHOUSE_MANIFEST:
+                manifest['files'][relative] = file_sha256(path)
+    
+    with open(os.path.join(output_dir, WHEELHOUSE_MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✓ Wrote manifest: {WHEELHOUSE_MANIFEST}")
+    
+    if archive:
+        archive_path = shutil.make_archive(output_dir, 'zip',
+                                           os.path.dirname(output_dir), os.path.basename(output_dir))
+        print(f"✓ Created archive: {archive_path}")
+    
+    return True
+
+def load_build_tool():
+    """Import the shared build engine (build_tool.py) next to this script"""
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    if project_dir not in sys.path:
+        sys.path.insert(0, project_dir)
+    import build_tool
+    return build_tool
+
+# Scripted form filling: one WebDriver round trip instead of one per element
+FILL_FORM_SCRIPT = """
+const fields = arguments[0], submit = arguments[1];
+const find = (by, locator) => by === 'id' ? document.getElementById(locator)
+                                          : document.getElementsByName(locator)[0];
+const setValue = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set;
+const result = {filled: [], missing: [], submitted: false};
+for (const [by, locator, value] of fields) {
+    const input = find(by, locator);
+    if (!input) { result.missing.push(locator); continue; }
+    input.focus();
+    setValue.call(input, value);
+    for (const type of ['input', 'change', 'keyup']) {
+        input.dispatchEvent(new Event(type, {bubbles: true}));
+    }
+    (input.value === value ? result.filled : result.missing).push(locator);
+}
+const button = find(submit[0], submit[1]);
+if (!button) { result.missing.push(submit[1]); }
+if (result.missing.length) { return result; }
+// Click after returning so the navigation cannot race the script response
+setTimeout(() => button.click(), 0);
+result.submitted = true;
+return result;
+"""
+
+def fill_form(driver, fields, submit, log=print):
+    """Fill inputs and click submit in one execute_script call
+    
+    fields is a list of (By, locator, value) and submit a (By, locator) pair;
+    only By.ID and By.NAME are supported. Falls back to per-element commands
+    if the script cannot fill and verify every field. Returns the number of
+    WebDriver round trips saved.
+    """
+    per_element_round_trips = 2 * len(fields) + 2  # find + send_keys each, find + click
+    try:
+        result = driver.execute_script(FILL_FORM_SCRIPT, [list(field) for field in fields], list(submit))
+        if result and result.get('submitted'):
+            return per_element_round_trips - 1
+        log(f"⚠ Scripted form fill incomplete (missing: {', '.join(result.get('missing', [])) if result else '?'}), "
+            f"using per-element input")
+    except Exception as e:
+        log(f"⚠ Scripted form fill failed ({str(e).splitlines()[0] if str(e) else type(e).__name__}), "
+            f"using per-element input")
+    
+    for by, locator, value in fields:
+        element = driver.find_element(by, locator)
+        element.clear()  # The script may have filled it already
+        element.send_keys(value)
+    driver.find_element(*submit).click()
+    return 0
+
+def visited_hosts(current_url):
+    """Hosts the login flow has already connected to once it is on current_url"""
+    host = urllib.parse.urlparse(current_url).hostname or ''
+    return {'brightspace.universiteitleiden.nl', host}
+
+def restore_session(prepared, set_cookies, log=print):
+    """Give the browser a stored session that passed its probe; True if it was injected"""
+    probe = prepared.session
+    if not probe:
+        return False
+    log(probe.describe())
+    if not probe.valid:
+        return False
+    try:
+        set_cookies(cookie_params(probe.cookies))
+        return True
+    except Exception as e:
+        log(f"⚠ Could not restore the stored session: {str(e).splitlines()[0] if str(e) else type(e).__name__}")
+        return False
+
+def save_session(get_cookies, log=print):
+    """Store the browser's SSO cookies for the next login's probe"""
+    try:
+        saved = SESSION_STORE.save(get_cookies())
+    except Exception as e:
+        log(f"⚠ Could not store the session: {str(e).splitlines()[0] if str(e) else type(e).__name__}")
+        return
+    if saved:
+        log(f"Stored {saved} session cookies for the next login")
+
+# Shared task execution for the GUI
+class CancellationToken:
+    """Thread-safe cancellation flag handed to every task"""
+    
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+    
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+    
+    def cancel(self):
+        """Mark the token cancelled and run the registered callbacks once"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+    
+    def on_cancel(self, callback):
+        """Run callback on cancellation (immediately if already cancelled)"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+    
+    def wait(self, timeout=None):
+        """Sleep until cancelled or the timeout passes; True if cancelled"""
+        return self._event.wait(timeout)
+
+class Task(QObject):
+    """Unit of work run on the shared TaskExecutor"""
+    queue = 'background'
+    
+    def __init__(self, key=None):
+        super().__init__()
+        self.key = key or self.__class__.__name__
+        self.token = CancellationToken()
+        self.state = 'pending'
+    
+    def is_active(self):
+        return self.state in ('pending', 'running')
+    
+    def cancel(self):
+        self.token.cancel()
+    
+    def run(self):
+        """Do the work; subclasses override this"""
+        pass
+
+class TaskRunnable(QRunnable):
+    """Adapter that runs a Task on a QThreadPool thread"""
+    
+    def __init__(self, task, done):
+        super().__init__()
+        self.task = task
+        self.done = done
+    
+    def run(self):
+        try:
+            if not self.task.token.cancelled:
+                self.task.run()
+        except Exception as e:
+            print(f"Task {self.task.key} failed: {e}")
+        finally:
+            self.done(self.task)
+
+class TaskExecutor(QObject):
+    """Run tasks on one thread pool through named queues with bounded concurrency"""
+    status_changed = pyqtSignal(str)
+    task_finished = pyqtSignal(object)
+    task_done = pyqtSignal(object)  # Internal: marshals completion to the GUI thread
+    
+    # Installs, builds and icon conversion share the Python environment, so
+    # they run one at a time; a single browser session at a time
+    QUEUE_LIMITS = {'login': 1, 'setup': 1, 'background': 2}
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(sum(self.QUEUE_LIMITS.values()))
+        self.pending = {queue: collections.deque() for queue in self.QUEUE_LIMITS}
+        self.running = {queue: [] for queue in self.QUEUE_LIMITS}
+        self.task_done.connect(self._on_task_done)
+    
+    def find(self, key):
+        """Return the in-flight task with this key, if any"""
+        for queue in self.QUEUE_LIMITS:
+            for task in list(self.running[queue]) + list(self.pending[queue]):
+                if task.key == key:
+                    return task
+        return None
+    
+    def submit(self, task):
+        """Queue a task; returns False if an identical task is already in flight"""
+        if self.find(task.key):
+            return False
+        self.pending[task.queue].append(task)
+        self._dispatch(task.queue)
+        self._emit_status()
+        return True
+    
+    def cancel(self, key):
+        """Cancel the in-flight task with this key"""
+        task = self.find(key)
+        if not task:
+            return False
+        task.cancel()
+        if task in self.pending[task.queue]:
+            self.pending[task.queue].remove(task)
+            task.state = 'cancelled'
+            self.task_finished.emit(task)
+            self._emit_status()
+        return True
+    
+    def cancel_all(self):
+        """Cancel every queued and running task"""
+        for queue in self.QUEUE_LIMITS:
+            for task in list(self.running[queue]) + list(self.pending[queue]):
+                self.cancel(task.key)
+    
+    def wait_for_done(self, msecs=-1):
+        """Block until the pool is idle; False if the timeout expired first"""
+        return self.pool.waitForDone(msecs)
+    
+    def _dispatch(self, queue):
+        while self.pending[queue] and len(self.running[queue]) < self.QUEUE_LIMITS[queue]:
+            task = self.pending[queue].popleft()
+            task.state = 'running'
+            self.running[queue].append(task)
+            self.pool.start(TaskRunnable(task, self.task_done.emit))
+    
+    def _on_task_done(self, task):
+        if task in self.running[task.queue]:
+            self.running[task.queue].remove(task)
+        task.state = 'cancelled' if task.token.cancelled else 'done'
+        self.task_finished.emit(task)
+        self._dispatch(task.queue)
+        self._emit_status()
+    
+    def status_text(self):
+        """Summarise the queues, e.g. 'setup: 1 running, 1 queued'"""
+        parts = []
+        for queue in self.QUEUE_LIMITS:
+            running, pending = len(self.running[queue]), len(self.pending[queue])
+            if running or pending:
+                text = f"{queue}: {running} running"
+                if pending:
+                    text += f", {pending} queued"
+                parts.append(text)
+        return " · ".join(parts) or "Idle"
+    
+    def _emit_status(self):
+        self.status_changed.emit(self.status_text())
+
+class LoginCancelled(BaseException):
+    """Raised inside a login flow once the user has stopped it"""
+    # Derives from BaseException so the flow's broad "except Exception"
+    # fallbacks cannot swallow a cancellation
+
+class LoginWorker(Task):
+    """Task handling the login process and browser session"""
+    queue = 'login'
     status_update = pyqtSignal(str, str)
     progress_update = pyqtSignal(float)
     log_message = pyqtSignal(str)
     process_finished = pyqtSignal()
     
+    # Seconds between checks of a wait condition (selenium's default)
+    POLL_INTERVAL = 0.5
+    # Seconds chromedriver gets to shut down cleanly before it is killed
+    QUIT_TIMEOUT = 2.0
+    
     def __init__(self, username, password, secret_key):
-        super().__init__()
+        super().__init__('login')
         self.username = username
         self.password = password
         self.secret_key = secret_key
         self.driver = None
-        self.is_running = True
+        self.prepared = None
+        self.browser_monitor = None
+        self.session_pids = []
+        self.registry_id = None
+        self.trace = LoginTrace('gui')
+        self.commands = CommandRecorder()
+        self.cancel_requested = None
+        self.finished_emitted = False
+        self.teardown_lock = threading.Lock()
+        self.token.on_cancel(self._on_cancel)
         
     def _create_chrome_driver(self):
         """Create Chrome driver with robust error handling and multiple fallback methods"""
         import glob
         
+        # Method 0: ChromeDriver installed from an offline wheelhouse
+        if os.path.exists(BUNDLED_DRIVER_PATH) and os.access(BUNDLED_DRIVER_PATH, os.X_OK):
+            try:
+                self.log_message.emit(f"Using bundled ChromeDriver: {BUNDLED_DRIVER_PATH}")
+                return webdriver.Chrome(service=chrome_service(BUNDLED_DRIVER_PATH))
+            except Exception as e:
+                self.log_message.emit(f"Bundled ChromeDriver failed: {str(e)}")
+        
         # Method 1: Try webdriver-manager
         try:
             self.log_message.emit("Attempting to download ChromeDriver...")
-            service = Service(ChromeDriverManager().install())
+            service = chrome_service(ChromeDriverManager().install())
             
             # Verify the downloaded driver is actually executable
             driver_path = service.path
@@ -154,7 +572,7 @@ class LoginWorker(QThread):
                 for driver_path in potential_drivers:
                     if os.path.exists(driver_path) and os.access(driver_path, os.X_OK):
                         self.log_message.emit(f"Found working ChromeDriver: {driver_path}")
-                        service = Service(driver_path)
+                        service = chrome_service(driver_path)
                         return webdriver.Chrome(service=service)
                     elif os.path.exists(driver_path):
                         # Make it executable if it exists but isn't executable
@@ -162,7 +580,7 @@ class LoginWorker(QThread):
                             os.chmod(driver_path, 0o755)
                             if os.access(driver_path, os.X_OK):
                                 self.log_message.emit(f"Fixed and using ChromeDriver: {driver_path}")
-                                service = Service(driver_path)
+                                service = chrome_service(driver_path)
                                 return webdriver.Chrome(service=service)
                         except Exception as e:
                             self.log_message.emit(f"Could not fix permissions: {e}")
@@ -175,7 +593,7 @@ class LoginWorker(QThread):
             if result.returncode == 0:
                 system_driver = result.stdout.strip()
                 self.log_message.emit(f"Using system ChromeDriver: {system_driver}")
-                service = Service(system_driver)
+                service = chrome_service(system_driver)
                 return webdriver.Chrome(service=service)
         except Exception as e:
             self.log_message.emit(f"System chromedriver check failed: {str(e)}")
@@ -189,35 +607,106 @@ class LoginWorker(QThread):
         
         return None
         
+    def start_driver(self):
+        """Create the driver and take ownership of its processes (runs on a worker thread)"""
+        driver = self._create_chrome_driver()
+        if not driver:
+            return None
+        
+        # Remember the process tree now, so a later teardown never has to
+        # ask a possibly busy chromedriver for it
+        self.session_pids = session_root_pids(driver)
+        self.registry_id = PROCESS_REGISTRY.register(self.session_pids)
+        self.commands.attach(driver)
+        with self.teardown_lock:
+            self.driver = driver
+        if self.token.cancelled:
+            # The login was stopped while Chrome was starting
+            self.teardown_browser()
+            PROCESS_REGISTRY.unregister(self.registry_id)
+        return driver
+    
+    def check_cancelled(self):
+        """Abort the login flow if the user has stopped it"""
+        if self.token.cancelled:
+            raise LoginCancelled()
+    
+    def wait_until(self, condition, timeout=10):
+        """Like WebDriverWait.until, but returns control the moment the login is cancelled"""
+        deadline = perf_counter() + timeout
+        while True:
+            self.check_cancelled()
+            try:
+                value = condition(self.driver)
+                if value:
+                    return value
+            except (NoSuchElementException, StaleElementReferenceException):
+                pass
+            if perf_counter() >= deadline:
+                raise TimeoutException(f"Condition not met within {timeout} seconds")
+            if self.token.wait(min(self.POLL_INTERVAL, max(0.0, deadline - perf_counter()))):
+                raise LoginCancelled()
+    
     def run(self):
         try:
             self.status_update.emit("Initializing browser...", "yellow")
             self.log_message.emit("Starting automated login process")
             
-            # Initialize Chrome driver with robust error handling
+            # Start Chrome while the SSO hosts are warmed up
             self.progress_update.emit(0.3)
-            self.driver = self._create_chrome_driver()
-            if not self.driver:
-                self.error_occurred.emit("Failed to initialize Chrome browser")
+            prewarm = load_prewarm_config(CONFIG_PATH, log=self.log_message.emit)
+            try:
+                self.prepared = shared_event_loop().run(
+                    prepare_login(self.start_driver, hosts=prewarm, log=self.log_message.emit,
+                                  probe_session=SESSION_STORE.probe),
+                    on_cancel=self.token.on_cancel)
+            except concurrent.futures.CancelledError:
+                raise LoginCancelled()
+            self.check_cancelled()
+            if not self.prepared.driver:
+                self.status_update.emit("Failed to initialize Chrome browser", "red")
+                self.log_message.emit("✗ Failed to initialize Chrome browser")
+                self.record_login('error', "Failed to initialize Chrome browser")
                 return
+            self.trace.stage('driver_start')
+            self.trace.count('prepare.overlap_ms', round(self.prepared.overlap_ms, 1))
+            self.log_message.emit(self.prepared.summary())
+            
+            # A live stored session skips the IdP chain entirely
+            restored = restore_session(
+                self.prepared, lambda cookies: self.driver.execute_cdp_cmd('Network.setCookies', {'cookies': cookies}),
+                log=self.log_message.emit)
+            if not restored:
+                self.trace.count('prewarm.preconnects', preconnect(
+                    self.driver.execute_script, prewarm, log=self.log_message.emit))
             
             self.status_update.emit("Navigating to login page...", "yellow")
             self.log_message.emit("Opening Brightspace login page")
             self.driver.get("https://brightspace.universiteitleiden.nl")
             
             self.progress_update.emit(0.4)
-            WebDriverWait(self.driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+            self.wait_until(EC.presence_of_element_located((By.TAG_NAME, "body")))
             
             current_url = self.driver.current_url
+            self.trace.stage('navigate')
+            if not current_url.startswith("https://brightspace.universiteitleiden.nl"):
+                if restored:
+                    self.log_message.emit("⚠ Stored session was not accepted, logging in")
+                # Renew the hints from the first SSO page; idle sockets do not last long
+                self.trace.count('prewarm.preconnects', preconnect(
+                    self.driver.execute_script, prewarm, skip=visited_hosts(current_url),
+                    log=self.log_message.emit))
+            via_surfconext = False
             
             # Handle SURFconext university selection page
             if current_url.startswith("https://engine.surfconext.nl/authentication/idp"):
+                via_surfconext = True
                 self.status_update.emit("Selecting Leiden University...", "yellow")
                 self.log_message.emit("Detected SURFconext page, selecting Leiden University")
                 
                 try:
                     # Wait for and click the Leiden University option
-                    leiden_button = WebDriverWait(self.driver, 10).until(
+                    leiden_button = self.wait_until(
                         EC.element_to_be_clickable((By.XPATH, 
                             "//div[@data-entityid='https://login.uaccess.leidenuniv.nl/nidp/saml2/metadata']"))
                     )
@@ -225,7 +714,7 @@ class LoginWorker(QThread):
                     self.log_message.emit("Clicked on Leiden University option")
                     
                     # Wait for page to change after clicking
-                    WebDriverWait(self.driver, 10).until(self.url_changes(current_url))
+                    self.wait_until(self.url_changes(current_url))
                     current_url = self.driver.current_url
                     self.log_message.emit(f"Redirected to: {current_url}")
                     
@@ -233,33 +722,32 @@ class LoginWorker(QThread):
                     self.log_message.emit(f"Failed to select Leiden University: {str(e)}")
                     # Try alternative method - click the submit button inside the form
                     try:
-                        submit_button = WebDriverWait(self.driver, 5).until(
+                        submit_button = self.wait_until(
                             EC.element_to_be_clickable((By.XPATH, 
-                                "//form[@action='https://engine.surfconext.nl/authentication/idp/process-wayf']//button[@type='submit']"))
+                                "//form[@action='https://engine.surfconext.nl/authentication/idp/process-wayf']//button[@type='submit']")),
+                            timeout=5
                         )
                         submit_button.click()
                         self.log_message.emit("Clicked submit button as fallback")
-                        WebDriverWait(self.driver, 10).until(self.url_changes(current_url))
+                        self.wait_until(self.url_changes(current_url))
                         current_url = self.driver.current_url
                     except Exception as e2:
                         self.log_message.emit(f"Fallback method also failed: {str(e2)}")
+                self.trace.stage('surfconext')
             
             if current_url.startswith("https://login.uaccess.leidenuniv.nl"):
                 self.status_update.emit("Entering credentials...", "yellow")
                 self.log_message.emit("Entering username and password")
                 
-                username_input = self.driver.find_element(By.NAME, "Ecom_User_ID")
-                password_input = self.driver.find_element(By.NAME, "Ecom_Password")
-                
-                username_input.send_keys(self.username)
-                password_input.send_keys(self.password)
-                
                 self.progress_update.emit(0.5)
-                login_button = self.driver.find_element(By.ID, "loginbtn")
-                login_button.click()
+                self.trace.count('round_trips_saved', fill_form(
+                    self.driver,
+                    [(By.NAME, "Ecom_User_ID", self.username), (By.NAME, "Ecom_Password", self.password)],
+                    (By.ID, "loginbtn"), log=self.log_message.emit))
                 
-                WebDriverWait(self.driver, 10).until(self.url_changes(current_url))
+                self.wait_until(self.url_changes(current_url))
                 redirected_url = self.driver.current_url
+                self.trace.stage('credentials')
                 
                 if redirected_url.startswith("https://mfa.services.universiteitleiden.nl"):
                     self.status_update.emit("Handling 2FA...", "yellow")
@@ -270,62 +758,153 @@ class LoginWorker(QThread):
                     next_button.click()
                     
                     totp = pyotp.TOTP(self.secret_key)
-                    totp_code = totp.now()
+                    totp_code = fresh_totp_code(totp, self.prepared.clock_skew,
+                                                sleep=self.token.wait, log=self.log_message.emit)
+                    self.check_cancelled()
                     
                     self.log_message.emit(f"Generated TOTP code: {totp_code}")
                     
-                    WebDriverWait(self.driver, 10).until(EC.presence_of_element_located((By.ID, "nffc")))
-                    code_input = self.driver.find_element(By.ID, "nffc")
-                    code_input.send_keys(totp_code)
-                    
+                    self.wait_until(EC.presence_of_element_located((By.ID, "nffc")))
                     self.progress_update.emit(0.9)
-                    next_button_after_code = self.driver.find_element(By.ID, "loginButton2")
-                    next_button_after_code.click()
+                    self.trace.count('round_trips_saved', fill_form(
+                        self.driver, [(By.ID, "nffc", totp_code)], (By.ID, "loginButton2"),
+                        log=self.log_message.emit))
+                    self.trace.stage('mfa')
                     
                     self.progress_update.emit(1.0)
                     self.status_update.emit("Login successful! Browser ready", "green")
                     self.log_message.emit("✓ Login completed successfully")
+                    self.record_login('surfconext+mfa' if via_surfconext else 'mfa')
                 else:
                     self.status_update.emit("Login failed - check credentials", "red")
                     self.log_message.emit("✗ Login failed or incorrect credentials")
+                    self.record_login('failure', f"Unexpected redirect: {redirected_url}")
                     
             elif current_url.startswith("https://brightspace.universiteitleiden.nl"):
                 self.progress_update.emit(1.0)
                 self.status_update.emit("Already logged in!", "green")
                 self.log_message.emit("✓ Already logged in to Brightspace")
+                self.record_login('session_restored' if restored else 'already_logged_in')
             else:
                 self.status_update.emit("Unknown page detected", "orange")
                 self.log_message.emit(f"? Unknown URL detected: {current_url}")
+                self.record_login('unknown_page', current_url)
+            
+            if self.trace.success:
+                self.store_session()
             
             # Monitor browser until closed
             self.monitor_browser()
             
+        except LoginCancelled:
+            pass
         except Exception as e:
-            self.status_update.emit(f"Error: {str(e)}", "red")
-            self.log_message.emit(f"✗ Error during login: {str(e)}")
-            self.process_finished.emit()
+            # Commands fail once teardown kills the browser; that is not an error
+            if not self.token.cancelled:
+                self.status_update.emit(f"Error: {str(e)}", "red")
+                self.log_message.emit(f"✗ Error during login: {str(e)}")
+                self.record_login('error', str(e))
+        finally:
+            if self.token.cancelled:
+                self.record_login('cancelled')
+            # Quit chromedriver after a normal close too; on cancellation this
+            # also covers a driver that finished starting after the cancel
+            self.teardown_browser()
+            PROCESS_REGISTRY.unregister(self.registry_id)
+            if self.token.cancelled and self.cancel_requested is not None:
+                elapsed = (perf_counter() - self.cancel_requested) * 1000
+                self.log_message.emit(f"✓ Login cancelled in {elapsed:.0f} ms")
+            self.emit_finished()
+    
+    def store_session(self):
+        """Save the cookies once the login has landed on Brightspace"""
+        try:
+            self.wait_until(lambda d: d.current_url.startswith("https://brightspace.universiteitleiden.nl"),
+                            timeout=15)
+        except TimeoutException:
+            self.log_message.emit("⚠ Brightspace did not load; session not stored")
+            return
+        save_session(lambda: self.driver.execute_cdp_cmd('Network.getAllCookies', {})['cookies'],
+                     log=self.log_message.emit)
     
     def monitor_browser(self):
-        """Monitor browser and notify when closed"""
+        """Block on the browser process until it is closed"""
+        browser = self.session_pids[1] if len(self.session_pids) > 1 else None
+        self.browser_monitor = BrowserMonitor(self.driver, log=self.log_message.emit, pid=browser)
+        self.check_cancelled()
         try:
-            while self.is_running and self.driver and self.driver.current_window_handle:
-                sleep(1)
+            if self.browser_monitor.wait():
+                self.log_message.emit("Browser window closed")
         except Exception:
             pass
-        finally:
-            if self.is_running:
-                self.log_message.emit("Browser window closed")
-                self.process_finished.emit()
+    
+    def record_login(self, branch, error=None):
+        """Store the outcome and stage timings of this attempt (first call wins)"""
+        if self.trace.finish(branch, error):
+            self.commands.add_to_trace(self.trace)
+            TELEMETRY.record(self.trace)
+            saved = self.trace.metrics.get('round_trips_saved')
+            if saved:
+                self.log_message.emit(f"⚡ Scripted form fill saved {saved} WebDriver round trips")
+            self.log_command_histogram()
+    
+    def log_command_histogram(self):
+        """Log how many WebDriver commands this login sent and how long they took"""
+        count, total = self.commands.totals()
+        if not count:
+            return
+        self.log_message.emit(f"📋 {count} WebDriver commands, {total:.0f} ms in chromedriver:")
+        for line in self.commands.histogram():
+            self.log_message.emit(f"  {line}")
+    
+    def emit_finished(self):
+        """Emit process_finished exactly once per login"""
+        if not self.finished_emitted:
+            self.finished_emitted = True
+            self.process_finished.emit()
     
     def stop(self):
-        """Stop the worker thread"""
-        self.is_running = False
-        if self.driver:
-            try:
-                self.driver.quit()
-            except Exception:
-                pass
-        self.process_finished.emit()
+        """Stop the login process and close the browser"""
+        self.cancel()
+    
+    def _on_cancel(self):
+        """Wake the login flow and tear the browser down off the calling thread"""
+        self.cancel_requested = perf_counter()
+        if self.browser_monitor:
+            self.browser_monitor.cancel()
+        if self.state == 'pending':
+            self.emit_finished()  # Never started, so run() will not report
+        threading.Thread(target=self.teardown_browser, daemon=True).start()
+    
+    def teardown_browser(self):
+        """Close Chrome and chromedriver, killing whatever does not exit in time"""
+        with self.teardown_lock:
+            driver, self.driver = self.driver, None
+            if not driver:
+                return
+            started = perf_counter()
+            
+            # Kill the browser first so a command blocked in chromedriver fails
+            # immediately, then let chromedriver quit and clean up its profile
+            tree = expand_process_tree(self.session_pids)
+            browser_tree = expand_process_tree(self.session_pids[1:])
+            killed = kill_process_tree(browser_tree, timeout=1.0)
+            
+            quitter = threading.Thread(target=self._quit_driver, args=(driver,), daemon=True)
+            quitter.start()
+            quitter.join(self.QUIT_TIMEOUT)
+            killed += kill_process_tree([pid for pid in tree if pid not in browser_tree], timeout=1.0)
+            
+            if killed or self.token.cancelled:
+                elapsed = (perf_counter() - started) * 1000
+                self.log_message.emit(f"Browser shut down in {elapsed:.0f} ms ({killed} processes stopped)")
+    
+    @staticmethod
+    def _quit_driver(driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
     
     def url_changes(self, old_url):
         """Helper method to detect URL changes"""
@@ -333,38 +912,79 @@ class LoginWorker(QThread):
             return driver.current_url != old_url
         return _url_changes
 
-class InstallWorker(QThread):
-    """Worker thread for installing dependencies"""
+class ReapWorker(Task):
+    """Task killing browser processes left behind by a crashed session"""
+    log_message = pyqtSignal(str)
+    
+    def __init__(self):
+        super().__init__('reap')
+    
+    def run(self):
+        message = format_reap_report(PROCESS_REGISTRY.reap())
+        if message:
+            self.log_message.emit(message)
+
+class KeepAliveWorker(Task):
+    """Task refreshing the stored session once"""
+    log_message = pyqtSignal(str)
+    refreshed = pyqtSignal()
+    
+    def __init__(self, scheduler):
+        super().__init__('keepalive')
+        self.scheduler = scheduler
+    
+    def run(self):
+        self.scheduler.log = self.log_message.emit
+        try:
+            self.scheduler.refresh()
+        finally:
+            self.refreshed.emit()
+
+class CredentialLoadWorker(Task):
+    """Task reading and decrypting the saved credentials"""
+    credentials_loaded = pyqtSignal(str, str, str)
+    
+    def __init__(self):
+        super().__init__('credentials')
+    
+    def run(self):
+        try:
+            username, password, secret_key = load_credentials_cli()
+        except Exception:
+            username, password, secret_key = '', '', ''
+        self.credentials_loaded.emit(username, password, secret_key)
+
+class InstallWorker(Task):
+    """Task installing dependencies"""
+    queue = 'setup'
     status_update = pyqtSignal(str)
     log_message = pyqtSignal(str)
     
+    def __init__(self, wheelhouse=None):
+        super().__init__(f"install:{wheelhouse or 'pypi'}")
+        self.wheelhouse = wheelhouse
+    
     def run(self):
-        self.status_update.emit("Installing dependencies...")
+        source = "wheelhouse" if self.wheelhouse else "PyPI"
+        self.status_update.emit(f"Installing dependencies from {source}...")
         self.log_message.emit("Starting dependency installation...")
         
-        for module in REQUIRED_MODULES:
-            try:
-                __import__(module.replace('-', '_'))
-                self.log_message.emit(f"✓ {module} already installed")
-            except ImportError:
-                self.log_message.emit(f"Installing {module}...")
-                try:
-                    subprocess.check_call([sys.executable, "-m", "pip", "install", module])
-                    self.log_message.emit(f"✓ {module} installed successfully")
-                except subprocess.CalledProcessError as e:
-                    self.log_message.emit(f"✗ Failed to install {module}: {e}")
+        if install_requirements(self.wheelhouse, log=self.log_message.emit):
+            self.status_update.emit("Dependencies installation completed")
+        else:
+            self.status_update.emit("Dependencies installation failed")
         
-        self.status_update.emit("Dependencies installation completed")
         self.log_message.emit("All dependencies processed")
 
-class BuildWorker(QThread):
-    """Worker thread for building executable using enhanced build tool"""
+class BuildWorker(Task):
+    """Task building the executable using the shared build engine"""
+    queue = 'setup'
     status_update = pyqtSignal(str)
     log_message = pyqtSignal(str)
     build_progress = pyqtSignal(str, str)  # (stage, message)
     
     def __init__(self):
-        super().__init__()
+        super().__init__('build')
         self.build_tool = None
         
     def run(self):
@@ -372,40 +992,18 @@ class BuildWorker(QThread):
         self.log_message.emit("Starting enhanced executable build...")
         
         try:
-            # Import the build tool
-            from pathlib import Path
-            import shutil
-            
-            # Create build tool instance
-            source_file = Path(__file__).resolve()
-            self.build_tool = self.create_build_tool_class(source_file)
+            # Use the shared build engine from build_tool.py
+            build_tool = load_build_tool()
+            self.build_tool = build_tool.AutoBrightspaceBuildTool(
+                os.path.abspath(__file__), log=self.log_message.emit
+            )
+            self.build_tool.on_progress = self.build_progress.emit
             
             current_os = platform.system().lower()
             self.log_message.emit(f"Building for platform: {current_os}")
-            
-            # Check dependencies
-            self.build_progress.emit("dependencies", "Checking build dependencies...")
-            if not self.build_tool.check_dependencies():
-                self.status_update.emit("Dependency check failed")
-                self.log_message.emit("✗ Missing required dependencies for building")
-                return
-            
-            self.log_message.emit("✓ All build dependencies available")
-            
-            # Clean previous builds
-            self.build_progress.emit("cleaning", "Cleaning previous builds...")
-            self.build_tool.clean_build_dirs()
-            self.log_message.emit("✓ Cleaned previous build files")
-            
-            # Create icons if needed
-            self.build_progress.emit("icons", "Preparing application icons...")
-            self.build_tool.create_missing_icons()
-            
-            # Build executable
-            self.build_progress.emit("building", "Building executable with PyInstaller...")
             self.status_update.emit("Building executable...")
             
-            if self.build_executable_with_feedback():
+            if self.build_tool.build_executable():
                 # Create launcher script
                 self.build_progress.emit("post-processing", "Creating launcher scripts...")
                 launcher = self.build_tool.create_launcher_script()
@@ -436,243 +1034,6 @@ class BuildWorker(QThread):
             self.status_update.emit(f"Build error: {str(e)}")
             self.log_message.emit(f"✗ Build failed with error: {str(e)}")
     
-    def create_build_tool_class(self, source_file):
-        """Create build tool class inline to avoid import issues"""
-        from pathlib import Path
-        import shutil
-        
-        class EnhancedBuildTool:
-            def __init__(self, source_file):
-                self.source_file = Path(source_file).resolve()
-                self.project_dir = self.source_file.parent
-                self.app_name = "AutoBrightspace"
-                self.current_os = platform.system().lower()
-                
-                self.build_dir = self.project_dir / "build"
-                self.dist_dir = self.project_dir / "dist"
-                self.icon_dir = self.project_dir / "icon"
-                
-                self.icon_paths = {
-                    "windows": self.icon_dir / "AutoBrightspace.ico",
-                    "darwin": self.icon_dir / "AutoBrightspace.icns", 
-                    "linux": self.icon_dir / "AutoBrightspace.png"
-                }
-                
-                self.executable_names = {
-                    "windows": f"{self.app_name}.exe",
-                    "darwin": self.app_name,
-                    "linux": self.app_name
-                }
-            
-            def check_dependencies(self):
-                """Check PyInstaller availability"""
-                try:
-                    import PyInstaller
-                    return True
-                except ImportError:
-                    return False
-            
-            def clean_build_dirs(self):
-                """Clean build directories"""
-                import shutil
-                for dir_path in [self.build_dir, self.dist_dir]:
-                    if dir_path.exists():
-                        shutil.rmtree(dir_path)
-                
-                # Clean spec files
-                for spec_file in self.project_dir.glob("*.spec"):
-                    spec_file.unlink()
-            
-            def create_missing_icons(self):
-                """Create missing icons from existing ones"""
-                try:
-                    from PIL import Image
-                    
-                    existing_icons = {}
-                    for platform, icon_path in self.icon_paths.items():
-                        if icon_path.exists():
-                            existing_icons[platform] = icon_path
-                    
-                    if not existing_icons:
-                        return self.create_default_icon()
-                    
-                    # Create PNG for Linux if missing
-                    if "linux" not in existing_icons and ("windows" in existing_icons or "darwin" in existing_icons):
-                        source_icon = existing_icons.get("windows") or existing_icons.get("darwin")
-                        try:
-                            img = Image.open(source_icon)
-                            if img.mode != 'RGBA':
-                                img = img.convert('RGBA')
-                            img.save(self.icon_paths["linux"], "PNG")
-                            return True
-                        except:
-                            pass
-                    
-                    return True
-                except:
-                    return False
-            
-            def create_default_icon(self):
-                """Create simple default icon"""
-                try:
-                    from PIL import Image, ImageDraw, ImageFont
-                    
-                    self.icon_dir.mkdir(exist_ok=True)
-                    img = Image.new('RGBA', (256, 256), (31, 83, 141, 255))
-                    draw = ImageDraw.Draw(img)
-                    
-                    try:
-                        font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 120)
-                    except:
-                        font = ImageFont.load_default()
-                    
-                    text = "AB"
-                    bbox = draw.textbbox((0, 0), text, font=font)
-                    text_width = bbox[2] - bbox[0]
-                    text_height = bbox[3] - bbox[1]
-                    
-                    x = (256 - text_width) // 2
-                    y = (256 - text_height) // 2
-                    
-                    draw.text((x, y), text, fill=(255, 255, 255, 255), font=font)
-                    
-                    # Save icons
-                    img.save(self.icon_paths["linux"], "PNG")
-                    img.save(self.icon_paths["windows"], "ICO", sizes=[(256, 256), (128, 128), (64, 64), (32, 32), (16, 16)])
-                    
-                    try:
-                        img.save(self.icon_paths["darwin"], "ICNS")
-                    except:
-                        import shutil
-                        shutil.copy2(self.icon_paths["linux"], self.icon_paths["darwin"].with_suffix(".png"))
-                    
-                    return True
-                except:
-                    return False
-            
-            def get_build_info(self):
-                """Get build information"""
-                exe_name = self.executable_names[self.current_os]
-                
-                if self.current_os == "darwin":
-                    app_path = self.dist_dir / f"{self.app_name}.app"
-                    if app_path.exists():
-                        size = sum(f.stat().st_size for f in app_path.rglob('*') if f.is_file())
-                        return {"path": app_path, "size": size, "type": "macOS App Bundle"}
-                
-                exe_path = self.dist_dir / exe_name
-                if exe_path.exists():
-                    return {
-                        "path": exe_path,
-                        "size": exe_path.stat().st_size,
-                        "type": f"{self.current_os.title()} Executable"
-                    }
-                return None
-            
-            def create_launcher_script(self):
-                """Create launcher script"""
-                if self.current_os == "windows":
-                    content = f'''@echo off
-cd /d "%~dp0"
-"{self.executable_names["windows"]}" run
-if errorlevel 1 pause
-'''
-                    launcher_path = self.dist_dir / "AutoBrightspace_QuickLogin.bat"
-                else:
-                    content = f'''#!/bin/bash
-DIR="$(cd "$(dirname "${{BASH_SOURCE[0]}}")" && pwd)"
-cd "$DIR"
-./{self.executable_names[self.current_os]} run
-'''
-                    launcher_path = self.dist_dir / "AutoBrightspace_QuickLogin.sh"
-                
-                try:
-                    launcher_path.write_text(content)
-                    if self.current_os != "windows":
-                        launcher_path.chmod(0o755)
-                    return launcher_path
-                except:
-                    return None
-        
-        return EnhancedBuildTool(source_file)
-    
-    def build_executable_with_feedback(self):
-        """Build executable with detailed feedback"""
-        from pathlib import Path
-        
-        try:
-            current_icon = self.build_tool.icon_paths.get(self.build_tool.current_os)
-            icon_path = str(current_icon) if current_icon and current_icon.exists() else None
-            
-            # Enhanced PyInstaller command
-            cmd = [
-                sys.executable, "-m", "PyInstaller",
-                "--onefile",
-                "--windowed",
-                "--clean",
-                "--noconfirm",
-                "--name", self.build_tool.app_name,
-                "--distpath", str(self.build_tool.dist_dir),
-                "--workpath", str(self.build_tool.build_dir),
-                "--specpath", str(self.build_tool.project_dir)
-            ]
-            
-            # Add icon if available
-            if icon_path:
-                cmd.extend(["--icon", icon_path])
-                self.log_message.emit(f"✓ Using icon: {Path(icon_path).name}")
-            else:
-                self.log_message.emit("⚠ No icon available, building without icon")
-            
-            # Add hidden imports for better compatibility
-            hidden_imports = [
-                "PyQt5.QtCore", "PyQt5.QtGui", "PyQt5.QtWidgets",
-                "selenium", "selenium.webdriver", "selenium.webdriver.chrome",
-                "webdriver_manager", "webdriver_manager.chrome",
-                "pyotp", "cryptography", "cryptography.fernet", "appdirs"
-            ]
-            
-            for imp in hidden_imports:
-                cmd.extend(["--hidden-import", imp])
-            
-            # Exclude conflicting Qt packages and unnecessary modules
-            exclude_modules = [
-                "PySide2", "PySide6", "PyQt6",
-                "tkinter", "matplotlib", "numpy", "pandas", "scipy", 
-                "IPython", "jupyter", "notebook", "jupyterlab",
-                "sphinx", "babel", "pytest", "astroid"
-            ]
-            
-            for exc in exclude_modules:
-                cmd.extend(["--exclude-module", exc])
-            
-            # Add the source file
-            cmd.append(str(self.build_tool.source_file))
-            
-            # Run PyInstaller
-            self.log_message.emit("Running PyInstaller...")
-            result = subprocess.run(cmd, 
-                                  cwd=self.build_tool.project_dir,
-                                  capture_output=True, 
-                                  text=True)
-            
-            if result.returncode != 0:
-                self.log_message.emit(f"✗ PyInstaller stderr: {result.stderr}")
-                return False
-            
-            # Post-process for Unix systems
-            if self.build_tool.current_os in ["linux", "darwin"]:
-                exe_path = self.build_tool.dist_dir / self.build_tool.executable_names[self.build_tool.current_os]
-                if exe_path.exists():
-                    exe_path.chmod(0o755)
-                    self.log_message.emit("✓ Made executable file executable")
-            
-            return True
-            
-        except Exception as e:
-            self.log_message.emit(f"✗ Build process error: {str(e)}")
-            return False
-    
     def log_usage_instructions(self, build_info, current_os):
         """Log usage instructions for the built executable"""
         self.log_message.emit("\n📋 USAGE INSTRUCTIONS:")
@@ -704,44 +1065,88 @@ cd "$DIR"
         self.log_message.emit("The launcher script provides the same functionality as")
         self.log_message.emit("'python AutoBrightSpace.py run' - instant login without GUI!")
 
-class IconWorker(QThread):
-    """Worker thread for icon conversion"""
+class IconWorker(Task):
+    """Task converting the icon for macOS"""
+    queue = 'setup'
     status_update = pyqtSignal(str)
     log_message = pyqtSignal(str)
     
+    def __init__(self):
+        super().__init__('icon')
+    
     def run(self):
         self.status_update.emit("Converting icon...")
         self.log_message.emit("Starting icon conversion for macOS...")
         
         try:
-            from PIL import Image
-            
-            if not os.path.exists(ICON_PATH_WINDOWS):
-                self.log_message.emit("✗ Source .ico file not found")
-                self.status_update.emit("Source icon not found")
-                return
-            
-            # Load the .ico file
-            img = Image.open(ICON_PATH_WINDOWS)
-            
-            # Create icns directory structure
-            icon_dir = os.path.dirname(ICON_PATH_MAC)
-            if not os.path.exists(icon_dir):
-                os.makedirs(icon_dir)
-            
-            # Save as .icns (PIL will handle the conversion)
-            img.save(ICON_PATH_MAC, format='ICNS')
-            
-            self.log_message.emit("✓ Icon converted successfully to .icns format")
-            self.status_update.emit("Icon conversion completed")
+            # The pipeline renders from the best existing icon and never
+            # overwrites user-supplied ones, including a shipped .icns
+            build_tool = load_build_tool()
+            pipeline = build_tool.IconPipeline(
+                os.path.dirname(ICON_PATH_WINDOWS),
+                {"windows": ICON_PATH_WINDOWS, "darwin": ICON_PATH_MAC, "linux": ICON_PATH_LINUX},
+                log=self.log_message.emit
+            )
+            
+            output = pipeline.output_path("darwin") if pipeline.run() else None
+            if output is None:
+                self.log_message.emit("✗ Could not create a macOS icon (Pillow required)")
+                self.status_update.emit("Icon conversion failed")
+            elif output.suffix.lower() == ".icns":
+                self.log_message.emit(f"✓ macOS icon ready: {output}")
+                self.status_update.emit("Icon conversion completed")
+            else:
+                self.log_message.emit(f"⚠ .icns could not be written; macOS builds will use {output}")
+                self.status_update.emit("Icon conversion used PNG fallback")
             
-        except ImportError:
-            self.log_message.emit("✗ Pillow library required for icon conversion")
-            self.status_update.emit("Pillow library required")
         except Exception as e:
             self.log_message.emit(f"✗ Icon conversion failed: {e}")
             self.status_update.emit("Icon conversion failed")
 
+class LogModel(QAbstractListModel):
+    """Bounded ring buffer of log lines, flushed to the view in batches"""
+    
+    def __init__(self, max_lines=5000, parent=None):
+        super().__init__(parent)
+        self.max_lines = max_lines
+        self.lines = collections.deque()
+        self.pending = []
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.lines)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self.lines[index.row()]
+        return None
+    
+    def append(self, line):
+        """Queue a line; it becomes visible on the next flush"""
+        self.pending.append(line)
+        if len(self.pending) > self.max_lines:
+            del self.pending[:-self.max_lines]
+    
+    def flush(self):
+        """Move queued lines into the model, dropping the oldest beyond max_lines"""
+        if not self.pending:
+            return False
+        
+        batch, self.pending = self.pending, []
+        overflow = len(self.lines) + len(batch) - self.max_lines
+        if overflow > 0:
+            removed = min(overflow, len(self.lines))
+            if removed:
+                self.beginRemoveRows(QModelIndex(), 0, removed - 1)
+                for _ in range(removed):
+                    self.lines.popleft()
+                self.endRemoveRows()
+        
+        first = len(self.lines)
+        self.beginInsertRows(QModelIndex(), first, first + len(batch) - 1)
+        self.lines.extend(batch)
+        self.endInsertRows()
+        return True
+
 class SidebarButton(QPushButton):
     """Custom styled sidebar button"""
     def __init__(self, text, parent=None):
@@ -784,19 +1189,39 @@ class AutoBrightspaceApp(QMainWindow):
             self.setWindowIcon(QIcon(ICON_PATH_LINUX))
         
         # Initialize variables
+        self.credentials = {'username': '', 'password': '', 'secret_key': ''}
+        self.first_paint_ms = None
+        self.credentials_ready_ms = None
+        self.credential_worker = None
         self.login_worker = None
         self.install_worker = None
         self.build_worker = None
         self.icon_worker = None
+        self.executor = TaskExecutor(self)
+        self.keepalive = None
+        self.keepalive_timer = QTimer(self)
+        self.keepalive_timer.setSingleShot(True)
+        self.keepalive_timer.timeout.connect(self.refresh_session)
         
         # Set the dark theme
         self.set_dark_theme()
+        startup_mark("app_init")
         
         # Create the main layout and widgets
         self.create_ui()
+        startup_mark("create_ui")
         
-        # Load saved credentials
+        # Load saved credentials in the background; login is gated until done
         self.load_credentials()
+        startup_mark("load_credentials")
+        
+        # Clean up browsers leaked by a previous crash
+        reaper = ReapWorker()
+        reaper.log_message.connect(self.log_message)
+        self.executor.submit(reaper)
+        
+        if keepalive_enabled(CONFIG_PATH):
+            self.start_keepalive()
     
     def set_dark_theme(self):
         """Set a dark theme for the application"""
@@ -846,7 +1271,7 @@ class AutoBrightspaceApp(QMainWindow):
             background-color: #555555;
             color: #888888;
         }
-        QLineEdit, QTextEdit, QComboBox {
+        QLineEdit, QTextEdit, QListView, QComboBox {
             background-color: #404040;
             border: 1px solid #555555;
             border-radius: 4px;
@@ -936,6 +1361,13 @@ class AutoBrightspaceApp(QMainWindow):
         self.scale_combo.currentIndexChanged.connect(self.change_scale)
         sidebar_layout.addWidget(self.scale_combo)
         
+        # Background task status from the shared executor
+        self.tasks_label = QLabel(self.executor.status_text())
+        self.tasks_label.setWordWrap(True)
+        self.tasks_label.setStyleSheet("color: #a0a0a0; font-size: 9pt;")
+        self.executor.status_changed.connect(self.tasks_label.setText)
+        sidebar_layout.addWidget(self.tasks_label)
+        
         # Content area with stacked widget for "pages"
         content_widget = QWidget()
         content_widget.setStyleSheet("background-color: #2d2d2d;")
@@ -945,11 +1377,17 @@ class AutoBrightspaceApp(QMainWindow):
         self.stack = QStackedWidget()
         content_layout.addWidget(self.stack)
         
-        # Create the main pages
-        self.create_main_page()
-        self.create_config_page()
-        self.create_setup_page()
-        self.create_shortcuts_page()
+        # Pages are built on first visit; only the main page is built up front
+        self.page_factories = [
+            self.create_main_page,
+            self.create_config_page,
+            self.create_setup_page,
+            self.create_shortcuts_page
+        ]
+        self.built_pages = set()
+        for _ in self.page_factories:
+            self.stack.addWidget(QWidget())
+        self.ensure_page(0)
         
         # Add to main layout
         main_layout.addWidget(sidebar_widget)
@@ -1032,14 +1470,23 @@ class AutoBrightspaceApp(QMainWindow):
         log_title.setFont(QFont("Segoe UI", 12, QFont.Bold))
         log_layout.addWidget(log_title)
         
-        self.log_text = QTextEdit()
-        self.log_text.setReadOnly(True)
-        self.log_text.setFont(QFont("Courier", 10))
-        log_layout.addWidget(self.log_text)
+        # Log lines go into a bounded model and are flushed on a timer tick,
+        # so bursts from the workers cost one view update per tick
+        self.log_model = LogModel(parent=self)
+        self.log_view = QListView()
+        self.log_view.setModel(self.log_model)
+        self.log_view.setUniformItemSizes(True)
+        self.log_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.log_view.setFont(QFont("Courier", 10))
+        log_layout.addWidget(self.log_view)
+        
+        self.log_flush_timer = QTimer(self)
+        self.log_flush_timer.setInterval(100)
+        self.log_flush_timer.timeout.connect(self.flush_log)
         
         layout.addWidget(log_frame, 1)
         
-        self.stack.addWidget(page)
+        return page
     
     def create_config_page(self):
         """Create the configuration page with credential settings"""
@@ -1082,6 +1529,10 @@ class AutoBrightspaceApp(QMainWindow):
         
         config_layout.addLayout(form_layout)
         
+        self.username_input.setText(self.credentials['username'])
+        self.password_input.setText(self.credentials['password'])
+        self.secret_key_input.setText(self.credentials['secret_key'])
+        
         # Save button
         save_button = QPushButton("Save Configuration")
         save_button.setFixedWidth(250)
@@ -1089,6 +1540,11 @@ class AutoBrightspaceApp(QMainWindow):
         save_button.clicked.connect(self.save_credentials)
         config_layout.addWidget(save_button, 0, Qt.AlignCenter)
         
+        self.keepalive_checkbox = QCheckBox("Keep the Brightspace session alive while AutoBrightspace runs")
+        self.keepalive_checkbox.setChecked(self.keepalive is not None)
+        self.keepalive_checkbox.toggled.connect(self.toggle_keepalive)
+        config_layout.addWidget(self.keepalive_checkbox, 0, Qt.AlignCenter)
+        
         layout.addWidget(config_frame)
         
         # Help information
@@ -1116,7 +1572,7 @@ Note: Your credentials are stored locally on your device.
         
         layout.addWidget(help_frame, 1)
         
-        self.stack.addWidget(page)
+        return page
     
     def create_setup_page(self):
         """Create the setup page with dependencies and build options"""
@@ -1134,9 +1590,13 @@ Note: Your credentials are stored locally on your device.
         deps_layout.addWidget(deps_title)
         
         deps_button = QPushButton("Install Dependencies")
-        deps_button.clicked.connect(self.install_dependencies)
+        deps_button.clicked.connect(lambda: self.install_dependencies())
         deps_layout.addWidget(deps_button)
         
+        wheelhouse_button = QPushButton("Install from Wheelhouse (offline)")
+        wheelhouse_button.clicked.connect(self.install_from_wheelhouse)
+        deps_layout.addWidget(wheelhouse_button)
+        
         self.deps_status = QLabel("Click to check and install dependencies")
         deps_layout.addWidget(self.deps_status)
         
@@ -1179,7 +1639,7 @@ Note: Your credentials are stored locally on your device.
         
         layout.addStretch()
         
-        self.stack.addWidget(page)
+        return page
     
     def create_shortcuts_page(self):
         """Create the shortcuts page for keyboard shortcut setup"""
@@ -1323,7 +1783,7 @@ Note: Your credentials are stored locally on your device.
         
         layout.addStretch()
         
-        self.stack.addWidget(page)
+        return page
     
     def setup_keyboard_shortcut(self):
         """Set up keyboard shortcut based on the operating system"""
@@ -1508,8 +1968,30 @@ Batch file created at: {batch_path}
             """)
             self.log_message(f"Windows shortcut setup failed: {str(e)}")
     
+    def ensure_page(self, index):
+        """Build a page the first time it is needed, replacing its placeholder"""
+        if index in self.built_pages:
+            return
+        
+        start = perf_counter()
+        page = self.page_factories[index]()
+        placeholder = self.stack.widget(index)
+        # Removing the current widget moves the current index to a neighbour; put it back
+        current = self.stack.currentIndex()
+        self.stack.removeWidget(placeholder)
+        placeholder.deleteLater()
+        self.stack.insertWidget(index, page)
+        self.stack.setCurrentIndex(current)
+        self.built_pages.add(index)
+        
+        # The log lives on the main page, which is always built first
+        if index != 0:
+            self.log_message(f"Built {self.page_factories[index].__name__[7:-5]} page in "
+                             f"{(perf_counter() - start) * 1000:.0f} ms")
+    
     def switch_page(self, index):
         """Switch between pages and update button states"""
+        self.ensure_page(index)
         self.stack.setCurrentIndex(index)
         
         # Update button states
@@ -1530,28 +2012,63 @@ Batch file created at: {batch_path}
                                    f"(Note: Would require application restart to take full effect)")
     
     def load_credentials(self):
-        """Load saved credentials with decryption support"""
-        config = ConfigParser()
-        if os.path.exists(CONFIG_PATH):
-            config.read(CONFIG_PATH)
-            
-            # Load and decrypt credentials
-            username = config.get('Credentials', 'username', fallback='')
-            password = config.get('Credentials', 'password', fallback='')
-            secret_key = config.get('Credentials', 'secret_key', fallback='')
-            
-            # Decrypt if data appears to be encrypted
-            username = decrypt_data(username) if username else ''
-            password = decrypt_data(password) if password else ''
-            secret_key = decrypt_data(secret_key) if secret_key else ''
-            
-            self.username_input.setText(username)
-            self.password_input.setText(password)
-            self.secret_key_input.setText(secret_key)
+        """Decrypt the saved credentials off the UI thread"""
+        self.login_button.setEnabled(False)
+        self.login_button.setText("Loading credentials...")
+        
+        self.credential_worker = CredentialLoadWorker()
+        self.credential_worker.credentials_loaded.connect(self.apply_credentials)
+        self.executor.submit(self.credential_worker)
+    
+    def apply_credentials(self, username, password, secret_key):
+        """Populate the credential fields once decryption has finished"""
+        self.credentials = {'username': username, 'password': password, 'secret_key': secret_key}
+        
+        if 1 in self.built_pages:
+            # Keep anything the user typed while decryption was still running
+            for field, value in ((self.username_input, username), (self.password_input, password),
+                                 (self.secret_key_input, secret_key)):
+                if not field.isModified():
+                    field.setText(value)
+        
+        self.login_button.setText("Start Auto Login")
+        if not (self.login_worker and self.login_worker.is_active()):
+            self.login_button.setEnabled(True)
+        self.credential_worker = None
+        
+        self.credentials_ready_ms = (perf_counter() - STARTUP_TIME) * 1000
+        startup_mark("credentials_ready")
+        self.report_startup_benchmark()
+    
+    def report_startup_benchmark(self):
+        """Log when the window became interactive relative to credential decryption
+        
+        Runs after both first paint and credential decryption; only then is
+        the startup profile complete and written.
+        """
+        if self.first_paint_ms is None or self.credentials_ready_ms is None:
+            return
+        startup_profile_finish()
+        lead = self.credentials_ready_ms - self.first_paint_ms
+        if lead >= 0:
+            self.log_message(f"Credentials ready {self.credentials_ready_ms:.0f} ms after start "
+                             f"(window interactive {lead:.0f} ms earlier)")
+        else:
+            self.log_message(f"Credentials ready {self.credentials_ready_ms:.0f} ms after start "
+                             f"(before first paint)")
+    
+    def current_credentials(self):
+        """Return the credentials from the config page if built, else the loaded ones"""
+        if 1 in self.built_pages:
+            return (self.username_input.text(), self.password_input.text(),
+                    self.secret_key_input.text())
+        return (self.credentials['username'], self.credentials['password'],
+                self.credentials['secret_key'])
     
     def save_credentials(self):
         """Save credentials to config file with encryption"""
         config = ConfigParser()
+        config.read(CONFIG_PATH)  # Keep other sections such as [Prewarm]
         
         # Encrypt sensitive data before saving
         username = self.username_input.text()
@@ -1570,14 +2087,18 @@ Batch file created at: {batch_path}
         with open(CONFIG_PATH, 'w') as configfile:
             config.write(configfile)
         
+        self.credentials = {
+            'username': self.username_input.text(),
+            'password': self.password_input.text(),
+            'secret_key': self.secret_key_input.text()
+        }
+        
         QMessageBox.information(self, "Success", "Credentials saved successfully with encryption!")
         self.log_message("Credentials saved to configuration file (encrypted)")
     
     def start_login(self):
         """Start the login process"""
-        username = self.username_input.text()
-        password = self.password_input.text()
-        secret_key = self.secret_key_input.text()
+        username, password, secret_key = self.current_credentials()
         
         if not all([username, password, secret_key]):
             QMessageBox.critical(self, "Error", "Please configure all credentials first!")
@@ -1588,13 +2109,14 @@ Batch file created at: {batch_path}
         self.stop_button.setEnabled(True)
         self.progress_bar.setValue(15)
         
-        # Start worker thread
-        self.login_worker = LoginWorker(username, password, secret_key)
-        self.login_worker.status_update.connect(self.update_status)
-        self.login_worker.progress_update.connect(lambda val: self.progress_bar.setValue(int(val * 100)))
-        self.login_worker.log_message.connect(self.log_message)
-        self.login_worker.process_finished.connect(self.reset_ui)
-        self.login_worker.start()
+        # Start the login task
+        worker = LoginWorker(username, password, secret_key)
+        worker.status_update.connect(self.update_status)
+        worker.progress_update.connect(lambda val: self.progress_bar.setValue(int(val * 100)))
+        worker.log_message.connect(self.log_message)
+        worker.process_finished.connect(self.reset_ui)
+        if self.submit_task(worker, "Login"):
+            self.login_worker = worker
     
     def stop_browser(self):
         """Stop the browser and login process"""
@@ -1609,27 +2131,85 @@ Batch file created at: {batch_path}
         self.progress_bar.setValue(0)
         self.login_worker = None
     
-    def install_dependencies(self):
+    def submit_task(self, task, description):
+        """Queue a task on the shared executor unless the same task is in flight"""
+        if self.executor.submit(task):
+            return True
+        self.log_message(f"⚠ {description} is already in progress")
+        return False
+    
+    def toggle_keepalive(self, enabled):
+        """Persist the keep-alive setting and start or stop refreshing"""
+        set_keepalive_enabled(CONFIG_PATH, enabled)
+        if enabled:
+            self.start_keepalive()
+        else:
+            self.keepalive_timer.stop()
+            self.keepalive = None
+            self.log_message("Session keep-alive stopped")
+    
+    def start_keepalive(self):
+        """Start refreshing the stored session on the adaptive schedule"""
+        if self.keepalive is None:
+            self.keepalive = KeepAliveScheduler(SESSION_STORE, TELEMETRY, log=self.log_message)
+            self.refresh_session()
+    
+    def refresh_session(self):
+        """Run one keep-alive refresh in the background"""
+        if self.keepalive is None:
+            return
+        worker = KeepAliveWorker(self.keepalive)
+        worker.log_message.connect(self.log_message)
+        worker.refreshed.connect(self.schedule_keepalive)
+        if not self.executor.submit(worker):
+            self.schedule_keepalive()
+    
+    def schedule_keepalive(self):
+        if self.keepalive is not None:
+            self.keepalive_timer.start(int(self.keepalive.next_delay() * 1000))
+    
+    def install_dependencies(self, wheelhouse=None):
         """Install required dependencies"""
-        self.install_worker = InstallWorker()
-        self.install_worker.status_update.connect(lambda msg: self.deps_status.setText(msg))
-        self.install_worker.log_message.connect(self.log_message)
-        self.install_worker.start()
+        worker = InstallWorker(wheelhouse)
+        worker.status_update.connect(lambda msg: self.deps_status.setText(msg))
+        worker.log_message.connect(self.log_message)
+        if self.submit_task(worker, "Dependency installation"):
+            self.install_worker = worker
+    
+    def install_from_wheelhouse(self):
+        """Install dependencies offline from a wheelhouse directory or archive"""
+        # Picking a file covers both: the wheelhouse.json of a directory or a .zip archive
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Select wheelhouse.json or Wheelhouse Archive", "",
+            f"Wheelhouse ({WHEELHOUSE_MANIFEST} *.zip *.tar.gz);;All files (*)")
+        if path:
+            if os.path.basename(path) == WHEELHOUSE_MANIFEST:
+                path = os.path.dirname(path)
+            self.install_dependencies(path)
     
     def build_executable(self):
         """Build executable using PyInstaller"""
-        self.build_worker = BuildWorker()
-        self.build_worker.status_update.connect(lambda msg: self.build_status.setText(msg))
-        self.build_worker.log_message.connect(self.log_message)
-        self.build_worker.start()
+        worker = BuildWorker()
+        worker.status_update.connect(lambda msg: self.build_status.setText(msg))
+        worker.build_progress.connect(self.update_build_progress)
+        worker.log_message.connect(self.log_message)
+        if self.submit_task(worker, "Build"):
+            self.build_worker = worker
+    
+    def update_build_progress(self, stage, message):
+        """Show the latest build output line under the build button"""
+        if len(message) > 120:
+            message = message[:117] + "..."
+        self.build_status.setText(f"[{stage}] {message}")
     
     def convert_icon_for_mac(self):
         """Convert .ico to .icns for macOS"""
         if hasattr(self, 'icon_status'):
-            self.icon_worker = IconWorker()
-            self.icon_worker.status_update.connect(lambda msg: self.icon_status.setText(msg))
-            self.icon_worker.log_message.connect(self.log_message)
-            self.icon_worker.start()
+            worker = IconWorker()
+            worker.status_update.connect(lambda msg: self.icon_status.setText(msg))
+            worker.log_message.connect(self.log_message)
+            if self.submit_task(worker, "Icon conversion"):
+                self.icon_worker = worker
     
     def update_status(self, message, color="white"):
         """Update the status label with message and color"""
@@ -1649,19 +2229,44 @@ Batch file created at: {batch_path}
     def log_message(self, message):
         """Add a message to the log with timestamp"""
         timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        log_entry = f"[{timestamp}] {message}"
+        for line in str(message).splitlines() or [""]:
+            self.log_model.append(f"[{timestamp}] {line}")
+        
+        if not self.log_flush_timer.isActive():
+            self.log_flush_timer.start()
+    
+    def flush_log(self):
+        """Show queued log lines, auto-scrolling only if already at the bottom"""
+        scrollbar = self.log_view.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 2
         
-        self.log_text.append(log_entry)
-        # Auto-scroll to the bottom
-        cursor = self.log_text.textCursor()
-        cursor.movePosition(cursor.End)
-        self.log_text.setTextCursor(cursor)
+        if not self.log_model.flush():
+            # Nothing queued: stop ticking until the next message
+            self.log_flush_timer.stop()
+            return
+        
+        if at_bottom:
+            self.log_view.scrollToBottom()
+    
+    def paintEvent(self, event):
+        """Record time-to-first-paint on the first paint of the window"""
+        super().paintEvent(event)
+        if self.first_paint_ms is None:
+            self.first_paint_ms = (perf_counter() - STARTUP_TIME) * 1000
+            QTimer.singleShot(0, self.report_first_paint)
+    
+    def report_first_paint(self):
+        """Log the time-to-first-paint metric"""
+        self.log_message(f"Window painted {self.first_paint_ms:.0f} ms after start")
+        startup_mark("first_paint")
+        self.report_startup_benchmark()
     
     def closeEvent(self, event):
         """Handle application closing"""
-        # Stop browser if running
-        if self.login_worker and self.login_worker.isRunning():
-            self.login_worker.stop()
+        # Stop the browser and drop anything still queued; running setup
+        # tasks finish in the background before the process exits
+        self.executor.cancel_all()
+        self.keepalive_timer.stop()
         
         # Call parent class close event
         super().closeEvent(event)
@@ -1686,6 +2291,7 @@ def load_credentials_cli():
 def save_credentials_cli(username, password, secret_key):
     """Save credentials to config file for CLI use with encryption"""
     config = ConfigParser()
+    config.read(CONFIG_PATH)  # Keep other sections such as [Prewarm]
     
     # Encrypt sensitive data before saving
     encrypted_password = encrypt_data(password)
@@ -1705,127 +2311,12 @@ def save_credentials_cli(username, password, secret_key):
     
     print("✓ Credentials saved successfully with encryption!")
 
-def cli_build():
+def cli_build(force=False):
     """CLI build mode - build executable from command line"""
     print("=== AutoBrightSpace CLI Build ===")
     print("Building standalone executable...")
     
     try:
-        # Import build functionality
-        from pathlib import Path
-        import shutil
-        
-        # Initialize build tool
-        source_file = Path(__file__).resolve()
-        
-        # Simplified build tool for CLI
-        class CLIBuildTool:
-            def __init__(self, source_file):
-                self.source_file = source_file
-                self.project_dir = source_file.parent
-                self.app_name = "AutoBrightspace"
-                self.current_os = platform.system().lower()
-                
-                self.build_dir = self.project_dir / "build"
-                self.dist_dir = self.project_dir / "dist"
-                self.icon_dir = self.project_dir / "icon"
-                
-                self.executable_names = {
-                    "windows": f"{self.app_name}.exe",
-                    "darwin": self.app_name,
-                    "linux": self.app_name
-                }
-            
-            def clean_dirs(self):
-                for dir_path in [self.build_dir, self.dist_dir]:
-                    if dir_path.exists():
-                        shutil.rmtree(dir_path)
-                        print(f"✓ Cleaned {dir_path}")
-                
-                for spec_file in self.project_dir.glob("*.spec"):
-                    spec_file.unlink()
-                    print(f"✓ Cleaned {spec_file}")
-            
-            def create_icons(self):
-                """Create missing icons from existing ones or generate defaults"""
-                try:
-                    from PIL import Image
-                    
-                    # Check which icons we have
-                    existing_icons = {}
-                    for platform in ["windows", "darwin", "linux"]:
-                        icon_extensions = {"windows": ".ico", "darwin": ".icns", "linux": ".png"}
-                        icon_path = self.icon_dir / f"AutoBrightspace{icon_extensions[platform]}"
-                        if icon_path.exists():
-                            existing_icons[platform] = icon_path
-                            print(f"✓ Found existing {platform} icon: {icon_path.name}")
-                    
-                    # If we have no icons, create defaults
-                    if not existing_icons:
-                        print("No existing icons found, creating default icons...")
-                        return self.create_default_icons()
-                    
-                    # Create missing PNG for Linux from ICO or ICNS
-                    linux_png = self.icon_dir / "AutoBrightspace.png"
-                    if not linux_png.exists() and ("windows" in existing_icons or "darwin" in existing_icons):
-                        source_icon = existing_icons.get("windows") or existing_icons.get("darwin")
-                        try:
-                            img = Image.open(source_icon)
-                            if img.mode != 'RGBA':
-                                img = img.convert('RGBA')
-                            img.save(linux_png, "PNG")
-                            print(f"✓ Created PNG icon from {source_icon.name}")
-                        except Exception as e:
-                            print(f"⚠ Could not convert to PNG: {e}")
-                    
-                    return True
-                except Exception as e:
-                    print(f"⚠ Icon processing failed: {e}")
-                    return False
-            
-            def create_default_icons(self):
-                try:
-                    from PIL import Image, ImageDraw, ImageFont
-                    
-                    self.icon_dir.mkdir(exist_ok=True)
-                    img = Image.new('RGBA', (256, 256), (31, 83, 141, 255))
-                    draw = ImageDraw.Draw(img)
-                    
-                    try:
-                        font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 120)
-                    except:
-                        font = ImageFont.load_default()
-                    
-                    text = "AB"
-                    bbox = draw.textbbox((0, 0), text, font=font)
-                    text_width = bbox[2] - bbox[0]
-                    text_height = bbox[3] - bbox[1]
-                    
-                    x = (256 - text_width) // 2
-                    y = (256 - text_height) // 2
-                    draw.text((x, y), text, fill=(255, 255, 255, 255), font=font)
-                    
-                    # Create icons for all platforms
-                    png_path = self.icon_dir / "AutoBrightspace.png"
-                    ico_path = self.icon_dir / "AutoBrightspace.ico"
-                    icns_path = self.icon_dir / "AutoBrightspace.icns"
-                    
-                    img.save(png_path, "PNG")
-                    img.save(ico_path, "ICO", sizes=[(256, 256), (128, 128), (64, 64), (32, 32), (16, 16)])
-                    print("✓ Created icons")
-                    
-                    try:
-                        img.save(icns_path, "ICNS")
-                    except:
-                        shutil.copy2(png_path, icns_path.with_suffix(".png"))
-                    
-                    return True
-                except Exception as e:
-                    print(f"⚠ Icon creation failed: {e}")
-                    return False
-        
-        build_tool = CLIBuildTool(source_file)
-        
         # Check PyInstaller
         try:
             import PyInstaller
@@ -1839,133 +2330,22 @@ def cli_build():
                 print("✗ Failed to install PyInstaller")
                 return False
         
-        # Clean and prepare
-        print("Cleaning previous builds...")
-        build_tool.clean_dirs()
-        
-        # Create icons
-        print("Creating application icons...")
-        build_tool.create_icons()
-        
-        # Determine icon path
-        icon_extensions = {"windows": ".ico", "darwin": ".icns", "linux": ".png"}
-        icon_ext = icon_extensions.get(build_tool.current_os, ".png")
-        icon_path = build_tool.icon_dir / f"AutoBrightspace{icon_ext}"
-        
-        if not icon_path.exists() and icon_ext == ".icns":
-            # Fallback to PNG for macOS if ICNS creation failed
-            icon_path = build_tool.icon_dir / "AutoBrightspace.png"
-        
-        # Build command
-        cmd = [
-            sys.executable, "-m", "PyInstaller",
-            "--onefile",
-            "--windowed",
-            "--clean",
-            "--noconfirm",
-            "--name", build_tool.app_name,
-            "--distpath", str(build_tool.dist_dir),
-            "--workpath", str(build_tool.build_dir)
-        ]
-        
-        # Add icon if available
-        if icon_path.exists():
-            cmd.extend(["--icon", str(icon_path)])
-            print(f"✓ Using icon: {icon_path.name}")
-        
-        # Add hidden imports for better compatibility
-        hidden_imports = [
-            "PyQt5.QtCore", "PyQt5.QtGui", "PyQt5.QtWidgets",
-            "selenium", "selenium.webdriver", "selenium.webdriver.chrome",
-            "webdriver_manager", "webdriver_manager.chrome", 
-            "pyotp", "cryptography", "cryptography.fernet", "appdirs"
-        ]
-        
-        for imp in hidden_imports:
-            cmd.extend(["--hidden-import", imp])
+        # Use the shared build engine from build_tool.py
+        build_tool = load_build_tool()
+        builder = build_tool.AutoBrightspaceBuildTool(os.path.abspath(__file__))
+        builder.use_cache = not force
         
-        # Exclude conflicting Qt packages and unnecessary modules
-        exclude_modules = [
-            "PySide2", "PySide6", "PyQt6", 
-            "tkinter", "matplotlib", "numpy", "pandas", "scipy",
-            "IPython", "jupyter", "notebook", "jupyterlab",
-            "sphinx", "babel", "pytest", "astroid"
-        ]
-        
-        for exc in exclude_modules:
-            cmd.extend(["--exclude-module", exc])
-        
-        cmd.append(str(build_tool.source_file))
-        
-        # Run build
-        print("Building executable with PyInstaller...")
         print("This may take a few minutes...")
-        
-        result = subprocess.run(cmd, cwd=build_tool.project_dir)
-        
-        if result.returncode == 0:
-            print("✓ Build completed successfully!")
-            
-            # Make executable on Unix systems
-            exe_name = build_tool.executable_names[build_tool.current_os]
-            exe_path = build_tool.dist_dir / exe_name
-            
-            if build_tool.current_os in ["linux", "darwin"] and exe_path.exists():
-                exe_path.chmod(0o755)
-                print("✓ Made executable file executable")
-            
-            # Create launcher script
-            if build_tool.current_os == "windows":
-                launcher_content = f'''@echo off
-cd /d "%~dp0"
-"{exe_name}" run
-if errorlevel 1 pause
-'''
-                launcher_path = build_tool.dist_dir / "AutoBrightspace_QuickLogin.bat"
-            else:
-                launcher_content = f'''#!/bin/bash
-DIR="$(cd "$(dirname "${{BASH_SOURCE[0]}}")" && pwd)"
-cd "$DIR"
-./{exe_name} run
-'''
-                launcher_path = build_tool.dist_dir / "AutoBrightspace_QuickLogin.sh"
-            
-            try:
-                launcher_path.write_text(launcher_content)
-                if build_tool.current_os != "windows":
-                    launcher_path.chmod(0o755)
-                print(f"✓ Created launcher: {launcher_path.name}")
-            except Exception as e:
-                print(f"⚠ Could not create launcher: {e}")
-            
-            # Show results
-            if exe_path.exists():
-                size_mb = exe_path.stat().st_size / (1024 * 1024)
-                print(f"\n🎉 Build completed successfully!")
-                print(f"📁 Location: {exe_path}")
-                print(f"📊 Size: {size_mb:.1f} MB")
-                
-                print(f"\n📋 Usage:")
-                if build_tool.current_os == "windows":
-                    print(f"• Double-click: {exe_name}")
-                    print(f"• Command: {exe_name}")
-                    print(f"• CLI login: {exe_name} run")
-                    print(f"• Configure: {exe_name} config")
-                    print(f"• Quick login: AutoBrightspace_QuickLogin.bat")
-                else:
-                    print(f"• Double-click: {exe_name} (if supported)")
-                    print(f"• Terminal: ./{exe_name}")
-                    print(f"• CLI login: ./{exe_name} run")
-                    print(f"• Configure: ./{exe_name} config")
-                    print(f"• Quick login: ./AutoBrightspace_QuickLogin.sh")
-                
-                print(f"\n💡 The launcher script provides instant login")
-                print(f"   (same as 'python AutoBrightSpace.py run')")
-            
-            return True
-        else:
+        if not builder.build_executable():
             print("✗ Build failed!")
             return False
+        
+        builder.create_launcher_script()
+        builder.print_build_summary()
+        
+        print(f"\n💡 The launcher script provides instant login")
+        print(f"   (same as 'python AutoBrightSpace.py run')")
+        return True
             
     except Exception as e:
         print(f"✗ Build error: {e}")
@@ -2049,17 +2429,132 @@ def cli_config():
     else:
         print("✗ Configuration incomplete. Please provide all credentials.")
 
-def create_robust_chrome_driver():
-    """Standalone function to create Chrome driver with robust error handling"""
+def cli_prewarm(benchmark=False, latency=150):
+    """Show the per-host pre-warm settings and time a warm-up, or benchmark it locally"""
+    from login_orchestrator import PreparedLogin, SSO_HOSTS, warm_up
+    
+    plan = load_prewarm_config(CONFIG_PATH)
+    if benchmark:
+        import stand_in_idp
+        stand_in_idp.benchmark(list(plan) or SSO_HOSTS, handshake_latency=latency / 1000)
+        return True
+    
+    print("=== Connection Pre-warming ===")
+    if not plan:
+        print("Pre-warming is off for every host.")
+        return True
+    prepared = PreparedLogin()
+    shared_event_loop().run(warm_up(prepared, plan))
+    for host, mode in plan.items():
+        ms = prepared.warm_hosts.get(host)
+        result = f"{ms:>6.0f} ms" if ms is not None else "  failed"
+        print(f"  {host:<40} {mode:<11} {result}")
+    print(f"Change a host's mode (off, dns, tls, preconnect) in the [Prewarm] section of {CONFIG_PATH}")
+    return all(ms is not None for ms in prepared.warm_hosts.values())
+
+def cli_keepalive():
+    """Keep the stored session alive in the foreground until Ctrl+C"""
+    print("=== AutoBrightSpace Session Keep-alive ===")
+    if SESSION_STORE.saved_at() is None:
+        print("No stored session yet; it is saved after the next successful login.")
+    KeepAliveScheduler(SESSION_STORE, TELEMETRY).run()
+    return True
+
+def cli_sync(output=None, workers=8, per_host=4, base_url=None, use_cache=True):
+    """Download the files of every course with the stored session"""
+    from brightspace_api import BrightspaceClient, SessionExpired, BrightspaceError
+    from content_sync import sync
+    
+    print("=== AutoBrightSpace Course Sync ===")
+    output = os.path.abspath(os.path.expanduser(output or os.path.join('~', 'Brightspace')))
+    cookies = SESSION_STORE.load()
+    if not cookies and not base_url:
+        print("✗ No stored session. Log in once with 'python AutoBrightSpace.py run' first.")
+        return False
+    
+    cache = open_api_cache() if use_cache else None
+    client_args = {'cookies': cookies, 'per_host_limit': per_host, 'cache': cache,
+                   'on_set_cookie': SESSION_STORE.merge}
+    if base_url:
+        client_args['base_url'] = base_url
+        client_args.pop('on_set_cookie')  # A stand-in's cookies must not reach the stored session
+    print(f"Syncing into {output} ({workers} workers, {per_host} connections per host)")
+    try:
+        with BrightspaceClient(**client_args) as client:
+            report = sync(client, output, workers=workers)
+    except SessionExpired:
+        print("✗ The stored session has expired. Log in again with 'python AutoBrightSpace.py run'.")
+        return False
+    except BrightspaceError as e:
+        print(f"✗ Sync failed: {e}")
+        return False
+    except KeyboardInterrupt:
+        print("\nSync interrupted; the next run resumes where this one stopped")
+        return False
+    print(report.summary())
+    if cache:
+        print(cache.summary())
+    return report.failed == 0
+
+def cli_watch(interval=5, per_host=4, base_url=None, as_json=False):
+    """Poll announcements and assignments with the stored session and print what is new"""
+    from brightspace_api import BrightspaceClient
+    from course_watch import CourseWatcher, WatchStore, json_line
+    
+    log = (lambda message: print(message, file=sys.stderr)) if as_json else print
+    log("=== AutoBrightSpace Watch ===")
+    cookies = SESSION_STORE.load()
+    if not cookies and not base_url:
+        log("✗ No stored session. Log in once with 'python AutoBrightSpace.py run' first.")
+        return False
+    
+    # Every poll revalidates; unchanged feeds are answered with 304
+    cache = open_api_cache()
+    if cache:
+        cache.min_fresh = 0
+    client_args = {'cookies': cookies, 'per_host_limit': per_host, 'cache': cache,
+                   'on_set_cookie': SESSION_STORE.merge}
+    store_name = 'watch.sqlite3'
+    if base_url:
+        client_args['base_url'] = base_url
+        client_args.pop('on_set_cookie')
+        store_name = f"watch-{hashlib.sha1(base_url.encode()).hexdigest()[:8]}.sqlite3"
+    with BrightspaceClient(**client_args) as client:
+        watcher = CourseWatcher(client, WatchStore(os.path.join(CONFIG_DIR, store_name)),
+                                interval=interval * 60, emit=json_line if as_json else None, log=log)
+        return watcher.run()
+
+def chrome_service(driver_path, popen_kw=None):
+    """ChromeDriver service, spawned with popen_kw where selenium supports it (4.11+)"""
+    from selenium.webdriver.chrome.service import Service
+    if popen_kw:
+        try:
+            return Service(driver_path, popen_kw=popen_kw)
+        except TypeError:
+            pass  # Older selenium; the caller applies limits to the started processes instead
+    return Service(driver_path)
+
+def create_robust_chrome_driver(popen_kw=None):
+    """Standalone function to create Chrome driver with robust error handling
+    
+    popen_kw is passed to the chromedriver subprocess, e.g. ResourceGovernor.popen_kw().
+    """
     import glob
     from selenium import webdriver
-    from selenium.webdriver.chrome.service import Service
     from webdriver_manager.chrome import ChromeDriverManager
     
+    # Method 0: ChromeDriver installed from an offline wheelhouse
+    if os.path.exists(BUNDLED_DRIVER_PATH) and os.access(BUNDLED_DRIVER_PATH, os.X_OK):
+        try:
+            print(f"Using bundled ChromeDriver: {BUNDLED_DRIVER_PATH}")
+            return webdriver.Chrome(service=chrome_service(BUNDLED_DRIVER_PATH, popen_kw))
+        except Exception as e:
+            print(f"Bundled ChromeDriver failed: {str(e)}")
+    
     # Method 1: Try webdriver-manager
     try:
         print("Attempting to download ChromeDriver...")
-        service = Service(ChromeDriverManager().install())
+        service = chrome_service(ChromeDriverManager().install(), popen_kw)
         
         # Verify the downloaded driver is actually executable
         driver_path = service.path
@@ -2087,7 +2582,7 @@ def create_robust_chrome_driver():
             for driver_path in potential_drivers:
                 if os.path.exists(driver_path) and os.access(driver_path, os.X_OK):
                     print(f"Found working ChromeDriver: {driver_path}")
-                    service = Service(driver_path)
+                    service = chrome_service(driver_path, popen_kw)
                     return webdriver.Chrome(service=service)
                 elif os.path.exists(driver_path):
                     # Make it executable if it exists but isn't executable
@@ -2095,7 +2590,7 @@ def create_robust_chrome_driver():
                         os.chmod(driver_path, 0o755)
                         if os.access(driver_path, os.X_OK):
                             print(f"Fixed and using ChromeDriver: {driver_path}")
-                            service = Service(driver_path)
+                            service = chrome_service(driver_path, popen_kw)
                             return webdriver.Chrome(service=service)
                     except Exception as e:
                         print(f"Could not fix permissions: {e}")
@@ -2108,7 +2603,7 @@ def create_robust_chrome_driver():
         if result.returncode == 0:
             system_driver = result.stdout.strip()
             print(f"Using system ChromeDriver: {system_driver}")
-            service = Service(system_driver)
+            service = chrome_service(system_driver, popen_kw)
             return webdriver.Chrome(service=service)
     except Exception as e:
         print(f"System chromedriver check failed: {str(e)}")
@@ -2122,19 +2617,73 @@ def create_robust_chrome_driver():
     
     return None
 
-def cli_run():
+def wait_for_browser_close(driver):
+    """Block until the user closes the browser (or presses Ctrl+C)"""
+    try:
+        BrowserMonitor(driver, log=print).wait()
+    except KeyboardInterrupt:
+        print("\nInterrupted, closing browser...")
+        try:
+            driver.quit()
+        except Exception:
+            pass
+    except Exception:
+        pass
+
+def cli_run(governor=None):
     """CLI run mode - automated login without GUI"""
     print("=== AutoBrightSpace CLI Login ===")
     
-    # Load credentials
-    username, password, secret_key = load_credentials_cli()
-    
-    if not all([username, password, secret_key]):
+    # Only a missing config is checked up front; decryption overlaps Chrome's startup
+    if not os.path.exists(CONFIG_PATH):
         print("✗ Credentials not configured. Please run:")
         print("python AutoBrightSpace.py config")
         return False
     
-    print(f"Starting automated login for user: {username}")
+    # Clean up browsers leaked by a previous crash
+    message = format_reap_report(PROCESS_REGISTRY.reap())
+    if message:
+        print(message)
+    
+    driver = None
+    registry_id = None
+    trace = LoginTrace('cli')
+    commands = CommandRecorder()
+    
+    def record(branch, error=None):
+        if trace.finish(branch, error):
+            commands.add_to_trace(trace)
+            TELEMETRY.record(trace)
+            saved = trace.metrics.get('round_trips_saved')
+            if saved:
+                print(f"⚡ Scripted form fill saved {saved} WebDriver round trips")
+            count, total = commands.totals()
+            if count:
+                print(f"📋 {count} WebDriver commands, {total:.0f} ms in chromedriver:")
+                for line in commands.histogram():
+                    print(f"  {line}")
+    
+    def store_session():
+        """Save the cookies once the login has landed on Brightspace"""
+        try:
+            WebDriverWait(driver, 15).until(
+                lambda d: d.current_url.startswith("https://brightspace.universiteitleiden.nl"))
+        except Exception:
+            print("⚠ Brightspace did not load; session not stored")
+            return
+        save_session(lambda: driver.execute_cdp_cmd('Network.getAllCookies', {})['cookies'])
+    
+    def start_driver():
+        nonlocal driver, registry_id
+        driver = create_robust_chrome_driver(governor.popen_kw() if governor else None)
+        if driver:
+            session_pids = session_root_pids(driver)
+            registry_id = PROCESS_REGISTRY.register(session_pids)
+            commands.attach(driver)
+            if governor:
+                governor.apply_to_processes(session_pids)
+                governor.watch(session_pids, lambda: kill_process_tree(expand_process_tree(session_pids)))
+        return driver
     
     try:
         # Initialize Chrome driver with robust error handling
@@ -2146,19 +2695,46 @@ def cli_run():
         from selenium.webdriver.support.ui import WebDriverWait
         from selenium.webdriver.support import expected_conditions as EC
         
-        driver = create_robust_chrome_driver()
+        prewarm = load_prewarm_config(CONFIG_PATH)
+        prepared = shared_event_loop().run(prepare_login(
+            start_driver, load_credentials_cli, hosts=prewarm, probe_session=SESSION_STORE.probe))
+        username, password, secret_key = prepared.credentials
+        if not all([username, password, secret_key]):
+            print("✗ Credentials not configured. Please run:")
+            print("python AutoBrightSpace.py config")
+            record('error', "Credentials not configured")
+            return False
         if not driver:
             print("✗ Failed to initialize Chrome browser")
+            record('error', "Failed to initialize Chrome browser")
             return False
+        trace.stage('driver_start')
+        trace.count('prepare.overlap_ms', round(prepared.overlap_ms, 1))
+        print(prepared.summary())
+        print(f"Starting automated login for user: {username}")
+        
+        # A live stored session skips the IdP chain entirely
+        restored = restore_session(
+            prepared, lambda cookies: driver.execute_cdp_cmd('Network.setCookies', {'cookies': cookies}))
+        if not restored:
+            trace.count('prewarm.preconnects', preconnect(driver.execute_script, prewarm))
         
         print("Navigating to Brightspace...")
         driver.get("https://brightspace.universiteitleiden.nl")
         
         WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
         current_url = driver.current_url
+        trace.stage('navigate')
+        if not current_url.startswith("https://brightspace.universiteitleiden.nl"):
+            if restored:
+                print("⚠ Stored session was not accepted, logging in")
+            trace.count('prewarm.preconnects', preconnect(
+                driver.execute_script, prewarm, skip=visited_hosts(current_url)))
+        via_surfconext = False
         
         # Handle SURFconext university selection page
         if current_url.startswith("https://engine.surfconext.nl/authentication/idp"):
+            via_surfconext = True
             print("Selecting Leiden University...")
             try:
                 leiden_button = WebDriverWait(driver, 10).until(
@@ -2185,22 +2761,21 @@ def cli_run():
                     current_url = driver.current_url
                 except Exception as e2:
                     print(f"✗ Both methods failed: {str(e2)}")
+                    record('failure', f"SURFconext selection failed: {e2}")
                     return False
+            trace.stage('surfconext')
         
         if current_url.startswith("https://login.uaccess.leidenuniv.nl"):
             print("Entering credentials...")
             
-            username_input = driver.find_element(By.NAME, "Ecom_User_ID")
-            password_input = driver.find_element(By.NAME, "Ecom_Password")
-            
-            username_input.send_keys(username)
-            password_input.send_keys(password)
-            
-            login_button = driver.find_element(By.ID, "loginbtn")
-            login_button.click()
+            trace.count('round_trips_saved', fill_form(
+                driver,
+                [(By.NAME, "Ecom_User_ID", username), (By.NAME, "Ecom_Password", password)],
+                (By.ID, "loginbtn")))
             
             WebDriverWait(driver, 10).until(lambda d: d.current_url != current_url)
             redirected_url = driver.current_url
+            trace.stage('credentials')
             
             if redirected_url.startswith("https://mfa.services.universiteitleiden.nl"):
                 print("Processing 2FA...")
@@ -2209,61 +2784,316 @@ def cli_run():
                 next_button.click()
                 
                 totp = pyotp.TOTP(secret_key)
-                totp_code = totp.now()
+                totp_code = fresh_totp_code(totp, prepared.clock_skew)
                 
                 print(f"Generated TOTP code: {totp_code}")
                 
                 WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.ID, "nffc")))
-                code_input = driver.find_element(By.ID, "nffc")
-                code_input.send_keys(totp_code)
-                
-                next_button_after_code = driver.find_element(By.ID, "loginButton2")
-                next_button_after_code.click()
+                trace.count('round_trips_saved', fill_form(
+                    driver, [(By.ID, "nffc", totp_code)], (By.ID, "loginButton2")))
+                trace.stage('mfa')
+                record('surfconext+mfa' if via_surfconext else 'mfa')
                 
                 print("✓ Login successful! Browser is ready to use.")
                 print("Close the browser window when you're done.")
+                store_session()
                 
                 # Keep the script running until browser is closed
-                try:
-                    while driver.current_window_handle:
-                        sleep(1)
-                except Exception:
-                    pass
+                wait_for_browser_close(driver)
                 
             else:
                 print("✗ Login failed - check credentials")
+                record('failure', f"Unexpected redirect: {redirected_url}")
                 return False
                 
         elif current_url.startswith("https://brightspace.universiteitleiden.nl"):
             print("✓ Already logged in!")
+            record('session_restored' if restored else 'already_logged_in')
             print("Browser is ready to use. Close the window when done.")
+            store_session()
             
             # Keep running until browser is closed
+            wait_for_browser_close(driver)
+        else:
+            print(f"? Unknown page detected: {current_url}")
+            record('unknown_page', current_url)
+            return False
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Error during login: {str(e)}")
+        record('error', str(e))
+        return False
+    finally:
+        record('cancelled')  # Only counts if the attempt was interrupted
+        if governor:
+            governor.stop()
+            if governor.peak_rss:
+                print(f"Peak browser memory: {governor.peak_rss / (1024 * 1024):.0f} MB")
+        if driver:
             try:
-                while driver.current_window_handle:
-                    sleep(1)
+                driver.quit()
             except Exception:
                 pass
+        PROCESS_REGISTRY.unregister(registry_id)
+
+def cli_run_cdp(governor=None):
+    """CLI run mode over the DevTools protocol, without chromedriver"""
+    print("=== AutoBrightSpace CLI Login (CDP) ===")
+    
+    if not os.path.exists(CONFIG_PATH):
+        print("✗ Credentials not configured. Please run:")
+        print("python AutoBrightSpace.py config")
+        return False
+    
+    message = format_reap_report(PROCESS_REGISTRY.reap())
+    if message:
+        print(message)
+    
+    from cdp_backend import CDPBrowser, CDPError
+    
+    browser = None
+    registry_id = None
+    trace = LoginTrace('cli-cdp')
+    commands = CommandRecorder()
+    
+    def record(branch, error=None):
+        if trace.finish(branch, error):
+            commands.add_to_trace(trace)
+            TELEMETRY.record(trace)
+            saved = trace.metrics.get('round_trips_saved')
+            if saved:
+                print(f"⚡ Scripted form fill saved {saved} round trips")
+            count, total = commands.totals()
+            if count:
+                print(f"📋 {count} DevTools commands, {total:.0f} ms in Chrome:")
+                for line in commands.histogram():
+                    print(f"  {line}")
+    
+    def submit_form(fields, submit):
+        """Fill and submit a form with the shared script; returns round trips saved"""
+        result = browser.call_function(FILL_FORM_SCRIPT, [list(field) for field in fields], list(submit))
+        if not result or not result.get('submitted'):
+            missing = ', '.join(result.get('missing', [])) if result else '?'
+            raise CDPError(f"Form fill incomplete (missing: {missing})")
+        return 2 * len(fields) + 1
+    
+    def store_session():
+        """Save the cookies once the login has landed on Brightspace"""
+        deadline = perf_counter() + 15
+        while True:
+            try:
+                if (browser.current_url or '').startswith("https://brightspace.universiteitleiden.nl"):
+                    break
+            except CDPError:
+                pass  # Mid-navigation
+            if perf_counter() >= deadline:
+                print("⚠ Brightspace did not load; session not stored")
+                return
+            sleep(0.2)
+        save_session(browser.get_cookies)
+    
+    def start_browser():
+        nonlocal browser, registry_id
+        browser = CDPBrowser.launch(recorder=commands, popen_kw=governor.popen_kw() if governor else None)
+        registry_id = PROCESS_REGISTRY.register([browser.pid])
+        if governor:
+            governor.apply_to_processes([browser.pid])
+            governor.watch([browser.pid], lambda: kill_process_tree(expand_process_tree([browser.pid])))
+        return browser
+    
+    try:
+        print("Launching Chrome with remote debugging...")
+        prewarm = load_prewarm_config(CONFIG_PATH)
+        try:
+            prepared = shared_event_loop().run(prepare_login(
+                start_browser, load_credentials_cli, hosts=prewarm, probe_session=SESSION_STORE.probe))
+        except CDPError as e:
+            print(f"✗ Failed to start Chrome: {str(e)}")
+            record('error', str(e))
+            return False
+        username, password, secret_key = prepared.credentials
+        if not all([username, password, secret_key]):
+            print("✗ Credentials not configured. Please run:")
+            print("python AutoBrightSpace.py config")
+            record('error', "Credentials not configured")
+            return False
+        trace.stage('driver_start')
+        trace.count('prepare.overlap_ms', round(prepared.overlap_ms, 1))
+        print(prepared.summary())
+        print(f"Starting automated login for user: {username}")
+        
+        # A live stored session skips the IdP chain entirely
+        restored = restore_session(prepared, browser.set_cookies)
+        if not restored:
+            trace.count('prewarm.preconnects', preconnect(browser.call_function, prewarm))
+        
+        print("Navigating to Brightspace...")
+        browser.navigate("https://brightspace.universiteitleiden.nl")
+        browser.wait_for_selector("body")
+        current_url = browser.current_url
+        trace.stage('navigate')
+        if not current_url.startswith("https://brightspace.universiteitleiden.nl"):
+            if restored:
+                print("⚠ Stored session was not accepted, logging in")
+            trace.count('prewarm.preconnects', preconnect(
+                browser.call_function, prewarm, skip=visited_hosts(current_url)))
+        via_surfconext = False
+        
+        # Handle SURFconext university selection page
+        if current_url.startswith("https://engine.surfconext.nl/authentication/idp"):
+            via_surfconext = True
+            print("Selecting Leiden University...")
+            try:
+                selector = "div[data-entityid='https://login.uaccess.leidenuniv.nl/nidp/saml2/metadata']"
+                browser.wait_for_selector(selector)
+                browser.click(selector)
+                print("✓ Selected Leiden University")
+                current_url = browser.wait_for_url_change(current_url)
+            except CDPError as e:
+                print(f"Failed to select Leiden University: {str(e)}")
+                try:
+                    selector = ("form[action='https://engine.surfconext.nl/authentication/idp/process-wayf'] "
+                                "button[type=submit]")
+                    browser.wait_for_selector(selector, timeout=5)
+                    browser.click(selector)
+                    print("✓ Used fallback method")
+                    current_url = browser.wait_for_url_change(current_url)
+                except CDPError as e2:
+                    print(f"✗ Both methods failed: {str(e2)}")
+                    record('failure', f"SURFconext selection failed: {e2}")
+                    return False
+            trace.stage('surfconext')
+        
+        if current_url.startswith("https://login.uaccess.leidenuniv.nl"):
+            print("Entering credentials...")
+            
+            browser.wait_for_selector("input[name='Ecom_User_ID']")
+            trace.count('round_trips_saved', submit_form(
+                [(By.NAME, "Ecom_User_ID", username), (By.NAME, "Ecom_Password", password)],
+                (By.ID, "loginbtn")))
+            
+            redirected_url = browser.wait_for_url_change(current_url)
+            trace.stage('credentials')
+            
+            if redirected_url.startswith("https://mfa.services.universiteitleiden.nl"):
+                print("Processing 2FA...")
+                
+                browser.wait_for_selector("#loginButton2")
+                browser.click("#loginButton2")
+                
+                totp = pyotp.TOTP(secret_key)
+                totp_code = fresh_totp_code(totp, prepared.clock_skew)
+                
+                print(f"Generated TOTP code: {totp_code}")
+                
+                browser.wait_for_selector("#nffc")
+                trace.count('round_trips_saved', submit_form(
+                    [(By.ID, "nffc", totp_code)], (By.ID, "loginButton2")))
+                trace.stage('mfa')
+                record('surfconext+mfa' if via_surfconext else 'mfa')
+                
+                print("✓ Login successful! Browser is ready to use.")
+                print("Close the browser window when you're done.")
+                store_session()
+                browser.wait_closed()
+                
+            else:
+                print("✗ Login failed - check credentials")
+                record('failure', f"Unexpected redirect: {redirected_url}")
+                return False
+                
+        elif current_url.startswith("https://brightspace.universiteitleiden.nl"):
+            print("✓ Already logged in!")
+            record('session_restored' if restored else 'already_logged_in')
+            print("Browser is ready to use. Close the window when done.")
+            store_session()
+            browser.wait_closed()
         else:
             print(f"? Unknown page detected: {current_url}")
+            record('unknown_page', current_url)
             return False
         
         return True
         
+    except KeyboardInterrupt:
+        print("\nInterrupted, closing browser...")
+        return trace.success
     except Exception as e:
         print(f"✗ Error during login: {str(e)}")
+        record('error', str(e))
         return False
+    finally:
+        record('cancelled')  # Only counts if the attempt was interrupted
+        if governor:
+            governor.stop()
+            if governor.peak_rss:
+                print(f"Peak browser memory: {governor.peak_rss / (1024 * 1024):.0f} MB")
+        if browser:
+            try:
+                browser.close()
+            except Exception:
+                pass
+        PROCESS_REGISTRY.unregister(registry_id)
 
 def main():
     parser = argparse.ArgumentParser(description='AutoBrightSpace - University Login Automation')
-    parser.add_argument('mode', nargs='?', choices=['run', 'config', 'build'], 
-                       help='CLI mode: "run" for automated login, "config" to set credentials, "build" to create executable')
+    parser.add_argument('mode', nargs='?', choices=['run', 'config', 'build', 'install', 'wheelhouse', 'stats', 'prewarm', 'keepalive', 'sync', 'watch'], 
+                       help='CLI mode: "run" for automated login, "config" to set credentials, "build" to create executable, '
+                            '"install" to install dependencies, "wheelhouse" to bundle dependencies for offline installs, '
+                            '"stats" to show login timings and success rate, "prewarm" to check connection pre-warming, '
+                            '"keepalive" to keep the stored session alive, "sync" to download course files, '
+                            '"watch" to report new announcements and assignments')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='build: force a full clean build even if nothing changed; '
+                            'sync: bypass the API response cache')
+    parser.add_argument('--wheelhouse', metavar='PATH',
+                       help='install: install offline from this wheelhouse directory or archive')
+    parser.add_argument('--output', metavar='DIR',
+                       help='wheelhouse, sync: output directory (default: ./wheelhouse, ~/Brightspace)')
+    parser.add_argument('--archive', action='store_true',
+                       help='wheelhouse: also pack the wheelhouse into a .zip archive')
+    parser.add_argument('--days', type=int, default=30, metavar='N',
+                       help='stats: only include logins from the last N days (default: 30)')
+    parser.add_argument('--nice', type=int, metavar='N',
+                       help='run: lower the browser\'s scheduling priority by N')
+    parser.add_argument('--cpu-limit', type=int, metavar='SECONDS',
+                       help='run: cap the CPU time of each browser process (Unix only)')
+    parser.add_argument('--memory-limit', type=int, metavar='MB',
+                       help='run: stop the session when the browser uses more memory than this')
+    parser.add_argument('--benchmark', action='store_true',
+                       help='prewarm: measure the saving against a local stand-in IdP')
+    parser.add_argument('--latency', type=int, default=150, metavar='MS',
+                       help='prewarm: handshake latency the stand-in IdP injects (default: 150)')
+    parser.add_argument('--backend', choices=['selenium', 'cdp'], default='selenium',
+                       help='run: drive Chrome through chromedriver (selenium) or directly over the '
+                            'DevTools protocol (cdp)')
+    parser.add_argument('--workers', type=int, default=8, metavar='N',
+                       help='sync: number of parallel downloads (default: 8)')
+    parser.add_argument('--per-host', type=int, default=4, metavar='N',
+                       help='sync, watch: most connections to one host at a time (default: 4)')
+    parser.add_argument('--base-url', metavar='URL',
+                       help='sync, watch: API base URL, e.g. a local stand-in (python stand_in_idp.py)')
+    parser.add_argument('--interval', type=float, default=5, metavar='MIN',
+                       help='watch: base polling interval in minutes (default: 5, at least 1)')
+    parser.add_argument('--json', action='store_true',
+                       help='watch: print new items as JSON lines, for scripts')
     
     args = parser.parse_args()
     
+    if args.mode:
+        startup_profile_finish("argument_parsing")
+    
     if args.mode == 'run':
         # CLI run mode
-        success = cli_run()
+        governor = None
+        if args.nice or args.cpu_limit or args.memory_limit:
+            governor = ResourceGovernor(args.nice, args.cpu_limit, args.memory_limit, log=print)
+        if args.backend == 'cdp':
+            success = cli_run_cdp(governor)
+        else:
+            success = cli_run(governor)
         sys.exit(0 if success else 1)
     elif args.mode == 'config':
         # CLI config mode
@@ -2271,13 +3101,44 @@ def main():
         sys.exit(0)
     elif args.mode == 'build':
         # CLI build mode
-        success = cli_build()
+        success = cli_build(force=args.no_cache)
+        sys.exit(0 if success else 1)
+    elif args.mode == 'install':
+        # CLI dependency installation, optionally offline
+        success = install_requirements(args.wheelhouse)
+        sys.exit(0 if success else 1)
+    elif args.mode == 'wheelhouse':
+        # Bundle wheels and ChromeDriver for offline installs
+        success = create_wheelhouse(args.output or 'wheelhouse', archive=args.archive)
+        sys.exit(0 if success else 1)
+    elif args.mode == 'stats':
+        # Login latency percentiles and success rate
+        print_stats(TELEMETRY, days=args.days)
+        print_cache_stats(ApiCache(API_CACHE_PATH, *load_cache_config(CONFIG_PATH)[1:]))
+    elif args.mode == 'keepalive':
+        # Refresh the stored session on an adaptive schedule
+        success = cli_keepalive()
+        sys.exit(0 if success else 1)
+    elif args.mode == 'prewarm':
+        # Per-host warm-up timings, or a local benchmark of pre-warming
+        success = cli_prewarm(benchmark=args.benchmark, latency=args.latency)
+        sys.exit(0 if success else 1)
+    elif args.mode == 'sync':
+        # Download course files with the stored session
+        success = cli_sync(args.output, workers=args.workers, per_host=args.per_host, base_url=args.base_url,
+                           use_cache=not args.no_cache)
+        sys.exit(0 if success else 1)
+    elif args.mode == 'watch':
+        # Poll for new announcements and assignments with the stored session
+        success = cli_watch(args.interval, per_host=args.per_host, base_url=args.base_url, as_json=args.json)
         sys.exit(0 if success else 1)
     else:
         # GUI mode (default)
         app = QApplication(sys.argv)
+        startup_mark("qapplication")
         window = AutoBrightspaceApp()
         window.show()
+        startup_mark("show")
         sys.exit(app.exec_())
 
 if __name__ == "__main__":
@@ -0,0 +1,266 @@
+"""
+Brightspace Valence API client for AutoBrightspace
+
+Talks to the REST API with the cookies of the stored SSO session instead of
+a browser. Connections are kept alive and pooled per host, with at most
+per_host_limit requests in flight to one host however many threads share
+the client, so bulk work like the sync command reuses a few warm TLS
+connections instead of opening one per request. JSON GETs go through an
+http_cache.ApiCache if one is given. A 401/403 or a redirect to a login
+page raises SessionExpired: the stored session needs a new login.
+"""
+
+import ssl
+import json
+import threading
+import contextlib
+import http.client
+import urllib.parse
+
+from session_probe import BRIGHTSPACE_HOST, domain_matches, is_expired, is_login_redirect, apply_set_cookies
+
+# API versions the requests are written against
+LP_VERSION = '1.26'
+LE_VERSION = '1.34'
+DEFAULT_TIMEOUT = 30.0
+PER_HOST_LIMIT = 4
+MAX_REDIRECTS = 5
+# Org unit type of a course offering
+COURSE_OFFERING = 3
+
+class BrightspaceError(Exception):
+    """An API request failed"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+class SessionExpired(BrightspaceError):
+    """The stored session was rejected; a new login is needed"""
+
+class ConnectionPool:
+    """Keep-alive connections to one origin, at most limit of them in use at once"""
+
+    def __init__(self, scheme, netloc, limit, timeout, ssl_context=None):
+        self.scheme = scheme
+        self.netloc = netloc
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self.opened = 0
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+
+    def _new(self):
+        with self._lock:
+            self.opened += 1
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.netloc, timeout=self.timeout,
+                                               context=self.ssl_context or ssl.create_default_context())
+        return http.client.HTTPConnection(self.netloc, timeout=self.timeout)
+
+    def acquire(self):
+        """Wait for a free slot; returns (connection, reused)"""
+        self._slots.acquire()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._new(), False
+
+    def release(self, connection, reusable):
+        if reusable:
+            with self._lock:
+                self._idle.append(connection)
+        else:
+            connection.close()
+        self._slots.release()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+class BrightspaceClient:
+    """Pooled HTTP client for the Brightspace API, authenticated by session cookies"""
+
+    def __init__(self, base_url=f"https://{BRIGHTSPACE_HOST}", cookies=(),
+                 per_host_limit=PER_HOST_LIMIT, timeout=DEFAULT_TIMEOUT, ssl_context=None, cache=None,
+                 on_set_cookie=None):
+        self.base_url = base_url.rstrip('/')
+        self.host = urllib.parse.urlsplit(self.base_url).hostname
+        self.cookies = [cookie for cookie in cookies if not is_expired(cookie)]
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self.cache = cache          # http_cache.ApiCache for get_json, or None
+        # Called with (host, Set-Cookie headers) when a response renews the session,
+        # e.g. SessionStore.merge to keep the stored session current
+        self.on_set_cookie = on_set_cookie
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def connections_opened(self):
+        return sum(pool.opened for pool in self._pools.values())
+
+    def _pool(self, scheme, netloc):
+        with self._lock:
+            key = (scheme, netloc)
+            if key not in self._pools:
+                self._pools[key] = ConnectionPool(scheme, netloc, self.per_host_limit,
+                                                  self.timeout, self.ssl_context)
+            return self._pools[key]
+
+    def _cookie_header(self, host):
+        with self._lock:
+            return '; '.join(f"{cookie['name']}={cookie['value']}" for cookie in self.cookies
+                             if domain_matches(cookie.get('domain', ''), host))
+
+    def _renew_cookies(self, host, response):
+        set_cookies = response.msg.get_all('Set-Cookie')
+        if not set_cookies:
+            return
+        with self._lock:
+            changed = apply_set_cookies(self.cookies, host, set_cookies)
+        if changed and self.on_set_cookie:
+            self.on_set_cookie(host, set_cookies)
+
+    def _send(self, pool, method, target, headers):
+        """Send a request on a pooled connection, retrying once if a kept-alive one went stale"""
+        connection, reused = pool.acquire()
+        for attempt in range(2):
+            try:
+                connection.request(method, target, headers=headers)
+                return connection, connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()  # The next request reconnects
+                if reused and not attempt:
+                    continue
+                pool.release(connection, False)
+                raise
+            except BaseException:
+                pool.release(connection, False)
+                raise
+
+    @contextlib.contextmanager
+    def open(self, method, url, headers=None):
+        """Send a request and yield the response, following redirects
+
+        url may be relative to base_url. The connection goes back to the
+        pool when the block ends with the body read, and is closed otherwise.
+        """
+        url = urllib.parse.urljoin(self.base_url + '/', url)
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urllib.parse.urlsplit(url)
+            request_headers = {'Host': parts.netloc, 'User-Agent': 'AutoBrightspace',
+                               'Accept-Encoding': 'identity', **(headers or {})}
+            cookie = self._cookie_header(parts.hostname)
+            if cookie:
+                request_headers['Cookie'] = cookie
+            pool = self._pool(parts.scheme, parts.netloc)
+            target = parts.path + (f"?{parts.query}" if parts.query else '')
+            try:
+                connection, response = self._send(pool, method, target or '/', request_headers)
+            except (OSError, http.client.HTTPException) as e:
+                raise BrightspaceError(f"{method} {parts.path}: {e or type(e).__name__}") from e
+            self._renew_cookies(parts.hostname, response)
+
+            if response.status in (301, 302, 303, 307, 308):
+                location = response.getheader('Location', '')
+                response.read()
+                pool.release(connection, not response.will_close)
+                if not location or is_login_redirect(location, parts.hostname):
+                    raise SessionExpired(f"{method} {parts.path} redirected to a login page", response.status)
+                url = urllib.parse.urljoin(url, location)
+                continue
+
+            try:
+                if response.status in (401, 403):
+                    response.read()
+                    raise SessionExpired(f"{method} {parts.path}: HTTP {response.status}", response.status)
+                if response.status >= 400 and response.status != 416:
+                    response.read()
+                    raise BrightspaceError(f"{method} {parts.path}: HTTP {response.status} {response.reason}",
+                                           response.status)
+                yield response
+            finally:
+                # Only a connection whose response was read to the end can be reused
+                pool.release(connection, response.isclosed() and not response.will_close)
+            return
+        raise BrightspaceError(f"{method} {url}: too many redirects")
+
+    def get_json(self, path, params=None):
+        """GET an API path and decode its JSON body, through the cache if there is one"""
+        if params:
+            path += ('&' if '?' in path else '?') + urllib.parse.urlencode(params)
+        url = urllib.parse.urljoin(self.base_url + '/', path)
+        entry = self.cache.lookup(url) if self.cache else None
+        if entry and entry.fresh():
+            self.cache.touch(entry)
+            self.cache.record('hit', len(entry.body))
+            return json.loads(entry.body)
+
+        headers = {'Accept': 'application/json', **(entry.validators() if entry else {})}
+        with self.open('GET', path, headers) as response:
+            body = response.read()
+            if response.status == 304 and entry:
+                self.cache.refresh(entry, response.msg)
+                self.cache.record('revalidated', len(entry.body))
+                body = entry.body
+            elif self.cache and response.status == 200:
+                self.cache.store(url, response.msg, body)
+                self.cache.record('miss')
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            raise BrightspaceError(f"GET {path}: invalid JSON ({e})") from e
+
+    def paged(self, path, params=None):
+        """Yield the Items of a paged result set, following its bookmarks"""
+        params = dict(params or {})
+        while True:
+            page = self.get_json(path, params)
+            yield from page.get('Items', [])
+            paging = page.get('PagingInfo') or {}
+            if not paging.get('HasMoreItems') or not paging.get('Bookmark'):
+                return
+            params['bookmark'] = paging['Bookmark']
+
+    def close(self):
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            pool.close()
+
+def list_courses(client):
+    """Active course offerings the user can access, as (org unit id, name, code)"""
+    path = f"/d2l/api/lp/{LP_VERSION}/enrollments/myenrollments/"
+    courses = []
+    for item in client.paged(path, {'orgUnitTypeId': COURSE_OFFERING}):
+        org_unit, access = item.get('OrgUnit', {}), item.get('Access', {})
+        if access.get('IsActive', True) and access.get('CanAccess', True):
+            courses.append((org_unit['Id'], org_unit.get('Name', str(org_unit['Id'])), org_unit.get('Code', '')))
+    return courses
+
+def content_toc(client, org_unit):
+    """The course's table of contents: nested Modules with their Topics"""
+    return client.get_json(f"/d2l/api/le/{LE_VERSION}/{org_unit}/content/toc")
+
+def topic_file_path(org_unit, topic_id):
+    """API path that downloads a file topic"""
+    return f"/d2l/api/le/{LE_VERSION}/{org_unit}/content/topics/{topic_id}/file"
+
+def announcements(client, org_unit):
+    """The course's announcements (news items)"""
+    return client.get_json(f"/d2l/api/le/{LE_VERSION}/{org_unit}/news/")
+
+def assignment_folders(client, org_unit):
+    """The course's assignment (dropbox) folders, with their due dates"""
+    return client.get_json(f"/d2l/api/le/{LE_VERSION}/{org_unit}/dropbox/folders/")
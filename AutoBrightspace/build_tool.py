@@ -5,23 +5,390 @@ Creates single-file executables for Windows, macOS, and Linux
 """
 
 import os
+import re
 import sys
+import json
 import platform
 import subprocess
 import shutil
 import tempfile
+import time
+import hashlib
 from pathlib import Path
 
+# Variants built by matrix mode (--matrix). "console" is the full app (PyQt
+# included, since the CLI modes live in the same script) with a console
+# window attached, so the CLI modes can print to the terminal on Windows.
+BUILD_VARIANTS = {
+    "gui-onefile": {"onefile": True, "console": False, "debug": False},
+    "gui-onedir": {"onefile": False, "console": False, "debug": False},
+    "console": {"onefile": True, "console": True, "debug": False},
+    "debug": {"onefile": False, "console": True, "debug": True},
+}
+
+DEFAULT_VARIANT = "gui-onefile"
+
+# PyInstaller log lines that mark the start of each build phase
+BUILD_PHASES = [
+    ("analysis", re.compile(r"(checking|Building) Analysis|Analyzing ")),
+    ("PYZ", re.compile(r"(checking|Building) PYZ")),
+    ("PKG", re.compile(r"(checking|Building) PKG")),
+    ("UPX", re.compile(r"(?i)executing.*\bupx\b|\bupx\b.*compress")),
+    ("EXE", re.compile(r"(checking|Building) EXE")),
+    ("COLLECT", re.compile(r"(checking|Building) COLLECT")),
+    ("BUNDLE", re.compile(r"(checking|Building) BUNDLE")),
+]
+
+class BuildPhaseTracker:
+    """Track PyInstaller build phases and their durations from its log output"""
+    
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.current_phase = "startup"
+        self.phase_start = self.start_time
+        self.durations = {}
+        self.order = ["startup"]
+        self.total = None
+    
+    def feed(self, line):
+        """Process one output line, returning the new phase name if it changed"""
+        for phase, pattern in BUILD_PHASES:
+            if pattern.search(line):
+                if phase == self.current_phase:
+                    return None
+                self._close_phase()
+                self.current_phase = phase
+                if phase not in self.order:
+                    self.order.append(phase)
+                return phase
+        return None
+    
+    def finish(self):
+        """Close the running phase and record the total build time"""
+        self._close_phase()
+        self.current_phase = None
+        self.total = time.perf_counter() - self.start_time
+    
+    def _close_phase(self):
+        now = time.perf_counter()
+        if self.current_phase:
+            elapsed = now - self.phase_start
+            self.durations[self.current_phase] = self.durations.get(self.current_phase, 0.0) + elapsed
+        self.phase_start = now
+    
+    def report(self):
+        """Return the phase timings as a serialisable dict"""
+        return {
+            "phases": [
+                {"phase": phase, "seconds": round(self.durations.get(phase, 0.0), 3)}
+                for phase in self.order
+            ],
+            "total_seconds": round(self.total, 3) if self.total is not None else None
+        }
+    
+    def format_table(self):
+        """Return the phase timings as printable lines, slowest phase marked"""
+        slowest = max(self.durations, key=self.durations.get) if self.durations else None
+        lines = []
+        for phase in self.order:
+            seconds = self.durations.get(phase, 0.0)
+            marker = "  <- slowest" if phase == slowest else ""
+            lines.append(f"{phase:<10}{seconds:>8.1f} s{marker}")
+        if self.total is not None:
+            lines.append(f"{'total':<10}{self.total:>8.1f} s")
+        return lines
+
+def run_pyinstaller(cmd, cwd, on_output=None, on_phase=None):
+    """Run PyInstaller, streaming its output line by line
+    
+    Returns (returncode, tracker, output_lines).
+    """
+    tracker = BuildPhaseTracker()
+    output_lines = []
+    
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    process = subprocess.Popen(cmd,
+                               cwd=cwd,
+                               env=env,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT,
+                               text=True,
+                               bufsize=1)
+    
+    for line in process.stdout:
+        line = line.rstrip()
+        if not line:
+            continue
+        output_lines.append(line)
+        
+        phase = tracker.feed(line)
+        if phase and on_phase:
+            on_phase(phase)
+        if on_output:
+            on_output(tracker.current_phase, line)
+    
+    returncode = process.wait()
+    tracker.finish()
+    return returncode, tracker, output_lines
+
+def write_timing_report(path, tracker, **extra):
+    """Write the build phase timings to a JSON report"""
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.system().lower(),
+        **extra,
+        **tracker.report()
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2))
+    return path
+
+# Sizes embedded in the Windows .ico file
+ICO_SIZES = [(256, 256), (128, 128), (64, 64), (48, 48), (32, 32), (16, 16)]
+
+class IconPipeline:
+    """Render the application icon once and derive every platform format from it
+    
+    Results are cached by source hash in icon/.icon-cache.json, so builds skip
+    icon work entirely (without even importing Pillow) when nothing changed.
+    Icons supplied by the user are never overwritten; they are used as the
+    source for the formats that are missing.
+    """
+    
+    CACHE_VERSION = 1
+    SOURCE_PRIORITY = ["linux", "darwin", "windows"]  # PNG, ICNS, ICO
+    
+    def __init__(self, icon_dir, icon_paths, log=None):
+        self.icon_dir = Path(icon_dir)
+        self.icon_paths = {name: Path(path) for name, path in icon_paths.items()}
+        self.cache_file = self.icon_dir / ".icon-cache.json"
+        self.log = log or print
+    
+    @staticmethod
+    def _hash_file(path):
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    
+    def _output_path(self, platform_name, cache):
+        """Return the file actually written for a platform (ICNS may fall back to PNG)"""
+        entry = cache.get("outputs", {}).get(platform_name)
+        if entry:
+            return self.icon_dir / entry["path"]
+        return self.icon_paths[platform_name]
+    
+    def output_path(self, platform_name):
+        """Return the icon file in use for a platform after run(), or None
+        
+        This is the pipeline's own output if it wrote one (for macOS possibly
+        the PNG fallback), else the existing user-supplied file.
+        """
+        cache = self._load_cache()
+        if platform_name in cache.get("outputs", {}):
+            path = self._output_path(platform_name, cache)
+            return path if path.exists() else None
+        path = self.icon_paths[platform_name]
+        return path if path.exists() else None
+    
+    def _load_cache(self):
+        try:
+            cache = json.loads(self.cache_file.read_text())
+            if cache.get("version") == self.CACHE_VERSION:
+                return cache
+        except (OSError, ValueError):
+            pass
+        return {}
+    
+    def _is_generated(self, platform_name, cache):
+        """Check whether an icon file is an unmodified pipeline output"""
+        entry = cache.get("outputs", {}).get(platform_name)
+        if not entry:
+            return False
+        path = self.icon_dir / entry["path"]
+        return path.exists() and self._hash_file(path) == entry["hash"]
+    
+    def is_up_to_date(self, cache=None):
+        """Check whether every icon exists and matches the cached source hash"""
+        cache = self._load_cache() if cache is None else cache
+        if not cache:
+            return False
+        
+        source = cache.get("source")
+        if source != "default":
+            source_path = self.icon_dir / source
+            if not source_path.exists() or self._hash_file(source_path) != cache.get("source_hash"):
+                return False
+        
+        for platform_name in self.icon_paths:
+            if platform_name in cache.get("outputs", {}):
+                if not self._is_generated(platform_name, cache):
+                    return False
+            elif not self.icon_paths[platform_name].exists():
+                return False
+        return True
+    
+    def _find_source(self, cache):
+        """Pick the best user-supplied icon to render from"""
+        for platform_name in self.SOURCE_PRIORITY:
+            path = self.icon_paths[platform_name]
+            if path.exists() and not self._is_generated(platform_name, cache):
+                return path
+        return None
+    
+    def _render_master(self, source):
+        """Open the source icon once at its largest resolution"""
+        from PIL import Image
+        
+        img = Image.open(source)
+        if source.suffix.lower() == ".ico":
+            # Load the largest frame embedded in the .ico
+            img.size = max(img.ico.sizes())
+        img.load()
+        if img.mode != 'RGBA':
+            img = img.convert('RGBA')
+        return img
+    
+    def _render_default(self):
+        """Create a simple default icon from scratch"""
+        from PIL import Image, ImageDraw, ImageFont
+        
+        # Create a simple 256x256 icon
+        img = Image.new('RGBA', (256, 256), (31, 83, 141, 255))  # Blue background
+        draw = ImageDraw.Draw(img)
+        
+        # Draw a simple "AB" text
+        try:
+            # Try to use a decent font
+            font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 120)
+        except Exception:
+            try:
+                font = ImageFont.truetype("arial.ttf", 120)
+            except Exception:
+                font = ImageFont.load_default()
+        
+        # Center the text
+        text = "AB"
+        bbox = draw.textbbox((0, 0), text, font=font)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        
+        x = (256 - text_width) // 2
+        y = (256 - text_height) // 2
+        
+        draw.text((x, y), text, fill=(255, 255, 255, 255), font=font)
+        return img
+    
+    def _write_output(self, img, platform_name):
+        """Encode the master image into one platform format"""
+        path = self.icon_paths[platform_name]
+        
+        if platform_name == "windows":
+            sizes = [size for size in ICO_SIZES if size[0] <= img.width] or [img.size]
+            img.save(path, "ICO", sizes=sizes)
+        elif platform_name == "darwin":
+            try:
+                img.save(path, "ICNS")
+            except Exception as e:
+                self.log(f"⚠ Could not create ICNS icon: {e}")
+                path = path.with_suffix(".png")
+                if not path.exists():
+                    img.save(path, "PNG")
+                self.log(f"✓ Using PNG fallback for macOS: {path}")
+        else:
+            img.save(path, "PNG")
+        
+        return path
+    
+    def run(self, regenerate=()):
+        """Make sure every platform icon exists, rendering the master at most once
+        
+        regenerate lists platforms whose icon should be re-encoded from the
+        master even if the file already exists.
+        """
+        cache = self._load_cache()
+        if not regenerate and self.is_up_to_date(cache):
+            self.log("✓ Icons up to date (cached)")
+            return True
+        
+        existing = [name for name, path in self.icon_paths.items() if path.exists()]
+        
+        try:
+            source = self._find_source(cache)
+            if source:
+                self.log(f"Rendering icons from {source.name}...")
+                master = self._render_master(source)
+            else:
+                self.log("No existing icons found, creating default icons...")
+                master = self._render_default()
+            
+            self.icon_dir.mkdir(exist_ok=True)
+            outputs = {}
+            for platform_name, path in self.icon_paths.items():
+                if path == source:
+                    continue
+                
+                # Keep user-supplied icons, refresh our own outputs
+                if path.exists() and not self._is_generated(platform_name, cache) \
+                        and platform_name not in regenerate:
+                    self.log(f"✓ Found existing {platform_name} icon: {path.name}")
+                    continue
+                
+                written = self._write_output(master, platform_name)
+                outputs[platform_name] = {"path": written.name, "hash": self._hash_file(written)}
+                self.log(f"✓ Created {platform_name} icon: {written}")
+            
+            self.cache_file.write_text(json.dumps({
+                "version": self.CACHE_VERSION,
+                "source": source.name if source else "default",
+                "source_hash": self._hash_file(source) if source else None,
+                "outputs": outputs
+            }, indent=2))
+            return True
+            
+        except ImportError:
+            self.log("⚠ PIL/Pillow not available for icon conversion")
+            self.log("✓ Will use existing icons as-is")
+            return bool(existing)
+        except Exception as e:
+            self.log(f"⚠ Error processing icons: {e}")
+            self.log("✓ Will use existing icons as-is")
+            return bool(existing)
+
 class AutoBrightspaceBuildTool:
-    def __init__(self, source_file="AutoBrightSpace.py"):
+    """Build engine shared by build_tool.py, the GUI and the 'build' CLI mode"""
+    
+    def __init__(self, source_file="AutoBrightSpace.py", variant=DEFAULT_VARIANT,
+                 build_dir=None, dist_dir=None, log=None):
         self.source_file = Path(source_file).resolve()
         self.project_dir = self.source_file.parent
         self.app_name = "AutoBrightspace"
         self.current_os = platform.system().lower()
         
+        # Build options for the selected variant
+        self.variant = variant
+        self.options = BUILD_VARIANTS[variant]
+        
         # Output directories
-        self.build_dir = self.project_dir / "build"
-        self.dist_dir = self.project_dir / "dist"
+        self.build_dir = Path(build_dir) if build_dir else self.project_dir / "build"
+        self.dist_dir = Path(dist_dir) if dist_dir else self.project_dir / "dist"
+        
+        # Spec files live next to the source for the default build and inside
+        # the isolated work directory for matrix builds
+        self.spec_dir = self.project_dir if build_dir is None else self.build_dir
+        
+        # Output callbacks: log receives messages, on_progress (stage, message)
+        # receives build stages and every PyInstaller output line
+        self.log = log or print
+        self.on_progress = None
+        
+        # Cache-aware builds keep the work directory between runs, skip
+        # PyInstaller's --clean and skip the build entirely when nothing changed
+        self.use_cache = True
+        self.prepare_icons = True
+        
+        # Inject the startup profiler runtime hook (--profile-startup)
+        self.profile_startup = False
+        self.startup_hook = self.project_dir / "hooks" / "pyi_rth_startup_profile.py"
+        self.fingerprint_file = self.dist_dir / ".build-fingerprint"
         
         # Icon paths
         self.icon_dir = self.project_dir / "icon"
@@ -38,192 +405,50 @@ class AutoBrightspaceBuildTool:
             "linux": self.app_name
         }
     
-    def create_missing_icons(self):
-        """Create missing icons from existing ones or generate defaults"""
-        icons_created = False
-        
-        try:
-            from PIL import Image
-            
-            # Check which icons we have and which we need
-            existing_icons = {}
-            for platform, icon_path in self.icon_paths.items():
-                if icon_path.exists():
-                    existing_icons[platform] = icon_path
-                    print(f"✓ Found existing {platform} icon: {icon_path.name}")
-            
-            # If we have no icons at all, create default ones
-            if not existing_icons:
-                print("No existing icons found, creating default icons...")
-                return self.create_default_icons()
-            
-            # Create missing PNG for Linux if we have ICO or ICNS
-            if "linux" not in existing_icons and ("windows" in existing_icons or "darwin" in existing_icons):
-                print("Creating PNG icon for Linux from existing icon...")
-                
-                # Try to convert from ICO first, then ICNS
-                source_icon = existing_icons.get("windows") or existing_icons.get("darwin")
-                if source_icon:
-                    try:
-                        img = Image.open(source_icon)
-                        # Convert to RGBA if needed
-                        if img.mode != 'RGBA':
-                            img = img.convert('RGBA')
-                        # Save as PNG
-                        img.save(self.icon_paths["linux"], "PNG")
-                        print(f"✓ Created PNG icon from {source_icon.name}: {self.icon_paths['linux']}")
-                        icons_created = True
-                    except Exception as e:
-                        print(f"⚠ Could not convert icon to PNG: {e}")
-            
-            # Create missing ICO for Windows if we have PNG or ICNS
-            if "windows" not in existing_icons and ("linux" in existing_icons or "darwin" in existing_icons):
-                print("Creating ICO icon for Windows from existing icon...")
-                
-                source_icon = existing_icons.get("linux") or existing_icons.get("darwin")
-                if source_icon:
-                    try:
-                        img = Image.open(source_icon)
-                        if img.mode != 'RGBA':
-                            img = img.convert('RGBA')
-                        img.save(self.icon_paths["windows"], "ICO", sizes=[(256, 256), (128, 128), (64, 64), (32, 32), (16, 16)])
-                        print(f"✓ Created ICO icon from {source_icon.name}: {self.icon_paths['windows']}")
-                        icons_created = True
-                    except Exception as e:
-                        print(f"⚠ Could not convert icon to ICO: {e}")
-            
-            # Create missing ICNS for macOS if we have PNG or ICO  
-            if "darwin" not in existing_icons and ("linux" in existing_icons or "windows" in existing_icons):
-                print("Creating ICNS icon for macOS from existing icon...")
-                
-                source_icon = existing_icons.get("linux") or existing_icons.get("windows")
-                if source_icon:
-                    try:
-                        img = Image.open(source_icon)
-                        if img.mode != 'RGBA':
-                            img = img.convert('RGBA')
-                        img.save(self.icon_paths["darwin"], "ICNS")
-                        print(f"✓ Created ICNS icon from {source_icon.name}: {self.icon_paths['darwin']}")
-                        icons_created = True
-                    except Exception as e:
-                        print(f"⚠ Could not convert icon to ICNS: {e}")
-                        # Create PNG fallback for macOS
-                        try:
-                            img.save(self.icon_paths["darwin"].with_suffix(".png"), "PNG")
-                            print(f"✓ Created PNG fallback for macOS: {self.icon_paths['darwin'].with_suffix('.png')}")
-                            icons_created = True
-                        except Exception as e2:
-                            print(f"⚠ Could not create PNG fallback: {e2}")
-            
-            return icons_created or bool(existing_icons)
-            
-        except ImportError:
-            print("⚠ PIL/Pillow not available for icon conversion")
-            print("✓ Will use existing icons as-is")
-            return bool(existing_icons)
-        except Exception as e:
-            print(f"⚠ Error processing icons: {e}")
-            print("✓ Will use existing icons as-is")
-            return bool(existing_icons)
-    
-    def create_default_icons(self):
-        """Create simple default icons from scratch"""
-        try:
-            from PIL import Image, ImageDraw, ImageFont
-            
-            # Create a simple 256x256 icon
-            img = Image.new('RGBA', (256, 256), (31, 83, 141, 255))  # Blue background
-            draw = ImageDraw.Draw(img)
-            
-            # Draw a simple "AB" text
-            try:
-                # Try to use a decent font
-                font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 120)
-            except:
-                try:
-                    font = ImageFont.truetype("arial.ttf", 120)
-                except:
-                    font = ImageFont.load_default()
-            
-            # Center the text
-            text = "AB"
-            bbox = draw.textbbox((0, 0), text, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            
-            x = (256 - text_width) // 2
-            y = (256 - text_height) // 2
-            
-            draw.text((x, y), text, fill=(255, 255, 255, 255), font=font)
-            
-            # Save in different formats
-            self.icon_dir.mkdir(exist_ok=True)
-            
-            # PNG for Linux
-            img.save(self.icon_paths["linux"], "PNG")
-            print(f"✓ Created PNG icon: {self.icon_paths['linux']}")
-            
-            # ICO for Windows
-            img.save(self.icon_paths["windows"], "ICO", sizes=[(256, 256), (128, 128), (64, 64), (32, 32), (16, 16)])
-            print(f"✓ Created ICO icon: {self.icon_paths['windows']}")
-            
-            # ICNS for macOS (requires pillow-heif or other plugins)
-            try:
-                img.save(self.icon_paths["darwin"], "ICNS")
-                print(f"✓ Created ICNS icon: {self.icon_paths['darwin']}")
-            except Exception as e:
-                print(f"⚠ Could not create ICNS icon: {e}")
-                # Copy PNG as fallback
-                shutil.copy2(self.icon_paths["linux"], self.icon_paths["darwin"].with_suffix(".png"))
-                print(f"✓ Created PNG fallback for macOS: {self.icon_paths['darwin'].with_suffix('.png')}")
-            
-            return True
-            
-        except ImportError:
-            print("⚠ PIL/Pillow not available for icon creation")
-            return False
-        except Exception as e:
-            print(f"⚠ Error creating icons: {e}")
-            return False
+    def create_missing_icons(self, regenerate=()):
+        """Create missing icons through the cached icon pipeline"""
+        return IconPipeline(self.icon_dir, self.icon_paths, log=self.log).run(regenerate)
     
     def check_dependencies(self):
         """Check if all required dependencies are available"""
-        print("Checking build dependencies...")
+        self.log("Checking build dependencies...")
         
         missing_deps = []
         
         # Check PyInstaller
         try:
             import PyInstaller
-            print(f"✓ PyInstaller {PyInstaller.__version__} available")
+            self.log(f"✓ PyInstaller {PyInstaller.__version__} available")
         except ImportError:
             missing_deps.append("pyinstaller")
         
         # Check and prepare icons
-        print("Checking application icons...")
-        if not self.create_missing_icons():
-            print("⚠ No icons available, will build without icon")
+        if self.prepare_icons:
+            self.log("Checking application icons...")
+            if not self.create_missing_icons():
+                self.log("⚠ No icons available, will build without icon")
         
         if missing_deps:
-            print(f"✗ Missing dependencies: {', '.join(missing_deps)}")
-            print("Install them with: pip install " + " ".join(missing_deps))
+            self.log(f"✗ Missing dependencies: {', '.join(missing_deps)}")
+            self.log("Install them with: pip install " + " ".join(missing_deps))
             return False
         
         return True
     
     def clean_build_dirs(self):
         """Clean previous build directories"""
-        print("Cleaning previous build files...")
+        self.log("Cleaning previous build files...")
         
         for dir_path in [self.build_dir, self.dist_dir]:
             if dir_path.exists():
                 shutil.rmtree(dir_path)
-                print(f"✓ Cleaned {dir_path}")
+                self.log(f"✓ Cleaned {dir_path}")
         
         # Also clean spec files
-        for spec_file in self.project_dir.glob("*.spec"):
-            spec_file.unlink()
-            print(f"✓ Cleaned {spec_file}")
+        if self.spec_dir.exists():
+            for spec_file in self.spec_dir.glob("*.spec"):
+                spec_file.unlink()
+                self.log(f"✓ Cleaned {spec_file}")
     
     def create_pyinstaller_spec(self):
         """Create a detailed PyInstaller spec file"""
@@ -236,6 +461,78 @@ class AutoBrightspaceBuildTool:
             if png_fallback.exists():
                 icon_path = str(png_fallback)
         
+        onefile = self.options["onefile"]
+        debug = self.options["debug"]
+        
+        runtime_hooks = []
+        if self.profile_startup:
+            if self.startup_hook.exists():
+                runtime_hooks.append(str(self.startup_hook))
+                self.log(f"✓ Startup profiler enabled: {self.startup_hook.name}")
+            else:
+                self.log(f"⚠ Startup profiler hook not found: {self.startup_hook}")
+        
+        if onefile:
+            exe_content = f'''
+exe = EXE(
+    pyz,
+    a.scripts,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    [],
+    name='{self.executable_names[self.current_os]}',
+    debug={debug},
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx={not debug},
+    upx_exclude=[],
+    runtime_tmpdir=None,
+    console={self.options["console"]},
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    onefile=True,  # THIS CREATES A SINGLE FILE!
+    {f'icon="{icon_path}",' if icon_path else '# No icon specified'}
+)
+'''
+            bundle_target = "exe"
+        else:
+            exe_content = f'''
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='{self.executable_names[self.current_os]}',
+    debug={debug},
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx={not debug},
+    console={self.options["console"]},
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    {f'icon="{icon_path}",' if icon_path else '# No icon specified'}
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    strip=False,
+    upx={not debug},
+    upx_exclude=[],
+    name='{self.app_name}',
+)
+'''
+            bundle_target = "coll"
+        
         spec_content = f'''# -*- mode: python ; coding: utf-8 -*-
 
 block_cipher = None
@@ -262,7 +559,7 @@ a = Analysis(
     ],
     hookspath=[],
     hooksconfig={{}},
-    runtime_hooks=[],
+    runtime_hooks={runtime_hooks!r},
     excludes=[
         'PySide2',
         'PySide6', 
@@ -294,37 +591,13 @@ a.datas = [x for x in a.datas if not x[0].startswith('tcl')]
 a.datas = [x for x in a.datas if not x[0].startswith('tk')]
 
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
-
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
-    [],
-    name='{self.executable_names[self.current_os]}',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,  # Windowed application
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-    onefile=True,  # THIS CREATES A SINGLE FILE!
-    {f'icon="{icon_path}",' if icon_path else '# No icon specified'}
-)
-'''
+''' + exe_content
         
         # Add macOS app bundle creation
         if self.current_os == "darwin":
             spec_content += f'''
 app = BUNDLE(
-    exe,
+    {bundle_target},
     name='{self.app_name}.app',
     icon='{icon_path if icon_path else ""}',
     bundle_identifier='com.autobrightspace.app',
@@ -343,65 +616,154 @@ app = BUNDLE(
 )
 '''
         
-        spec_file = self.project_dir / f"{self.app_name}.spec"
+        self.spec_dir.mkdir(parents=True, exist_ok=True)
+        spec_file = self.spec_dir / f"{self.app_name}.spec"
         spec_file.write_text(spec_content)
-        print(f"✓ Created spec file: {spec_file}")
+        self.log(f"✓ Created spec file: {spec_file}")
         return spec_file
     
-    def build_executable(self):
+    def _stage(self, stage, message):
+        """Report a build stage to the progress callback"""
+        if self.on_progress:
+            self.on_progress(stage, message)
+    
+    def _output(self, phase, line):
+        """Forward one line of PyInstaller output"""
+        if self.on_progress:
+            self.on_progress(phase, line)
+        else:
+            self.log(f"  [{phase}] {line}")
+    
+    def compute_fingerprint(self, spec_file):
+        """Hash everything that influences the build output"""
+        digest = hashlib.sha256()
+        digest.update(self.variant.encode())
+        digest.update(sys.version.encode())
+        
+        try:
+            import PyInstaller
+            digest.update(PyInstaller.__version__.encode())
+        except ImportError:
+            pass
+        
+        inputs = sorted(self.project_dir.glob("*.py")) + [Path(spec_file)]
+        if self.profile_startup:
+            inputs.append(self.startup_hook)
+        current_icon = self.icon_paths.get(self.current_os)
+        if current_icon:
+            inputs.extend([current_icon, current_icon.with_suffix(".png")])
+        
+        for path in inputs:
+            if path.exists():
+                digest.update(path.name.encode())
+                digest.update(path.read_bytes())
+        
+        return digest.hexdigest()
+    
+    def is_up_to_date(self, fingerprint):
+        """Check whether the existing build matches the given fingerprint"""
+        if not self.fingerprint_file.exists() or not self.get_build_info():
+            return False
+        return self.fingerprint_file.read_text().strip() == fingerprint
+    
+    def build_executable(self, force=False):
         """Build the executable using PyInstaller"""
+        self._stage("dependencies", "Checking build dependencies...")
         if not self.check_dependencies():
             return False
         
-        print(f"Building executable for {self.current_os}...")
-        self.clean_build_dirs()
+        self.log(f"Building executable for {self.current_os} ({self.variant})...")
+        if force or not self.use_cache:
+            self._stage("cleaning", "Cleaning previous builds...")
+            self.clean_build_dirs()
         
         try:
             # Create spec file
             spec_file = self.create_pyinstaller_spec()
             
+            fingerprint = self.compute_fingerprint(spec_file)
+            if self.use_cache and not force and self.is_up_to_date(fingerprint):
+                self.log("✓ Build is up to date, skipping PyInstaller")
+                spec_file.unlink()
+                return True
+            
             # Run PyInstaller
-            cmd = [
-                sys.executable, "-m", "PyInstaller",
-                "--clean",
+            self._stage("building", "Building executable with PyInstaller...")
+            cmd = [sys.executable, "-m", "PyInstaller"]
+            if force or not self.use_cache:
+                cmd.append("--clean")
+            cmd.extend([
                 "--noconfirm",
+                "--distpath", str(self.dist_dir),
+                "--workpath", str(self.build_dir),
                 str(spec_file)
-            ]
+            ])
+            
+            self.log(f"Running: {' '.join(cmd)}")
+            returncode, tracker, output_lines = run_pyinstaller(
+                cmd,
+                cwd=self.project_dir,
+                on_output=self._output,
+                on_phase=lambda phase: self.log(f"→ Phase: {phase}")
+            )
             
-            print(f"Running: {' '.join(cmd)}")
-            result = subprocess.run(cmd, 
-                                  cwd=self.project_dir,
-                                  capture_output=True, 
-                                  text=True)
+            report_path = write_timing_report(self.dist_dir / "build-timing.json", tracker,
+                                              variant=self.variant,
+                                              success=returncode == 0)
+            self.log("Build phase timings:")
+            for line in tracker.format_table():
+                self.log(f"  {line}")
+            self.log(f"✓ Timing report: {report_path}")
             
-            if result.returncode != 0:
-                print(f"✗ PyInstaller failed:")
-                print(result.stdout)
-                print(result.stderr)
+            if returncode != 0:
+                self.log(f"✗ PyInstaller failed with exit code {returncode}")
+                # The GUI shows output lines only as a progress status, so repeat the tail here
+                self.log("Last PyInstaller output:")
+                for line in output_lines[-30:]:
+                    self.log(f"  {line}")
                 return False
             
-            print("✓ PyInstaller completed successfully")
+            self.log("✓ PyInstaller completed successfully")
             
             # Post-processing
+            self._stage("post-processing", "Post-processing executable...")
             self.post_process_executable()
+            self.fingerprint_file.write_text(fingerprint)
             
-            # Clean up build artifacts for a cleaner result
-            self.cleanup_build_artifacts()
+            if self.use_cache:
+                # Keep the work directory so the next build can reuse it
+                spec_file.unlink()
+            else:
+                # Clean up build artifacts for a cleaner result
+                self.cleanup_build_artifacts()
             
             return True
             
         except Exception as e:
-            print(f"✗ Build failed: {e}")
+            self.log(f"✗ Build failed: {e}")
             return False
     
+    def get_executable_path(self):
+        """Return the path of the built executable for the current variant"""
+        exe_name = self.executable_names[self.current_os]
+        
+        if self.current_os == "darwin":
+            app_path = self.dist_dir / f"{self.app_name}.app"
+            if app_path.exists():
+                return app_path / "Contents" / "MacOS" / self.app_name
+        
+        if self.options["onefile"]:
+            return self.dist_dir / exe_name
+        return self.dist_dir / self.app_name / exe_name
+    
     def post_process_executable(self):
         """Post-process the built executable"""
         if self.current_os == "linux":
             # Make executable on Linux
-            exe_path = self.dist_dir / self.executable_names["linux"]
+            exe_path = self.get_executable_path()
             if exe_path.exists():
                 exe_path.chmod(0o755)
-                print(f"✓ Made executable file executable: {exe_path}")
+                self.log(f"✓ Made executable file executable: {exe_path}")
         
         elif self.current_os == "darwin":
             # Handle macOS app bundle
@@ -409,7 +771,7 @@ app = BUNDLE(
             exe_path = self.dist_dir / self.executable_names["darwin"]
             
             if app_path.exists():
-                print(f"✓ Created macOS app bundle: {app_path}")
+                self.log(f"✓ Created macOS app bundle: {app_path}")
                 
                 # Make the executable inside the bundle executable
                 exe_in_bundle = app_path / "Contents" / "MacOS" / self.app_name
@@ -418,29 +780,29 @@ app = BUNDLE(
             
             elif exe_path.exists():
                 exe_path.chmod(0o755)
-                print(f"✓ Made executable: {exe_path}")
+                self.log(f"✓ Made executable: {exe_path}")
         
         elif self.current_os == "windows":
-            exe_path = self.dist_dir / self.executable_names["windows"]
+            exe_path = self.get_executable_path()
             if exe_path.exists():
-                print(f"✓ Created Windows executable: {exe_path}")
+                self.log(f"✓ Created Windows executable: {exe_path}")
     
     def cleanup_build_artifacts(self):
         """Clean up build artifacts after successful build"""
-        print("Cleaning up build artifacts...")
+        self.log("Cleaning up build artifacts...")
         
         # Remove build directory
         if self.build_dir.exists():
             shutil.rmtree(self.build_dir)
-            print(f"✓ Removed build directory: {self.build_dir}")
+            self.log(f"✓ Removed build directory: {self.build_dir}")
         
         # Remove spec file
-        spec_files = list(self.project_dir.glob("*.spec"))
+        spec_files = list(self.spec_dir.glob("*.spec")) if self.spec_dir.exists() else []
         for spec_file in spec_files:
             spec_file.unlink()
-            print(f"✓ Removed spec file: {spec_file}")
+            self.log(f"✓ Removed spec file: {spec_file}")
         
-        print("✓ Build artifacts cleaned up!")
+        self.log("✓ Build artifacts cleaned up!")
     
     def create_launcher_script(self):
         """Create a launcher script that mimics 'python AutoBrightSpace.py run'"""
@@ -500,11 +862,11 @@ fi
             if self.current_os != "windows":
                 launcher_path.chmod(0o755)
             
-            print(f"✓ Created launcher script: {launcher_path}")
+            self.log(f"✓ Created launcher script: {launcher_path}")
             return launcher_path
             
         except Exception as e:
-            print(f"⚠ Could not create launcher script: {e}")
+            self.log(f"⚠ Could not create launcher script: {e}")
             return None
     
     def get_build_info(self):
@@ -529,6 +891,15 @@ fi
                     "size": exe_path.stat().st_size,
                     "type": "macOS Executable"
                 }
+        elif not self.options["onefile"]:
+            app_dir = self.dist_dir / self.app_name
+            if app_dir.exists():
+                size = sum(f.stat().st_size for f in app_dir.rglob('*') if f.is_file())
+                return {
+                    "path": app_dir,
+                    "size": size,
+                    "type": f"{self.current_os.title()} Application Folder"
+                }
         else:
             exe_path = self.dist_dir / exe_name
             if exe_path.exists():
@@ -542,40 +913,249 @@ fi
     
     def print_build_summary(self):
         """Print a summary of the build process"""
-        print("\n" + "="*50)
-        print("BUILD SUMMARY")
-        print("="*50)
+        self.log("\n" + "="*50)
+        self.log("BUILD SUMMARY")
+        self.log("="*50)
         
         build_info = self.get_build_info()
         if build_info:
             size_mb = build_info["size"] / (1024 * 1024)
-            print(f"✓ Built: {build_info['path']}")
-            print(f"✓ Type: {build_info['type']}")
-            print(f"✓ Size: {size_mb:.1f} MB")
+            self.log(f"✓ Built: {build_info['path']}")
+            self.log(f"✓ Type: {build_info['type']}")
+            self.log(f"✓ Size: {size_mb:.1f} MB")
             
             # Check for launcher
             launcher_scripts = list(self.dist_dir.glob("*QuickLogin*"))
             if launcher_scripts:
-                print(f"✓ Launcher: {launcher_scripts[0].name}")
+                self.log(f"✓ Launcher: {launcher_scripts[0].name}")
             
-            print("\nUsage:")
+            self.log("\nUsage:")
             if self.current_os == "darwin" and (self.dist_dir / f"{self.app_name}.app").exists():
-                print(f"• Double-click: {self.app_name}.app")
-                print(f"• GUI mode: open {self.app_name}.app")
-                print(f"• CLI mode: {self.app_name}.app/Contents/MacOS/{self.app_name} run")
-                print(f"• Quick login: Double-click AutoBrightspace_QuickLogin.sh")
+                self.log(f"• Double-click: {self.app_name}.app")
+                self.log(f"• GUI mode: open {self.app_name}.app")
+                self.log(f"• CLI mode: {self.app_name}.app/Contents/MacOS/{self.app_name} run")
+                self.log(f"• Quick login: Double-click AutoBrightspace_QuickLogin.sh")
             else:
                 exe_name = build_info["path"].name
-                print(f"• Double-click: {exe_name}")
-                print(f"• GUI mode: ./{exe_name}")
-                print(f"• CLI mode: ./{exe_name} run")
-                print(f"• Configure: ./{exe_name} config")
+                self.log(f"• Double-click: {exe_name}")
+                self.log(f"• GUI mode: ./{exe_name}")
+                self.log(f"• CLI mode: ./{exe_name} run")
+                self.log(f"• Configure: ./{exe_name} config")
                 launcher_name = "AutoBrightspace_QuickLogin.sh" if self.current_os != "windows" else "AutoBrightspace_QuickLogin.bat"
-                print(f"• Quick login: {launcher_name}")
+                self.log(f"• Quick login: {launcher_name}")
         else:
-            print("✗ No executable found in dist/ directory")
+            self.log("✗ No executable found in dist/ directory")
         
-        print("="*50)
+        self.log("="*50)
+
+def measure_startup_time(exe_path, timeout=120):
+    """Measure how long the built executable takes to start and exit (--help)"""
+    try:
+        start = time.perf_counter()
+        result = subprocess.run([str(exe_path), "--help"],
+                                capture_output=True,
+                                timeout=timeout)
+        elapsed = time.perf_counter() - start
+        return elapsed if result.returncode == 0 else None
+    except Exception:
+        return None
+
+def build_variant(source_file, variant, cache_dir, use_cache=True, profile_startup=False):
+    """Build a single matrix variant in isolated work/dist directories"""
+    import contextlib
+    
+    project_dir = Path(source_file).resolve().parent
+    builder = AutoBrightspaceBuildTool(
+        source_file,
+        variant=variant,
+        build_dir=project_dir / "build" / "matrix" / variant,
+        dist_dir=project_dir / "dist" / variant
+    )
+    builder.use_cache = use_cache
+    builder.profile_startup = profile_startup
+    builder.prepare_icons = False
+    
+    # Each variant keeps its own PyInstaller binary cache between runs; concurrent
+    # PyInstaller processes must not write to the same cache without locking
+    variant_cache = Path(cache_dir) / variant
+    variant_cache.mkdir(parents=True, exist_ok=True)
+    os.environ["PYINSTALLER_CONFIG_DIR"] = str(variant_cache)
+    
+    builder.dist_dir.mkdir(parents=True, exist_ok=True)
+    log_path = builder.project_dir / "build" / "matrix" / f"{variant}.log"
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    
+    start = time.perf_counter()
+    with open(log_path, "w") as log_file, contextlib.redirect_stdout(log_file):
+        success = builder.build_executable()
+    build_time = time.perf_counter() - start
+    
+    result = {
+        "variant": variant,
+        "success": success,
+        "build_time": build_time,
+        "size": None,
+        "startup_time": None,
+        "log": str(log_path)
+    }
+    
+    if success:
+        build_info = builder.get_build_info()
+        if build_info:
+            result["size"] = build_info["size"]
+        exe_path = builder.get_executable_path()
+        if exe_path.exists():
+            result["startup_time"] = measure_startup_time(exe_path)
+    
+    return result
+
+def build_matrix(source_file, variants, jobs=None, use_cache=True, profile_startup=False):
+    """Build several variants concurrently with a bounded process pool"""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    
+    builder = AutoBrightspaceBuildTool(source_file)
+    
+    try:
+        import PyInstaller
+        print(f"✓ PyInstaller {PyInstaller.__version__} available")
+    except ImportError:
+        print("✗ Missing dependencies: pyinstaller")
+        print("Install them with: pip install pyinstaller")
+        return []
+    
+    # Prepare icons once so the parallel builds don't race on the icon files
+    print("Checking application icons...")
+    if not builder.create_missing_icons():
+        print("⚠ No icons available, will build without icon")
+    
+    cache_dir = builder.build_dir / "pyinstaller-cache"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    
+    if jobs is None:
+        jobs = max(1, min(len(variants), (os.cpu_count() or 2) // 2))
+    
+    print(f"Building {len(variants)} variants with {jobs} parallel jobs...")
+    
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(build_variant, str(builder.source_file), variant, str(cache_dir),
+                            use_cache, profile_startup): variant
+            for variant in variants
+        }
+        for future in as_completed(futures):
+            variant = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {
+                    "variant": variant,
+                    "success": False,
+                    "build_time": None,
+                    "size": None,
+                    "startup_time": None,
+                    "log": None,
+                    "error": str(e)
+                }
+            status = "✓" if result["success"] else "✗"
+            print(f"{status} Finished variant: {variant}")
+            results.append(result)
+    
+    results.sort(key=lambda r: variants.index(r["variant"]))
+    return results
+
+def print_matrix_summary(results):
+    """Print a table with build time, size and startup time per variant"""
+    def fmt(value, unit, scale=1.0):
+        return f"{value / scale:.1f} {unit}" if value is not None else "-"
+    
+    print("\n" + "="*70)
+    print("BUILD MATRIX SUMMARY")
+    print("="*70)
+    print(f"{'Variant':<14}{'Status':<10}{'Build time':>14}{'Size':>14}{'Startup':>14}")
+    print("-"*70)
+    for result in results:
+        status = "OK" if result["success"] else "FAILED"
+        print(f"{result['variant']:<14}{status:<10}"
+              f"{fmt(result['build_time'], 's'):>14}"
+              f"{fmt(result['size'], 'MB', 1024 * 1024):>14}"
+              f"{fmt(result['startup_time'], 's'):>14}")
+    print("="*70)
+    
+    for result in results:
+        if not result["success"]:
+            if result.get("error"):
+                print(f"✗ {result['variant']}: {result['error']}")
+            elif result.get("log"):
+                print(f"✗ {result['variant']}: see {result['log']}")
+
+def default_startup_profile_dir():
+    """Return the directory where profiled builds write their startup timelines"""
+    import appdirs
+    if os.environ.get("AUTOBRIGHTSPACE_STARTUP_PROFILE_DIR"):
+        return Path(os.environ["AUTOBRIGHTSPACE_STARTUP_PROFILE_DIR"])
+    return Path(appdirs.user_data_dir("AutoBrightspace")) / "startup_profiles"
+
+def percentile(values, pct):
+    """Return the pct-th percentile of values using linear interpolation"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+def print_startup_report(profile_dir, top_imports=15):
+    """Aggregate startup timelines from many launches and print a summary"""
+    timeline_file = Path(profile_dir) / "timeline.jsonl"
+    if not timeline_file.exists():
+        print(f"✗ No startup timelines found in {profile_dir}")
+        print("Build with --profile-startup and launch the executable a few times first")
+        return False
+    
+    timelines = []
+    for line in timeline_file.read_text().splitlines():
+        try:
+            timelines.append(json.loads(line))
+        except ValueError:
+            continue
+    
+    if not timelines:
+        print(f"✗ No valid startup timelines in {timeline_file}")
+        return False
+    
+    phase_order = []
+    phase_values = {}
+    import_values = {}
+    for timeline in timelines:
+        for phase, ms in timeline.get("phases_ms", {}).items():
+            if phase not in phase_values:
+                phase_order.append(phase)
+                phase_values[phase] = []
+            phase_values[phase].append(ms)
+        phase_values.setdefault("total", []).append(timeline.get("total_ms", 0.0))
+        for name, ms in timeline.get("top_imports_ms", []):
+            import_values.setdefault(name, []).append(ms)
+    phase_order.append("total")
+    
+    print("\n" + "="*70)
+    print(f"STARTUP PROFILE ({len(timelines)} launches)")
+    print("="*70)
+    print(f"{'Phase':<24}{'n':>5}{'mean ms':>11}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    print("-"*70)
+    for phase in phase_order:
+        values = phase_values[phase]
+        mean = sum(values) / len(values)
+        print(f"{phase:<24}{len(values):>5}{mean:>11.1f}{percentile(values, 50):>10.1f}"
+              f"{percentile(values, 95):>10.1f}{max(values):>10.1f}")
+    
+    print("\nSlowest imports (mean self time):")
+    ranked = sorted(import_values.items(), key=lambda item: sum(item[1]) / len(item[1]), reverse=True)
+    for name, values in ranked[:top_imports]:
+        print(f"  {name:<40}{sum(values) / len(values):>10.1f} ms")
+    print("="*70)
+    return True
 
 def main():
     """Main function for the build script"""
@@ -588,9 +1168,27 @@ def main():
                        help="Clean build directories before building")
     parser.add_argument("--create-icons", action="store_true",
                        help="Force creation of default icons")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Force a full clean build even if nothing changed")
+    parser.add_argument("--profile-startup", action="store_true",
+                       help="Inject a runtime hook that records a startup timeline on every launch")
+    parser.add_argument("--startup-report", nargs="?", const="", metavar="DIR",
+                       help="Aggregate recorded startup timelines (default: user data dir)")
+    parser.add_argument("--matrix", action="store_true",
+                       help="Build several variants concurrently")
+    parser.add_argument("--variants", default=",".join(BUILD_VARIANTS),
+                       help="Comma-separated variants for --matrix "
+                            f"(default: {','.join(BUILD_VARIANTS)})")
+    parser.add_argument("--jobs", type=int, default=None,
+                       help="Maximum number of parallel builds for --matrix")
     
     args = parser.parse_args()
     
+    # Aggregate startup profiles instead of building
+    if args.startup_report is not None:
+        profile_dir = args.startup_report or default_startup_profile_dir()
+        return 0 if print_startup_report(profile_dir) else 1
+    
     # Initialize builder
     builder = AutoBrightspaceBuildTool(args.source)
     
@@ -609,7 +1207,23 @@ def main():
         builder.clean_build_dirs()
         return
     
+    # Build all requested variants in parallel
+    if args.matrix:
+        variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+        unknown = [v for v in variants if v not in BUILD_VARIANTS]
+        if unknown:
+            print(f"✗ Unknown variants: {', '.join(unknown)}")
+            print(f"Available variants: {', '.join(BUILD_VARIANTS)}")
+            return 1
+        
+        results = build_matrix(args.source, variants, args.jobs, not args.no_cache,
+                               args.profile_startup)
+        print_matrix_summary(results)
+        return 0 if results and all(r["success"] for r in results) else 1
+    
     # Build the executable
+    builder.use_cache = not args.no_cache
+    builder.profile_startup = args.profile_startup
     if builder.build_executable():
         # Create launcher script
         builder.create_launcher_script()
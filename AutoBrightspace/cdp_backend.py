@@ -0,0 +1,449 @@
+"""
+Chrome DevTools Protocol backend for AutoBrightspace
+
+Launches Chrome with remote debugging and drives it directly over the
+DevTools WebSocket, without chromedriver: no second process, no driver
+version matching and no extra HTTP hop per command. Only the standard
+library is used, including a minimal RFC 6455 WebSocket client.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import base64
+import hashlib
+import tempfile
+import threading
+import subprocess
+import collections
+import urllib.parse
+import urllib.request
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# Where Chrome usually lives when it is not on PATH
+CHROME_CANDIDATES = {
+    'win32': [
+        os.path.join(os.environ.get('PROGRAMFILES', r'C:\Program Files'), r'Google\Chrome\Application\chrome.exe'),
+        os.path.join(os.environ.get('PROGRAMFILES(X86)', r'C:\Program Files (x86)'), r'Google\Chrome\Application\chrome.exe'),
+        os.path.join(os.environ.get('LOCALAPPDATA', ''), r'Google\Chrome\Application\chrome.exe'),
+    ],
+    'darwin': [
+        '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
+        '/Applications/Chromium.app/Contents/MacOS/Chromium',
+    ],
+}
+CHROME_COMMANDS = ['google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome']
+
+class CDPError(Exception):
+    """A DevTools command failed or the browser went away"""
+
+def find_chrome():
+    """Return the path of the Chrome executable, or None"""
+    configured = os.environ.get('CHROME_PATH')
+    if configured and os.path.exists(configured):
+        return configured
+    for command in CHROME_COMMANDS:
+        path = shutil.which(command)
+        if path:
+            return path
+    for path in CHROME_CANDIDATES.get(sys.platform, []):
+        if os.path.exists(path):
+            return path
+    return None
+
+class WebSocket:
+    """Minimal blocking WebSocket client (text frames, ping/pong, close)"""
+
+    def __init__(self, url, timeout=10):
+        parsed = urllib.parse.urlparse(url)
+        host, port = parsed.hostname, parsed.port or 80
+        path = parsed.path + (f"?{parsed.query}" if parsed.query else "")
+
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('rb')
+        self.send_lock = threading.Lock()
+
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.sock.sendall((
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {host}:{port}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        ).encode())
+
+        status = self.reader.readline().decode('latin-1')
+        headers = {}
+        while True:
+            line = self.reader.readline().decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        expected = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        if ' 101 ' not in status or headers.get('sec-websocket-accept') != expected:
+            self.sock.close()
+            raise CDPError(f"WebSocket handshake failed: {status.strip()}")
+        self.sock.settimeout(None)
+
+    def _send_frame(self, opcode, payload):
+        header = bytearray([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header.append(0x80 | length)
+        elif length < 1 << 16:
+            header.append(0x80 | 126)
+            header += length.to_bytes(2, 'big')
+        else:
+            header.append(0x80 | 127)
+            header += length.to_bytes(8, 'big')
+
+        # Client frames must be masked; XOR the whole payload in one go
+        mask = os.urandom(4)
+        if length:
+            key = (mask * (length // 4 + 1))[:length]
+            payload = (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big')
+        with self.send_lock:
+            self.sock.sendall(bytes(header) + mask + payload)
+
+    def send(self, text):
+        self._send_frame(0x1, text.encode())
+
+    def _read_exact(self, size):
+        data = self.reader.read(size)
+        if data is None or len(data) < size:
+            raise ConnectionError("WebSocket closed")
+        return data
+
+    def recv(self):
+        """Return the next text message, or None once the socket is closed"""
+        message = bytearray()
+        while True:
+            try:
+                first, second = self._read_exact(2)
+                length = second & 0x7F
+                if length == 126:
+                    length = int.from_bytes(self._read_exact(2), 'big')
+                elif length == 127:
+                    length = int.from_bytes(self._read_exact(8), 'big')
+                mask = self._read_exact(4) if second & 0x80 else None
+                payload = self._read_exact(length) if length else b''
+            except (OSError, ValueError, ConnectionError):
+                return None
+
+            if mask:
+                key = (mask * (length // 4 + 1))[:length]
+                payload = (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big')
+
+            opcode = first & 0x0F
+            if opcode == 0x8:  # Close
+                self.close()
+                return None
+            if opcode == 0x9:  # Ping
+                self._send_frame(0xA, payload)
+                continue
+            if opcode == 0xA:  # Pong
+                continue
+
+            message += payload
+            if first & 0x80:  # FIN
+                return message.decode('utf-8', 'replace')
+
+    def close(self):
+        try:
+            self._send_frame(0x8, b'')
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+class CDPSession:
+    """JSON-RPC over a DevTools WebSocket, with a background reader thread"""
+
+    def __init__(self, websocket_url, recorder=None):
+        self.ws = WebSocket(websocket_url)
+        self.recorder = recorder
+        self.closed = False
+        self._next_id = 0
+        self._id_lock = threading.Lock()
+        self._responses = {}
+        self._events = collections.deque(maxlen=500)
+        self._condition = threading.Condition()
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+    def _read_loop(self):
+        while True:
+            text = self.ws.recv()
+            if text is None:
+                with self._condition:
+                    self.closed = True
+                    self._condition.notify_all()
+                return
+            try:
+                message = json.loads(text)
+            except ValueError:
+                continue
+            with self._condition:
+                if 'id' in message:
+                    self._responses[message['id']] = message
+                else:
+                    self._events.append(message)
+                self._condition.notify_all()
+
+    def send(self, method, params=None, timeout=30):
+        """Run a DevTools command and return its result"""
+        with self._id_lock:
+            self._next_id += 1
+            message_id = self._next_id
+
+        start = time.perf_counter()
+        try:
+            self.ws.send(json.dumps({'id': message_id, 'method': method, 'params': params or {}}))
+        except OSError as e:
+            raise CDPError(f"{method}: browser connection lost ({e})")
+
+        with self._condition:
+            if not self._condition.wait_for(lambda: message_id in self._responses or self.closed, timeout):
+                raise CDPError(f"{method}: no response within {timeout} s")
+            response = self._responses.pop(message_id, None)
+
+        if self.recorder:
+            self.recorder.add(method, (time.perf_counter() - start) * 1000)
+        if response is None:
+            raise CDPError(f"{method}: browser connection closed")
+        if 'error' in response:
+            raise CDPError(f"{method}: {response['error'].get('message', response['error'])}")
+        return response.get('result', {})
+
+    def discard_events(self, method):
+        """Forget buffered events of one type before waiting for a fresh one"""
+        with self._condition:
+            kept = [event for event in self._events if event.get('method') != method]
+            self._events.clear()
+            self._events.extend(kept)
+
+    def wait_for_event(self, method, timeout=30):
+        """Block until an event of this type arrives and return its params"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                for event in self._events:
+                    if event.get('method') == method:
+                        self._events.remove(event)
+                        return event.get('params', {})
+                remaining = deadline - time.monotonic()
+                if self.closed or remaining <= 0:
+                    raise CDPError(f"Timed out waiting for {method}")
+                self._condition.wait(remaining)
+
+    def close(self):
+        self.ws.close()
+
+class CDPBrowser:
+    """A Chrome instance driven over the DevTools protocol"""
+
+    def __init__(self, process, port, user_data_dir, session, owns_profile):
+        self.process = process
+        self.pid = process.pid
+        self.port = port
+        self.user_data_dir = user_data_dir
+        self.session = session
+        self.owns_profile = owns_profile
+
+    @classmethod
+    def launch(cls, chrome_path=None, user_data_dir=None, headless=False, extra_args=(),
+               recorder=None, timeout=20, popen_kw=None):
+        """Start Chrome with remote debugging on a free port and attach to its first tab
+
+        popen_kw is passed on to subprocess.Popen, e.g. ResourceGovernor.popen_kw().
+        """
+        chrome_path = chrome_path or find_chrome()
+        if not chrome_path:
+            raise CDPError("Chrome not found; set CHROME_PATH to its executable")
+
+        owns_profile = user_data_dir is None
+        user_data_dir = user_data_dir or tempfile.mkdtemp(prefix='autobrightspace-cdp-')
+        port_file = os.path.join(user_data_dir, 'DevToolsActivePort')
+        if os.path.exists(port_file):
+            os.remove(port_file)
+
+        args = [chrome_path, '--remote-debugging-port=0', f'--user-data-dir={user_data_dir}',
+                '--no-first-run', '--no-default-browser-check', *extra_args]
+        if headless:
+            args.append('--headless=new')
+        args.append('about:blank')
+        process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                   **(popen_kw or {}))
+
+        # Chrome writes the port it picked to DevToolsActivePort once it listens
+        deadline = time.monotonic() + timeout
+        port = None
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CDPError(f"Chrome exited during startup (code {process.returncode})")
+            try:
+                with open(port_file) as f:
+                    port = int(f.readline().strip())
+                break
+            except (OSError, ValueError):
+                time.sleep(0.05)
+        if not port:
+            process.kill()
+            raise CDPError("Chrome did not open a DevTools port")
+
+        browser = cls(process, port, user_data_dir, None, owns_profile)
+        try:
+            target = browser.page_targets(timeout=deadline - time.monotonic())[0]
+            browser.session = CDPSession(target['webSocketDebuggerUrl'], recorder=recorder)
+            browser.session.send('Page.enable')
+        except Exception:
+            browser.close()
+            raise
+        return browser
+
+    def page_targets(self, timeout=5):
+        """Return the open tabs from the DevTools HTTP endpoint"""
+        deadline = time.monotonic() + max(timeout, 0.1)
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/json/list", timeout=2) as response:
+                    targets = [target for target in json.load(response) if target.get('type') == 'page']
+                if targets or time.monotonic() >= deadline:
+                    return targets
+            except (OSError, ValueError):
+                if time.monotonic() >= deadline:
+                    raise CDPError("DevTools endpoint not reachable")
+            time.sleep(0.05)
+
+    def evaluate(self, expression, await_promise=False, timeout=30):
+        """Evaluate JavaScript in the page and return its JSON value"""
+        result = self.session.send('Runtime.evaluate', {
+            'expression': expression,
+            'returnByValue': True,
+            'awaitPromise': await_promise,
+        }, timeout=timeout)
+        if 'exceptionDetails' in result:
+            details = result['exceptionDetails']
+            message = details.get('exception', {}).get('description') or details.get('text', 'error')
+            raise CDPError(f"JavaScript error: {message.splitlines()[0]}")
+        return result.get('result', {}).get('value')
+
+    def call_function(self, body, *args):
+        """Run a function body that reads its inputs from `arguments`"""
+        return self.evaluate(f"(function() {{{body}\n}}).apply(null, {json.dumps(list(args))})")
+
+    def navigate(self, url, timeout=30):
+        """Open a URL and wait for its load event"""
+        self.session.discard_events('Page.loadEventFired')
+        result = self.session.send('Page.navigate', {'url': url}, timeout=timeout)
+        if result.get('errorText'):
+            raise CDPError(f"Navigation failed: {result['errorText']}")
+        self.session.wait_for_event('Page.loadEventFired', timeout=timeout)
+
+    @property
+    def current_url(self):
+        return self.evaluate('location.href')
+
+    def wait_for_selector(self, selector, timeout=10):
+        """Wait for a CSS selector in one round trip using a MutationObserver"""
+        script = """new Promise((resolve) => {
+            const selector = %s;
+            if (document.querySelector(selector)) { return resolve(true); }
+            const observer = new MutationObserver(() => {
+                if (document.querySelector(selector)) { observer.disconnect(); resolve(true); }
+            });
+            observer.observe(document.documentElement, {childList: true, subtree: true});
+            setTimeout(() => { observer.disconnect(); resolve(false); }, %d);
+        })""" % (json.dumps(selector), int(timeout * 1000))
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if self.evaluate(script, await_promise=True, timeout=remaining + 5):
+                    return True
+            except CDPError as e:
+                # A navigation destroyed the page the observer was running in
+                if 'context' not in str(e).lower():
+                    raise
+            if deadline - time.monotonic() <= 0:
+                raise CDPError(f"Timed out waiting for {selector}")
+            time.sleep(0.05)
+
+    def wait_for_url_change(self, old_url, timeout=10):
+        """Wait until the page has navigated away from old_url"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                url = self.current_url
+                if url and url != old_url:
+                    return url
+            except CDPError:
+                pass  # Mid-navigation; the next poll sees the new page
+            time.sleep(0.1)
+        raise CDPError(f"Page did not leave {old_url} within {timeout} s")
+
+    def click(self, selector):
+        """Click the first element matching a CSS selector; False if absent"""
+        return self.call_function(
+            "const el = document.querySelector(arguments[0]);"
+            "if (!el) { return false; } setTimeout(() => el.click(), 0); return true;",
+            selector)
+
+    def get_cookies(self):
+        """Return every cookie in the browser profile"""
+        return self.session.send('Network.getAllCookies').get('cookies', [])
+
+    def set_cookies(self, cookies):
+        """Install cookies (DevTools cookie objects) into the profile"""
+        self.session.send('Network.setCookies', {'cookies': cookies})
+
+    def is_open(self):
+        """True while the browser runs and still has an open tab"""
+        if self.process.poll() is not None:
+            return False
+        try:
+            return bool(self.page_targets(timeout=0))
+        except CDPError:
+            return False
+
+    def wait_closed(self):
+        """Block until the user closes the browser"""
+        from browser_process import ProcessExitWaiter, MAC_WINDOW_CHECK_INTERVAL
+
+        waiter = ProcessExitWaiter(self.pid)
+        try:
+            # macOS keeps Chrome running without windows, so check the tabs too
+            window_check = MAC_WINDOW_CHECK_INTERVAL if sys.platform == 'darwin' else None
+            while not waiter.wait(window_check):
+                if not self.is_open():
+                    break
+        finally:
+            waiter.close()
+
+    def close(self):
+        """Close the browser and remove its temporary profile"""
+        if self.session:
+            try:
+                self.session.send('Browser.close', timeout=2)
+            except CDPError:
+                if self.process.poll() is None:
+                    self.process.terminate()
+            self.session.close()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        if self.owns_profile:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
@@ -0,0 +1,255 @@
+"""
+Course content sync for AutoBrightspace
+
+`python AutoBrightSpace.py sync` mirrors the files of every active course
+into a local folder (Course/Module/.../file), using the session stored by
+the last login instead of a browser. The course tables of contents are
+fetched concurrently and the files are downloaded on a thread pool
+through one pooled BrightspaceClient, which caps the requests in flight
+per host.
+
+A manifest in the output folder records each file's size, modification
+date and validator, so a re-run skips files that have not changed.
+Downloads go to a .part file first. An interrupted one resumes with a
+Range request guarded by If-Range: if the file changed in the meantime,
+the server sends it whole and the download starts over.
+"""
+
+import os
+import re
+import json
+import time
+import datetime
+import threading
+import tempfile
+import urllib.parse
+import concurrent.futures
+
+from brightspace_api import BrightspaceError, SessionExpired, list_courses, content_toc, topic_file_path
+
+MANIFEST_NAME = '.autobrightspace-sync.json'
+DEFAULT_WORKERS = 8
+CHUNK_SIZE = 64 * 1024
+MAX_NAME_LENGTH = 120
+
+def safe_name(name):
+    """Make a course, module or file name usable as a path component on every platform"""
+    name = re.sub(r'[\x00-\x1f<>:"/\\|?*]', '_', name).strip().rstrip('.')
+    if len(name) > MAX_NAME_LENGTH:
+        stem, ext = os.path.splitext(name)
+        name = stem[:MAX_NAME_LENGTH - len(ext)].rstrip() + ext
+    return name or '_'
+
+def parse_date(value):
+    """Timestamp of an API date such as 2024-02-01T10:00:00.000Z, or None"""
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+class SyncItem:
+    """A file topic and where it goes in the output folder"""
+
+    def __init__(self, org_unit, topic, path):
+        self.org_unit = org_unit
+        self.topic_id = topic['TopicId']
+        self.path = path                          # Relative to the output folder
+        self.modified = topic.get('LastModifiedDate') or ''
+        self.url = topic_file_path(org_unit, self.topic_id)
+
+    @property
+    def key(self):
+        return f"{self.org_unit}/{self.topic_id}"
+
+def file_topics(modules, parents=()):
+    """Yield (module titles, topic) for every file topic in a table of contents"""
+    for module in modules:
+        titles = parents + (module.get('Title', ''),)
+        for topic in module.get('Topics', []):
+            if topic.get('TypeIdentifier') == 'File':
+                yield titles, topic
+        yield from file_topics(module.get('Modules', []), titles)
+
+def topic_filename(topic):
+    """The file's own name from its URL, or the topic title if the URL has none"""
+    name = os.path.basename(urllib.parse.unquote(urllib.parse.urlsplit(topic.get('Url') or '').path))
+    return safe_name(name or topic.get('Title') or str(topic['TopicId']))
+
+def plan_course(client, org_unit, course_name):
+    """List the SyncItems of one course"""
+    items, seen = [], set()
+    for titles, topic in file_topics(content_toc(client, org_unit).get('Modules', [])):
+        parts = [safe_name(course_name)] + [safe_name(title) for title in titles] + [topic_filename(topic)]
+        path = os.path.join(*parts)
+        if path.lower() in seen:
+            # Two topics with the same file name in one module
+            stem, ext = os.path.splitext(path)
+            path = f"{stem} ({topic['TopicId']}){ext}"
+        seen.add(path.lower())
+        items.append(SyncItem(org_unit, topic, path))
+    return items
+
+class Manifest:
+    """What was downloaded where, stored as JSON in the output folder"""
+
+    def __init__(self, root):
+        self.path = os.path.join(root, MANIFEST_NAME)
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.files = data.get('files', {})        # key -> path, size, modified, etag
+        self.partial = data.get('partial', {})    # key -> validator of a .part file
+
+    def unchanged(self, item, root):
+        """True if the item was downloaded before and neither side changed since"""
+        entry = self.files.get(item.key)
+        if not entry or entry.get('path') != item.path or entry.get('modified') != item.modified:
+            return False
+        try:
+            return os.path.getsize(os.path.join(root, item.path)) == entry.get('size')
+        except OSError:
+            return False
+
+    def save(self):
+        """Write the manifest atomically, so an interrupted sync never leaves it half written"""
+        directory = os.path.dirname(self.path)
+        fd, temp_path = tempfile.mkstemp(prefix='.manifest-', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'version': 1, 'saved': time.time(), 'files': self.files,
+                           'partial': self.partial}, f, indent=1)
+            os.replace(temp_path, self.path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+class SyncReport:
+    """Counts and timings of one sync run"""
+
+    def __init__(self):
+        self.courses = 0
+        self.downloaded = 0
+        self.resumed = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.bytes = 0
+        self.elapsed = 0.0
+        self.connections = 0
+
+    def summary(self):
+        return (f"{'✓' if not self.failed else '⚠'} {self.courses} courses: "
+                f"{self.downloaded} downloaded ({self.bytes / 1e6:.1f} MB"
+                f"{f', {self.resumed} resumed' if self.resumed else ''}), "
+                f"{self.unchanged} unchanged, {self.failed} failed in {self.elapsed:.1f} s "
+                f"over {self.connections} connections")
+
+def download(client, item, root, manifest, lock):
+    """Download one item through its .part file; returns (bytes transferred, resumed)"""
+    destination = os.path.join(root, item.path)
+    part_path = destination + '.part'
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+
+    headers = {}
+    with lock:
+        validator = manifest.partial.get(item.key)
+    offset = os.path.getsize(part_path) if validator and os.path.exists(part_path) else 0
+    if offset:
+        headers = {'Range': f"bytes={offset}-", 'If-Range': validator}
+
+    with client.open('GET', item.url, headers) as response:
+        if response.status == 416:
+            # The .part file is not a prefix of the current file
+            response.read()
+            os.remove(part_path)
+            with lock:
+                manifest.partial.pop(item.key, None)
+            return download(client, item, root, manifest, lock)
+        resumed = response.status == 206
+        if resumed and not (response.getheader('Content-Range') or '').startswith(f"bytes {offset}-"):
+            raise BrightspaceError(f"GET {item.url}: unexpected Content-Range")
+        validator = response.getheader('ETag') or response.getheader('Last-Modified')
+        with lock:
+            if validator:
+                manifest.partial[item.key] = validator
+            else:
+                manifest.partial.pop(item.key, None)
+
+        transferred = 0
+        with open(part_path, 'ab' if resumed else 'wb') as f:
+            while True:
+                chunk = response.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+                transferred += len(chunk)
+
+    os.replace(part_path, destination)
+    modified = parse_date(item.modified)
+    if modified:
+        os.utime(destination, (modified, modified))
+    with lock:
+        manifest.partial.pop(item.key, None)
+        manifest.files[item.key] = {'path': item.path, 'size': os.path.getsize(destination),
+                                    'modified': item.modified, 'etag': validator}
+    return transferred, resumed
+
+def sync(client, root, workers=DEFAULT_WORKERS, log=print):
+    """Mirror every accessible course's files into root; returns a SyncReport
+
+    Raises SessionExpired if the session is rejected before anything is
+    listed; one that expires halfway stops the run with what it has.
+    """
+    report = SyncReport()
+    start = time.perf_counter()
+    os.makedirs(root, exist_ok=True)
+    manifest = Manifest(root)
+    lock = threading.Lock()
+
+    courses = list_courses(client)
+    report.courses = len(courses)
+    log(f"Found {len(courses)} courses; reading their contents...")
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    try:
+        items = []
+        tocs = {executor.submit(plan_course, client, org_unit, name): name for org_unit, name, _ in courses}
+        for future in concurrent.futures.as_completed(tocs):
+            try:
+                items.extend(future.result())
+            except SessionExpired:
+                raise
+            except BrightspaceError as e:
+                log(f"⚠ Could not read the contents of {tocs[future]}: {e}")
+
+        pending = [item for item in items if not manifest.unchanged(item, root)]
+        report.unchanged = len(items) - len(pending)
+        log(f"{len(items)} files, {len(pending)} new or changed")
+
+        downloads = {executor.submit(download, client, item, root, manifest, lock): item for item in pending}
+        for future in concurrent.futures.as_completed(downloads):
+            item = downloads[future]
+            try:
+                transferred, resumed = future.result()
+            except SessionExpired:
+                raise
+            except (BrightspaceError, OSError) as e:
+                report.failed += 1
+                log(f"✗ {item.path}: {e}")
+                continue
+            report.downloaded += 1
+            report.resumed += resumed
+            report.bytes += transferred
+            log(f"  {'♻' if resumed else '✓'} {item.path}")
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        manifest.save()
+        report.elapsed = time.perf_counter() - start
+        report.connections = client.connections_opened
+    return report
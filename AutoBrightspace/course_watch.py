@@ -0,0 +1,231 @@
+"""
+Announcement and assignment watcher for AutoBrightspace
+
+`python AutoBrightSpace.py watch` replaces periodic full browser logins for
+checking Brightspace. It keeps the session stored by the last login and
+polls the announcements and assignment folders of every course over one
+pooled BrightspaceClient. The session cookies it renews are written back
+to the store. Requests go through the API cache with no freshness
+allowance, so every poll asks the server, but an unchanged feed only costs
+a conditional request answered with 304.
+
+Results are diffed against a local SQLite store and only what was not seen
+before is emitted: new announcements, new assignments and assignments
+whose deadline moved. The first poll records what already exists without
+reporting it. The interval adapts: it grows while nothing changes, drops
+back to the base interval when something new appears, and errors back off
+exponentially.
+"""
+
+import json
+import time
+import random
+import sqlite3
+import concurrent.futures
+
+from brightspace_api import (BrightspaceError, SessionExpired, list_courses, announcements,
+                             assignment_folders)
+from content_sync import parse_date
+
+DEFAULT_INTERVAL = 5 * 60
+MIN_INTERVAL = 60
+MAX_INTERVAL = 30 * 60
+# Interval growth per poll that finds nothing new
+GROWTH = 1.5
+JITTER = 0.1
+BACKOFF_BASE = 30
+MAX_BACKOFF = 30 * 60
+WORKERS = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    kind TEXT NOT NULL,
+    org_unit INTEGER NOT NULL,
+    item_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    due TEXT,
+    first_seen REAL NOT NULL,
+    PRIMARY KEY (kind, org_unit, item_id)
+);
+"""
+
+class WatchItem:
+    """An announcement or assignment as the watcher reports it"""
+
+    def __init__(self, kind, org_unit, course, item_id, title, when=None, url='', change='new'):
+        self.kind = kind            # announcement or assignment
+        self.org_unit = org_unit
+        self.course = course
+        self.item_id = item_id
+        self.title = title
+        self.when = when            # Announcement date or assignment due date, as sent by the API
+        self.url = url
+        self.change = change        # new, or deadline if an assignment's due date moved
+
+    def describe(self):
+        when = parse_date(self.when)
+        when = time.strftime('%a %d %b %H:%M', time.localtime(when)) if when else ''
+        if self.kind == 'announcement':
+            detail = f" ({when})" if when else ''
+            return f"📋 [{self.course}] Announcement: {self.title}{detail}"
+        if self.change == 'deadline':
+            return f"⚠ [{self.course}] Deadline changed: {self.title} is now due {when or 'without a deadline'}"
+        return f"📋 [{self.course}] Assignment: {self.title}" + (f", due {when}" if when else '')
+
+    def as_dict(self):
+        return {'kind': self.kind, 'change': self.change, 'course': self.course, 'org_unit': self.org_unit,
+                'id': self.item_id, 'title': self.title, 'when': self.when, 'url': self.url}
+
+def course_items(client, org_unit, course):
+    """Fetch the published announcements and visible assignments of one course"""
+    base = client.base_url
+    items = [WatchItem('announcement', org_unit, course, news['Id'], news.get('Title', ''),
+                       news.get('StartDate'), f"{base}/d2l/le/news/{org_unit}/{news['Id']}/view")
+             for news in announcements(client, org_unit)
+             if news.get('IsPublished', True) and not news.get('IsHidden')]
+    items += [WatchItem('assignment', org_unit, course, folder['Id'], folder.get('Name', ''),
+                        folder.get('DueDate'),
+                        f"{base}/d2l/lms/dropbox/user/folder_submit_files.d2l?db={folder['Id']}&ou={org_unit}")
+              for folder in assignment_folders(client, org_unit) if not folder.get('IsHidden')]
+    return items
+
+class WatchStore:
+    """SQLite record of the announcements and assignments already seen"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5)
+        connection.executescript(SCHEMA)
+        return connection
+
+    def is_empty(self):
+        with self._connect() as connection:
+            count = connection.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        connection.close()
+        return count == 0
+
+    def diff(self, items):
+        """Record items and return those that are new or whose deadline moved"""
+        changes = []
+        now = time.time()
+        with self._connect() as connection:
+            for item in items:
+                row = connection.execute(
+                    "SELECT due FROM items WHERE kind = ? AND org_unit = ? AND item_id = ?",
+                    (item.kind, item.org_unit, item.item_id)).fetchone()
+                if row is None:
+                    connection.execute(
+                        "INSERT INTO items (kind, org_unit, item_id, title, due, first_seen) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (item.kind, item.org_unit, item.item_id, item.title,
+                         item.when if item.kind == 'assignment' else None, now))
+                    changes.append(item)
+                elif item.kind == 'assignment' and row[0] != item.when:
+                    connection.execute(
+                        "UPDATE items SET due = ?, title = ? WHERE kind = ? AND org_unit = ? AND item_id = ?",
+                        (item.when, item.title, item.kind, item.org_unit, item.item_id))
+                    item.change = 'deadline'
+                    changes.append(item)
+        connection.close()
+        return changes
+
+class CourseWatcher:
+    """Polls every course on an adaptive interval and emits what is new"""
+
+    def __init__(self, client, store, interval=DEFAULT_INTERVAL, emit=None, log=print,
+                 rng=random.random, workers=WORKERS):
+        self.client = client
+        self.store = store
+        self.base_interval = max(MIN_INTERVAL, interval)
+        self.interval = self.base_interval
+        self.emit = emit or (lambda item: print(item.describe()))
+        self.log = log
+        self.rng = rng
+        self.workers = workers
+        self.failures = 0
+
+    def poll(self):
+        """Fetch every course once; returns the new items, already emitted
+
+        Raises SessionExpired when the session is rejected; other errors
+        count as a failed poll unless only some courses failed.
+        """
+        try:
+            courses = list_courses(self.client)
+        except SessionExpired:
+            raise
+        except BrightspaceError as e:
+            self._failed(e)
+            return []
+
+        items, failed = [], []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(course_items, self.client, org_unit, name): name
+                       for org_unit, name, _ in courses}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    items.extend(future.result())
+                except SessionExpired:
+                    raise
+                except BrightspaceError as e:
+                    failed.append(futures[future])
+                    self.log(f"⚠ Could not check {futures[future]}: {e}")
+        if courses and len(failed) == len(courses):
+            self._failed(f"all {len(courses)} courses failed")
+            return []
+        self.failures = 0
+
+        baseline = self.store.is_empty()
+        changes = self.store.diff(items)
+        if baseline:
+            self.log(f"Recorded {len(changes)} existing announcements and assignments in "
+                     f"{len(courses)} courses; reporting new ones from now on")
+            return []
+        for item in changes:
+            self.emit(item)
+        if changes:
+            self.interval = self.base_interval
+        else:
+            self.interval = min(MAX_INTERVAL, self.interval * GROWTH)
+        return changes
+
+    def _failed(self, error):
+        self.failures += 1
+        self.log(f"⚠ Poll failed ({error}); retrying in ~{self._backoff() / 60:.1f} min")
+
+    def _backoff(self):
+        return min(MAX_BACKOFF, BACKOFF_BASE * 2 ** (self.failures - 1))
+
+    def next_delay(self):
+        """Seconds until the next poll, with jitter"""
+        delay = self._backoff() if self.failures else self.interval
+        return delay * (1 + JITTER * (2 * self.rng() - 1))
+
+    def run(self, stop=None):
+        """Poll until stop (a threading.Event) is set, Ctrl+C or the session expires
+
+        Returns False if it stopped because the session expired.
+        """
+        self.log(f"Watching announcements and assignments; polling every ~{self.interval / 60:.0f} min "
+                 f"or less often while nothing changes (Ctrl+C to stop)")
+        try:
+            while True:
+                self.poll()
+                delay = self.next_delay()
+                if stop is not None:
+                    if stop.wait(delay):
+                        return True
+                else:
+                    time.sleep(delay)
+        except SessionExpired:
+            self.log("✗ The stored session has expired. Log in again with 'python AutoBrightSpace.py run'.")
+            return False
+        except KeyboardInterrupt:
+            self.log("\nWatch stopped")
+            return True
+
+def json_line(item):
+    """Emit an item as one JSON object per line, for scripts"""
+    print(json.dumps(item.as_dict()), flush=True)
@@ -0,0 +1,146 @@
+"""
+PyInstaller runtime hook for AutoBrightspace startup profiling
+
+Injected by build_tool.py --profile-startup. Runs before the application
+script, times every module import and exposes a small profiler module that
+the application marks at each startup phase. The timeline is appended as
+one JSON line per launch to startup_profiles/timeline.jsonl in the user
+data directory, where `build_tool.py --startup-report` reads it, or to
+$AUTOBRIGHTSPACE_STARTUP_PROFILE_DIR if set.
+"""
+
+import os
+import sys
+import json
+import time
+import types
+import atexit
+import builtins
+import tempfile
+
+PROFILE_MODULE = "_autobrightspace_startup_profile"
+TIMELINE_FILE = "timeline.jsonl"
+PROFILE_DIR_ENV = "AUTOBRIGHTSPACE_STARTUP_PROFILE_DIR"
+
+_hook_start = time.perf_counter()
+_hook_start_wall = time.time()
+_marks = []
+_import_times = {}
+_import_stack = []
+_finished = False
+_original_import = builtins.__import__
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """Wrap __import__ and record the self time of each newly imported module"""
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    start = time.perf_counter()
+    _import_stack.append(0.0)
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - start
+        children = _import_stack.pop()
+        if _import_stack:
+            _import_stack[-1] += elapsed
+        _import_times[name] = _import_times.get(name, 0.0) + (elapsed - children)
+
+def _process_start_time(pid):
+    """Return the wall-clock start time of a process, or None if unknown"""
+    try:
+        import psutil
+        return psutil.Process(pid).create_time()
+    except Exception:
+        pass
+
+    # Linux fallback: start time in clock ticks since boot from /proc
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        start_ticks = int(fields[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        age = uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+        return time.time() - age
+    except Exception:
+        return None
+
+def _bootloader_phases():
+    """Split the time before this hook into bootloader and Python init phases"""
+    phases = {}
+    own_start = _process_start_time(os.getpid())
+    if own_start is None:
+        return phases
+
+    # In onefile builds the parent process is the bootloader that extracted
+    # the archive before starting us
+    parent_start = None
+    try:
+        parent_exe = os.path.realpath(f"/proc/{os.getppid()}/exe")
+        if parent_exe == os.path.realpath(sys.executable):
+            parent_start = _process_start_time(os.getppid())
+    except Exception:
+        pass
+
+    if parent_start is not None:
+        phases["bootloader"] = max(0.0, own_start - parent_start) * 1000
+    phases["python_init"] = max(0.0, _hook_start_wall - own_start) * 1000
+    return phases
+
+def default_output_dir():
+    """The directory the app and --startup-report use, so early exits are reported too"""
+    if os.environ.get(PROFILE_DIR_ENV):
+        return os.environ[PROFILE_DIR_ENV]
+    try:
+        import appdirs
+        return os.path.join(appdirs.user_data_dir("AutoBrightspace"), "startup_profiles")
+    except ImportError:
+        return os.path.join(tempfile.gettempdir(), "AutoBrightspace-startup")
+
+def mark(name):
+    """Record the end of a startup phase"""
+    _marks.append((name, time.perf_counter()))
+
+def finish(output_dir=None):
+    """Stop profiling and append this launch's timeline to the profile file"""
+    global _finished
+    if _finished:
+        return None
+    _finished = True
+    builtins.__import__ = _original_import
+
+    phases = _bootloader_phases()
+    previous = _hook_start
+    for name, timestamp in _marks:
+        phases[name] = phases.get(name, 0.0) + (timestamp - previous) * 1000
+        previous = timestamp
+
+    slow_imports = sorted(_import_times.items(), key=lambda item: item[1], reverse=True)[:20]
+    timeline = {
+        "timestamp": _hook_start_wall,
+        "executable": sys.executable,
+        "argv": sys.argv[1:],
+        "phases_ms": {name: round(ms, 2) for name, ms in phases.items()},
+        "total_ms": round((previous - _hook_start) * 1000 + phases.get("bootloader", 0.0)
+                          + phases.get("python_init", 0.0), 2),
+        "top_imports_ms": [[name, round(seconds * 1000, 2)] for name, seconds in slow_imports]
+    }
+
+    output_dir = output_dir or default_output_dir()
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, TIMELINE_FILE)
+        with open(path, "a") as f:
+            f.write(json.dumps(timeline) + "\n")
+        return path
+    except OSError:
+        return None
+
+builtins.__import__ = _timed_import
+atexit.register(finish)
+
+_module = types.ModuleType(PROFILE_MODULE)
+_module.mark = mark
+_module.finish = finish
+sys.modules[PROFILE_MODULE] = _module
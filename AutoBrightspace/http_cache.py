@@ -0,0 +1,251 @@
+"""
+Conditional-request cache for the Brightspace API
+
+Scripted use after a login asks for the same course lists, contents and
+announcements over and over. ApiCache keeps the JSON responses of API GETs
+in a size-bounded SQLite store in the user data directory:
+
+- A response younger than its freshness lifetime is served without any
+  network traffic. The lifetime is the server's max-age. When the server
+  sends no max-age or no-cache, it is min_fresh seconds, so a burst of
+  repeat queries from a script does not reach the LMS. no-cache and
+  max-age=0 are honoured: such responses are revalidated on every use.
+- An older one is revalidated with If-None-Match / If-Modified-Since. A
+  304 costs one small round trip instead of the whole body.
+- Past max_bytes the least recently used entries are evicted.
+- no-store responses are never kept.
+
+Hits, revalidations and misses are counted in the store for `stats`.
+Cache failures never fail a request; it is then simply not cached.
+"""
+
+import time
+import sqlite3
+import hashlib
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored REAL NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_MIN_FRESH = 30
+# Outcomes of a lookup, as counted in the store
+OUTCOMES = ('hit', 'revalidated', 'miss')
+
+def load_cache_config(path):
+    """Return (enabled, max_bytes, min_fresh) from the [ApiCache] section of config.ini"""
+    from configparser import ConfigParser, Error
+
+    config = ConfigParser()
+    try:
+        config.read(path)
+        return (config.getboolean('ApiCache', 'enabled', fallback=True),
+                int(config.getfloat('ApiCache', 'max_size_mb', fallback=DEFAULT_MAX_BYTES / 1024 / 1024)
+                    * 1024 * 1024),
+                config.getfloat('ApiCache', 'min_fresh', fallback=DEFAULT_MIN_FRESH))
+    except (Error, ValueError):
+        return True, DEFAULT_MAX_BYTES, DEFAULT_MIN_FRESH
+
+def freshness(cache_control, min_fresh=DEFAULT_MIN_FRESH):
+    """Seconds a response stays fresh per its Cache-Control, or None if it must not be stored
+
+    The server's max-age wins when it sends one, and no-cache or max-age=0
+    mean revalidate every time; min_fresh only fills in when the server
+    says nothing about freshness.
+    """
+    directives = {}
+    for part in (cache_control or '').split(','):
+        name, _, value = part.strip().partition('=')
+        directives[name.lower()] = value.strip('"')
+    if 'no-store' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0.0  # Stored, but revalidated on every use
+    if 'max-age' in directives:
+        try:
+            return max(0.0, float(directives['max-age']))
+        except ValueError:
+            pass
+    # No usable directive from the server: our own allowance applies
+    return min_fresh
+
+class CacheEntry:
+    """A stored response body with its validators"""
+
+    def __init__(self, key, url, etag, last_modified, body, expires):
+        self.key = key
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body = body
+        self.expires = expires
+
+    def fresh(self, now=None):
+        return (now or time.time()) < self.expires
+
+    def validators(self):
+        """Headers that make the next request conditional"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+class ApiCache:
+    """Size-bounded LRU store of API responses with conditional revalidation"""
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, min_fresh=DEFAULT_MIN_FRESH):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.min_fresh = min_fresh
+        self.session = dict.fromkeys(OUTCOMES, 0)   # Outcomes since this object was made
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5)
+        connection.executescript(SCHEMA)
+        return connection
+
+    @staticmethod
+    def key(url):
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def lookup(self, url):
+        """The stored entry for url, fresh or not, or None"""
+        try:
+            with self._lock, self._connect() as connection:
+                row = connection.execute(
+                    "SELECT key, url, etag, last_modified, body, expires FROM entries WHERE key = ?",
+                    (self.key(url),)).fetchone()
+            connection.close()
+        except sqlite3.Error:
+            return None
+        return CacheEntry(*row) if row else None
+
+    def store(self, url, headers, body):
+        """Keep a 200 response; headers is the response's HTTPMessage"""
+        lifetime = freshness(headers.get('Cache-Control'), self.min_fresh)
+        if lifetime is None or len(body) > self.max_bytes:
+            return False
+        now = time.time()
+        try:
+            with self._lock, self._connect() as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO entries (key, url, etag, last_modified, body, size, stored, "
+                    "expires, accessed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (self.key(url), url, headers.get('ETag'), headers.get('Last-Modified'), body,
+                     len(body), now, now + lifetime, now))
+                self._evict(connection)
+            connection.close()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def refresh(self, entry, headers):
+        """Extend an entry's lifetime after the server answered 304 Not Modified"""
+        lifetime = freshness(headers.get('Cache-Control'), self.min_fresh)
+        now = time.time()
+        entry.expires = now + (lifetime or 0)
+        entry.etag = headers.get('ETag') or entry.etag
+        try:
+            with self._lock, self._connect() as connection:
+                connection.execute("UPDATE entries SET expires = ?, etag = ?, accessed = ? WHERE key = ?",
+                                   (entry.expires, entry.etag, now, entry.key))
+            connection.close()
+        except sqlite3.Error:
+            pass
+
+    def touch(self, entry):
+        """Mark an entry as used, for the LRU order"""
+        try:
+            with self._lock, self._connect() as connection:
+                connection.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), entry.key))
+            connection.close()
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, connection):
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in connection.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def record(self, outcome, saved=0):
+        """Count a lookup outcome; saved is the body size not transferred"""
+        with self._lock:
+            self.session[outcome] += 1
+            self.bytes_saved += saved
+        try:
+            with self._lock, self._connect() as connection:
+                for name, value in ((outcome, 1), ('bytes_saved', saved)):
+                    connection.execute(
+                        "INSERT INTO counters (name, value) VALUES (?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, value))
+            connection.close()
+        except sqlite3.Error:
+            pass
+
+    def stats(self):
+        """Counters since the store was created, with its entry count and size"""
+        try:
+            with self._lock, self._connect() as connection:
+                counters = dict(connection.execute("SELECT name, value FROM counters"))
+                entries, size = connection.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            connection.close()
+        except sqlite3.Error:
+            return {}
+        return {**dict.fromkeys(OUTCOMES + ('bytes_saved',), 0), **counters, 'entries': entries, 'size': size}
+
+    def summary(self):
+        """One line on this session's hit rate"""
+        lookups = sum(self.session.values())
+        if not lookups:
+            return "API cache: no lookups"
+        served = self.session['hit'] + self.session['revalidated']
+        return (f"API cache: {served}/{lookups} served from cache ({served / lookups * 100:.0f}%; "
+                f"{self.session['hit']} without a request, {self.session['revalidated']} revalidated), "
+                f"{self.bytes_saved / 1024:.0f} KB not transferred")
+
+    def clear(self):
+        try:
+            with self._lock, self._connect() as connection:
+                connection.execute("DELETE FROM entries")
+            connection.close()
+        except sqlite3.Error:
+            pass
+
+def print_cache_stats(cache):
+    """Print the cache's all-time hit rate and size"""
+    stats = cache.stats()
+    lookups = sum(stats.get(outcome, 0) for outcome in OUTCOMES)
+    if not lookups:
+        return
+    served = stats['hit'] + stats['revalidated']
+    print("\nAPI cache:")
+    print(f"  Lookups: {lookups}   Served from cache: {served / lookups * 100:.0f}% "
+          f"({stats['hit']} without a request, {stats['revalidated']} revalidated, {stats['miss']} misses)")
+    print(f"  Not transferred: {stats['bytes_saved'] / 1024 / 1024:.1f} MB   "
+          f"Stored: {stats['entries']} entries, {stats['size'] / 1024 / 1024:.1f} of "
+          f"{cache.max_bytes / 1024 / 1024:.0f} MB")
@@ -0,0 +1,156 @@
+"""
+Session keep-alive for AutoBrightspace
+
+Opt-in: enabled with `enabled = yes` in the [KeepAlive] section of
+config.ini (the GUI then refreshes while it runs) or by running the
+`keepalive` mode. Every refresh is one authenticated HEAD request per host
+with the stored session cookies, so the idle timers of Brightspace and the
+IdP restart and a later login finds the session live.
+
+The interval adapts to what it observes. Until a session has been seen to
+expire it grows slowly from DEFAULT_INTERVAL. After that it stays at a
+safe fraction of the shortest idle time that let a session die. Network
+errors back off exponentially and every interval gets random jitter. Each
+refresh is stored in the telemetry database for `stats`.
+"""
+
+import time
+import random
+
+from session_probe import domain_matches
+
+# Hosts refreshed with the stored cookies; the first decides if the session is alive
+KEEPALIVE_TARGETS = (
+    ('brightspace.universiteitleiden.nl', '/d2l/home'),
+    ('login.uaccess.leidenuniv.nl', '/nidp/app'),
+)
+DEFAULT_INTERVAL = 15 * 60
+MIN_INTERVAL = 60
+MAX_INTERVAL = 60 * 60
+# Refresh at this fraction of the shortest idle time that let a session expire
+SAFETY_FACTOR = 0.5
+# Interval growth per refresh while no expiry has been observed
+GROWTH = 1.2
+JITTER = 0.1
+BACKOFF_BASE = 30
+MAX_BACKOFF = 30 * 60
+# How often to look for a new session once the stored one is gone
+IDLE_CHECK_INTERVAL = 5 * 60
+
+def keepalive_enabled(path):
+    """True if [KeepAlive] enabled is set in config.ini"""
+    from configparser import ConfigParser, Error
+
+    config = ConfigParser()
+    try:
+        config.read(path)
+        return config.getboolean('KeepAlive', 'enabled', fallback=False)
+    except (Error, ValueError):
+        return False
+
+def set_keepalive_enabled(path, enabled):
+    """Persist the [KeepAlive] setting, keeping the rest of config.ini"""
+    from configparser import ConfigParser
+
+    config = ConfigParser()
+    config.read(path)
+    if not config.has_section('KeepAlive'):
+        config.add_section('KeepAlive')
+    config.set('KeepAlive', 'enabled', 'yes' if enabled else 'no')
+    with open(path, 'w') as f:
+        config.write(f)
+
+class KeepAliveScheduler:
+    """Decides when to refresh next and records what each refresh found"""
+
+    def __init__(self, sessions, history, log=print, rng=random.random):
+        self.sessions = sessions    # session_probe.SessionStore
+        self.history = history      # telemetry.TelemetryStore
+        self.log = log
+        self.rng = rng
+        gaps = history.expiry_gaps()
+        self.ceiling = self._clamp(min(gaps) * SAFETY_FACTOR) if gaps else MAX_INTERVAL
+        self.interval = min(DEFAULT_INTERVAL, self.ceiling)
+        self.failures = 0
+        self.last_alive = None
+        self.idle = False           # No stored session to keep alive
+
+    @staticmethod
+    def _clamp(seconds):
+        return max(MIN_INTERVAL, min(MAX_INTERVAL, seconds))
+
+    def next_delay(self):
+        """Seconds until the next refresh, with jitter"""
+        if self.idle:
+            delay = IDLE_CHECK_INTERVAL
+        elif self.failures:
+            delay = min(MAX_BACKOFF, BACKOFF_BASE * 2 ** (self.failures - 1))
+        else:
+            delay = self.interval
+        return delay * (1 + JITTER * (2 * self.rng() - 1))
+
+    def refresh(self):
+        """Refresh every target once; returns the outcome for the session"""
+        saved = self.sessions.saved_at()
+        if saved is None:
+            if not self.idle:
+                self.log("Keep-alive: no stored session, waiting for the next login")
+            self.idle = True
+            return 'missing'
+        self.idle = False
+
+        now = time.time()
+        # A login after the last refresh starts the idle clock again
+        since = max(saved, self.last_alive or 0)
+        idle_s = now - since
+        session_age_s = now - saved
+
+        cookies = self.sessions.load()
+        outcome = detail = None
+        for index, (host, path) in enumerate(KEEPALIVE_TARGETS):
+            if index and not any(domain_matches(cookie.get('domain', ''), host) for cookie in cookies):
+                continue  # No session with this IdP to refresh
+            result = self.sessions.probe(host, path)
+            host_outcome = {'valid': 'alive', 'error': 'error'}.get(result.status, 'expired')
+            self.history.record_refresh(host, host_outcome, idle_s, session_age_s, self.interval)
+            if index == 0:
+                outcome, detail = host_outcome, result.reason
+
+        if outcome == 'alive':
+            self.failures = 0
+            self.last_alive = now
+            if self.ceiling == MAX_INTERVAL:
+                # No expiry seen yet: stretch the interval to learn the timeout
+                self.interval = self._clamp(self.interval * GROWTH)
+            self.log(f"Keep-alive: session alive after {idle_s / 60:.0f} min idle ({detail}); "
+                     f"next refresh in ~{self.interval / 60:.0f} min")
+        elif outcome == 'expired':
+            self.failures = 0
+            self.ceiling = min(self.ceiling, self._clamp(idle_s * SAFETY_FACTOR))
+            self.interval = min(self.interval, self.ceiling)
+            self.last_alive = None
+            self.sessions.clear()
+            self.idle = True
+            self.log(f"Keep-alive: session expired after {idle_s / 60:.0f} min idle "
+                     f"({session_age_s / 60:.0f} min old); refreshing every "
+                     f"~{self.interval / 60:.0f} min from now on")
+        else:
+            self.failures += 1
+            self.log(f"⚠ Keep-alive refresh failed ({detail}); retrying in "
+                     f"~{min(MAX_BACKOFF, BACKOFF_BASE * 2 ** (self.failures - 1)) / 60:.1f} min")
+        return outcome
+
+    def run(self, stop=None):
+        """Refresh until stop (a threading.Event) is set or Ctrl+C"""
+        self.log(f"Keep-alive running; first refresh now, then every ~{self.interval / 60:.0f} min")
+        try:
+            while True:
+                self.refresh()
+                delay = self.next_delay()
+                if stop is not None:
+                    if stop.wait(delay):
+                        return
+                else:
+                    time.sleep(delay)
+        except KeyboardInterrupt:
+            self.log("\nKeep-alive stopped")
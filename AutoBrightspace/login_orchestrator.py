@@ -0,0 +1,283 @@
+"""
+Concurrent login preparation for AutoBrightspace
+
+Before the first page loads, a login needs a running browser, the decrypted
+credentials, warm connections to the SSO hosts and a clock the TOTP code can
+trust. None of these depend on each other, so prepare_login runs them
+concurrently on an asyncio loop and the wait is the slowest step instead of
+their sum. The loop lives on a shared EventLoopThread, so the GUI's worker
+threads and the blocking CLI flow both hand it coroutines the same way.
+"""
+
+import ssl
+import math
+import time
+import socket
+import asyncio
+import threading
+import email.utils
+
+# Hosts the login flow visits, in order
+SSO_HOSTS = (
+    'brightspace.universiteitleiden.nl',
+    'engine.surfconext.nl',
+    'login.uaccess.leidenuniv.nl',
+    'mfa.services.universiteitleiden.nl',
+)
+WARMUP_TIMEOUT = 5.0
+
+# How far ahead each host is warmed, per the [Prewarm] section of config.ini:
+#   dns         resolve only, filling the OS resolver cache the browser uses
+#   tls         also complete a TLS handshake of our own. This only checks
+#               reachability and measures the clock skew for the 2FA code;
+#               the browser cannot use that connection, so it saves the
+#               browser no handshake time
+#   preconnect  also ask the browser to open its own connection in advance,
+#               the only mode that takes handshakes off the login's path
+PREWARM_MODES = ('off', 'dns', 'tls', 'preconnect')
+DEFAULT_PREWARM = {host: 'preconnect' for host in SSO_HOSTS}
+
+# Added to the current page so Chrome opens connections it can reuse when
+# the login flow gets there; reads its origins from arguments[0]
+PRECONNECT_SCRIPT = """
+for (const origin of arguments[0]) {
+    for (const rel of ['preconnect', 'dns-prefetch']) {
+        const link = document.createElement('link');
+        link.rel = rel;
+        link.href = origin;
+        (document.head || document.documentElement).appendChild(link);
+    }
+}
+return arguments[0].length;
+"""
+# Clock differences below this are within the Date header's precision
+CLOCK_SKEW_THRESHOLD = 5.0
+# Submitting a TOTP code this close to the end of its window risks a reject
+MIN_TOTP_VALIDITY = 3.0
+
+class PreparedLogin:
+    """Results and timings of the concurrent preparation steps"""
+
+    def __init__(self):
+        self.driver = None
+        self.credentials = None
+        self.warm_hosts = {}      # host -> connect ms, None if it failed
+        self.clock_skew = 0.0     # seconds the server clock is ahead of ours
+        self.timings = {}         # step -> ms
+        self.elapsed_ms = 0.0
+        self.warm_task = None
+        self.session = None       # ProbeResult of the stored session, if probed
+
+    @property
+    def overlap_ms(self):
+        """Time saved compared to running the finished steps one after another"""
+        return max(0.0, sum(self.timings.values()) - self.elapsed_ms)
+
+    def summary(self):
+        steps = ", ".join(f"{name} {ms:.0f} ms" for name, ms in self.timings.items())
+        if self.warm_task and not self.warm_task.done():
+            steps += ", warm-up continuing in background"
+        return f"⚡ Prepared login in {self.elapsed_ms:.0f} ms ({steps}; {self.overlap_ms:.0f} ms overlapped)"
+
+async def _timed(prepared, name, awaitable):
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        prepared.timings[name] = (time.perf_counter() - start) * 1000
+
+def load_prewarm_config(path, log=print):
+    """Return {host: mode} from config.ini, falling back to DEFAULT_PREWARM
+
+    Hosts in the [Prewarm] section override the defaults and may add hosts
+    of their own; "off" disables a host.
+    """
+    from configparser import ConfigParser, Error
+
+    plan = dict(DEFAULT_PREWARM)
+    config = ConfigParser()
+    try:
+        config.read(path)
+    except Error as e:
+        log(f"⚠ Could not read pre-warm settings: {e}")
+        return plan
+    if config.has_section('Prewarm'):
+        for host, mode in config.items('Prewarm'):
+            mode = mode.strip().lower()
+            if mode not in PREWARM_MODES:
+                log(f"⚠ Unknown pre-warm mode '{mode}' for {host}; "
+                    f"expected one of {', '.join(PREWARM_MODES)}")
+                continue
+            plan[host] = mode
+    return {host: mode for host, mode in plan.items() if mode != 'off'}
+
+def preconnect_origins(plan):
+    """Origins the browser should preconnect to, in visiting order"""
+    return [f"https://{host}" for host, mode in plan.items() if mode == 'preconnect']
+
+def preconnect(execute_script, plan, skip=(), log=print):
+    """Have the browser open connections to the plan's preconnect hosts
+
+    execute_script is driver.execute_script or CDPBrowser.call_function;
+    hosts in skip (e.g. the one already loaded) are left out. Returns the
+    number of hosts hinted.
+    """
+    origins = [origin for origin in preconnect_origins(plan)
+               if origin.split('://', 1)[1] not in skip]
+    if not origins:
+        return 0
+    try:
+        execute_script(PRECONNECT_SCRIPT, origins)
+    except Exception as e:
+        log(f"⚠ Preconnect hints failed: {str(e).splitlines()[0] if str(e) else type(e).__name__}")
+        return 0
+    return len(origins)
+
+async def warm_host(host, port=443, timeout=WARMUP_TIMEOUT, mode='tls'):
+    """Resolve a host and, unless mode is 'dns', complete a TLS handshake with it
+
+    Returns (ms, server Date as a timestamp or None). Resolving fills the
+    OS resolver cache the browser uses as well.
+    """
+    start = time.perf_counter()
+    if mode == 'dns':
+        loop = asyncio.get_running_loop()
+        await asyncio.wait_for(loop.getaddrinfo(host, port, type=socket.SOCK_STREAM), timeout)
+        return (time.perf_counter() - start) * 1000, None
+
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(host, port, ssl=ssl.create_default_context()), timeout)
+    connect_ms = (time.perf_counter() - start) * 1000
+    server_time = None
+    try:
+        writer.write(f"HEAD / HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            if not line.strip():
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.strip().lower() == 'date':
+                server_time = email.utils.parsedate_to_datetime(value.strip()).timestamp()
+    except (OSError, ValueError, TypeError, asyncio.TimeoutError):
+        pass  # The handshake is what matters; the clock check is a bonus
+    finally:
+        writer.close()
+    return connect_ms, server_time
+
+async def warm_up(prepared, plan, timeout=WARMUP_TIMEOUT, log=print):
+    """Warm every host in the plan concurrently and estimate the clock skew"""
+    hosts = list(plan)
+    results = await asyncio.gather(*(warm_host(host, timeout=timeout, mode=plan[host]) for host in hosts),
+                                   return_exceptions=True)
+    skews = []
+    for host, result in zip(hosts, results):
+        if isinstance(result, BaseException):
+            prepared.warm_hosts[host] = None
+            continue
+        connect_ms, server_time = result
+        prepared.warm_hosts[host] = connect_ms
+        if server_time is not None:
+            skews.append(server_time - time.time())
+    if skews:
+        skew = sorted(skews)[len(skews) // 2]
+        prepared.clock_skew = skew if abs(skew) >= CLOCK_SKEW_THRESHOLD else 0.0
+
+    cold = [host for host, ms in prepared.warm_hosts.items() if ms is None]
+    if cold:
+        log(f"⚠ Could not warm up {', '.join(cold)}")
+    if prepared.clock_skew:
+        log(f"⚠ System clock is {abs(prepared.clock_skew):.0f} s "
+            f"{'behind' if prepared.clock_skew > 0 else 'ahead of'} the SSO servers; "
+            f"correcting the 2FA code")
+
+async def prepare_login(start_driver, load_credentials=None, hosts=None, log=print, probe_session=None):
+    """Start the browser, decrypt credentials and warm up the SSO hosts concurrently
+
+    start_driver, load_credentials and probe_session are blocking callables
+    and run on worker threads; a failing session probe just means a full
+    login. hosts is a {host: mode} pre-warm plan (DEFAULT_PREWARM
+    if None). Only the callables gate the login: a warm-up still running
+    when both are done carries on in the background, and a failing one is
+    logged and never fails the login.
+    """
+    loop = asyncio.get_running_loop()
+    prepared = PreparedLogin()
+    start = time.perf_counter()
+
+    hosts = DEFAULT_PREWARM if hosts is None else hosts
+    if hosts:
+        prepared.warm_task = loop.create_task(
+            _timed(prepared, 'warm-up', warm_up(prepared, hosts, log=log)))
+    steps = [_timed(prepared, 'driver', loop.run_in_executor(None, start_driver))]
+    if load_credentials:
+        steps.append(_timed(prepared, 'credentials', loop.run_in_executor(None, load_credentials)))
+    if probe_session:
+        steps.append(_timed(prepared, 'session probe', loop.run_in_executor(None, probe_session)))
+    results = await asyncio.gather(*steps, return_exceptions=True)
+
+    prepared.elapsed_ms = (time.perf_counter() - start) * 1000
+    if isinstance(results[0], BaseException):
+        raise results[0]
+    prepared.driver = results[0]
+    if load_credentials:
+        if isinstance(results[1], BaseException):
+            raise results[1]
+        prepared.credentials = results[1]
+    if probe_session and not isinstance(results[-1], BaseException):
+        prepared.session = results[-1]
+    return prepared
+
+def fresh_totp_code(totp, clock_skew=0.0, min_validity=MIN_TOTP_VALIDITY, sleep=time.sleep, log=print):
+    """Return a TOTP code that stays valid for at least min_validity seconds
+
+    Near the end of a window this waits for the next one rather than submit
+    a code that may expire in transit. sleep may return True to abort, in
+    which case None is returned.
+    """
+    now = time.time() + clock_skew
+    remaining = totp.interval - now % totp.interval
+    if remaining < min_validity:
+        log(f"Waiting {remaining:.1f} s for a fresh 2FA code")
+        if sleep(remaining):
+            return None
+        now = math.ceil(now + remaining)  # Safely inside the next window
+    return totp.at(now)
+
+class EventLoopThread:
+    """An asyncio loop on a daemon thread that blocking code can submit coroutines to"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='asyncio', daemon=True)
+        self.thread.start()
+
+    def submit(self, coroutine):
+        """Schedule a coroutine; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, coroutine, on_cancel=None):
+        """Run a coroutine to completion from another thread
+
+        on_cancel, if given, registers a callback that cancels the coroutine
+        (e.g. CancellationToken.on_cancel); a cancelled run raises
+        concurrent.futures.CancelledError.
+        """
+        future = self.submit(coroutine)
+        if on_cancel:
+            on_cancel(future.cancel)
+        return future.result()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+_shared_loop = None
+_shared_loop_lock = threading.Lock()
+
+def shared_event_loop():
+    """Return the process-wide EventLoopThread, starting it on first use"""
+    global _shared_loop
+    with _shared_loop_lock:
+        if _shared_loop is None:
+            _shared_loop = EventLoopThread()
+        return _shared_loop
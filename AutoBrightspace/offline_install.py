@@ -0,0 +1,270 @@
+"""
+Dependency installation for AutoBrightspace, standard library only
+
+A fresh machine has none of the app's dependencies, so AutoBrightSpace.py
+cannot even be imported there. This module can: `python offline_install.py
+--wheelhouse PATH` (or `python AutoBrightSpace.py install --wheelhouse PATH`,
+which falls back to it) checks requirements.txt against the installed
+distributions, installs what is missing in one pip run and copies the
+bundled ChromeDriver into the user data directory. A wheelhouse's files are
+checked against the SHA-256 hashes in its manifest before pip sees them.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import platform
+import subprocess
+
+APP_NAME = "AutoBrightspace"
+# Used when requirements.txt is missing
+REQUIRED_MODULES = ['pyotp', 'selenium', 'appdirs', 'pyinstaller', 'webdriver-manager', 'pillow', 'PyQt5', 'cryptography']
+REQUIREMENTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'requirements.txt')
+WHEELHOUSE_MANIFEST = 'wheelhouse.json'
+BUNDLED_DRIVER_NAME = 'chromedriver.exe' if platform.system().lower() == 'windows' else 'chromedriver'
+
+def user_data_dir():
+    """appdirs.user_data_dir(APP_NAME), computed without appdirs if it is not installed yet"""
+    try:
+        import appdirs
+        return appdirs.user_data_dir(APP_NAME)
+    except ImportError:
+        pass
+    system = platform.system().lower()
+    if system == 'windows':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser(os.path.join('~', 'AppData', 'Local'))
+        return os.path.join(base, APP_NAME, APP_NAME)
+    if system == 'darwin':
+        return os.path.expanduser(os.path.join('~', 'Library', 'Application Support', APP_NAME))
+    base = os.environ.get('XDG_DATA_HOME') or os.path.expanduser(os.path.join('~', '.local', 'share'))
+    return os.path.join(base, APP_NAME)
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def verify_wheelhouse(wheelhouse, log=print):
+    """Check every file listed in the manifest against its SHA-256 hash"""
+    with open(os.path.join(wheelhouse, WHEELHOUSE_MANIFEST)) as f:
+        files = json.load(f).get('files', {})
+    if not files:
+        log("✗ Wheelhouse manifest lists no files; recreate it with the 'wheelhouse' command")
+        return False
+    bad = []
+    for name, expected in files.items():
+        path = os.path.join(wheelhouse, name)
+        if not os.path.isfile(path):
+            bad.append(f"{name} (missing)")
+        elif file_sha256(path) != expected:
+            bad.append(f"{name} (hash mismatch)")
+    if bad:
+        log(f"✗ Wheelhouse failed verification: {', '.join(bad)}")
+        return False
+    log(f"✓ Verified {len(files)} wheelhouse files")
+    return True
+
+def read_requirements(path=REQUIREMENTS_PATH):
+    """Parse requirements.txt into (name, operator, version) tuples"""
+    import re
+    
+    requirements = []
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if not line or line.startswith('-'):
+                    continue
+                match = re.match(r'^([A-Za-z0-9_.\-]+)\s*(==|>=|<=|~=|>|<)?\s*([^\s;]*)', line)
+                if match:
+                    requirements.append((match.group(1), match.group(2) or '', match.group(3) or ''))
+    
+    if not requirements:
+        requirements = [(module, '', '') for module in REQUIRED_MODULES]
+    return requirements
+
+def parse_version(version):
+    """Turn a version string into a comparable tuple of integers"""
+    import re
+    parts = []
+    for part in version.split('.'):
+        match = re.match(r'\d+', part)
+        if not match:
+            break
+        parts.append(int(match.group()))
+    return tuple(parts)
+
+def version_satisfies(installed, operator, required):
+    """Check an installed version against a single requirement specifier"""
+    if not operator:
+        return True
+    
+    have, want = parse_version(installed), parse_version(required)
+    length = max(len(have), len(want))
+    have += (0,) * (length - len(have))
+    want += (0,) * (length - len(want))
+    
+    if operator == '==':
+        return have == want
+    if operator == '>=':
+        return have >= want
+    if operator == '<=':
+        return have <= want
+    if operator == '>':
+        return have > want
+    if operator == '<':
+        return have < want
+    if operator == '~=':
+        prefix = parse_version(required)[:-1]
+        return have >= want and have[:len(prefix)] == prefix
+    return True
+
+def distribution_import_names():
+    """Map normalised distribution names to the top-level modules they provide"""
+    from importlib import metadata
+    
+    import_names = {}
+    for module, distributions in metadata.packages_distributions().items():
+        for distribution in distributions:
+            key = distribution.lower().replace('_', '-')
+            import_names.setdefault(key, []).append(module)
+    return import_names
+
+def check_requirements(requirements=None):
+    """Resolve requirements against installed distributions without importing them
+    
+    Returns (satisfied, missing) where satisfied holds (name, version, import
+    names) and missing holds (requirement spec, reason).
+    """
+    from importlib import metadata, util
+    
+    requirements = requirements or read_requirements()
+    import_names = distribution_import_names()
+    satisfied, missing = [], []
+    
+    for name, operator, version in requirements:
+        spec = f"{name}{operator}{version}"
+        try:
+            installed = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            missing.append((spec, "not installed"))
+            continue
+        
+        if not version_satisfies(installed, operator, version):
+            missing.append((spec, f"version {installed} installed"))
+            continue
+        
+        # Make sure the distribution's modules can actually be found
+        modules = [m for m in import_names.get(name.lower().replace('_', '-'), []) if not m.startswith('_')]
+        if modules and not any(util.find_spec(module) for module in modules):
+            missing.append((spec, "installed but not importable"))
+            continue
+        
+        satisfied.append((name, installed, modules))
+    
+    return satisfied, missing
+
+def install_requirements(wheelhouse=None, log=print):
+    """Install every missing requirement in a single pip invocation
+    
+    With a wheelhouse (directory or archive made by the 'wheelhouse' command)
+    pip runs with --no-index and the bundled ChromeDriver is installed too.
+    """
+    import time
+    import shutil
+    import tempfile
+    
+    temp_dir = None
+    try:
+        if wheelhouse and os.path.isfile(wheelhouse):
+            temp_dir = tempfile.mkdtemp(prefix="autobrightspace-wheelhouse-")
+            log(f"Extracting wheelhouse archive {os.path.basename(wheelhouse)}...")
+            shutil.unpack_archive(wheelhouse, temp_dir)
+            entries = os.listdir(temp_dir)
+            wheelhouse = os.path.join(temp_dir, entries[0]) if len(entries) == 1 else temp_dir
+        
+        if wheelhouse and not os.path.exists(os.path.join(wheelhouse, WHEELHOUSE_MANIFEST)):
+            log(f"✗ Not a wheelhouse: {wheelhouse}")
+            return False
+        if wheelhouse and not verify_wheelhouse(wheelhouse, log):
+            return False
+        
+        requirements_path = REQUIREMENTS_PATH
+        if wheelhouse and os.path.exists(os.path.join(wheelhouse, 'requirements.txt')):
+            requirements_path = os.path.join(wheelhouse, 'requirements.txt')
+        
+        start = time.perf_counter()
+        satisfied, missing = check_requirements(read_requirements(requirements_path))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        for name, version, modules in satisfied:
+            imports = f" (import {', '.join(modules)})" if modules else ""
+            log(f"✓ {name} {version} already installed{imports}")
+        
+        success = True
+        if not missing:
+            log(f"All dependencies satisfied (checked in {elapsed_ms:.0f} ms)")
+        else:
+            for spec, reason in missing:
+                log(f"✗ {spec}: {reason}")
+            
+            # Install everything that is missing in a single pip invocation
+            specs = [spec for spec, _ in missing]
+            cmd = [sys.executable, "-m", "pip", "install"]
+            if wheelhouse:
+                cmd += ["--no-index", "--find-links", wheelhouse]
+            log(f"Installing {' '.join(specs)}{' from wheelhouse' if wheelhouse else ''}...")
+            try:
+                subprocess.check_call(cmd + specs)
+                log(f"✓ Installed {len(specs)} dependencies successfully")
+            except subprocess.CalledProcessError as e:
+                log(f"✗ Failed to install dependencies: {e}")
+                success = False
+        
+        if wheelhouse:
+            success = install_bundled_driver(wheelhouse, log) and success
+        
+        return success
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+def install_bundled_driver(wheelhouse, log=print):
+    """Copy the pinned ChromeDriver from a wheelhouse into the user data directory"""
+    import shutil
+    
+    with open(os.path.join(wheelhouse, WHEELHOUSE_MANIFEST)) as f:
+        manifest = json.load(f)
+    
+    driver = manifest.get('chromedriver')
+    if not driver:
+        log("⚠ Wheelhouse contains no ChromeDriver")
+        return True
+    
+    if driver.get('platform') != platform.system().lower():
+        log(f"⚠ Wheelhouse ChromeDriver is for {driver.get('platform')}, skipping")
+        return True
+    
+    drivers_dir = os.path.join(user_data_dir(), 'drivers')
+    driver_path = os.path.join(drivers_dir, BUNDLED_DRIVER_NAME)
+    os.makedirs(drivers_dir, exist_ok=True)
+    shutil.copy2(os.path.join(wheelhouse, driver['path']), driver_path)
+    os.chmod(driver_path, 0o755)
+    log(f"✓ Installed ChromeDriver {driver.get('version', '')}: {driver_path}")
+    return True
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Install AutoBrightspace dependencies, optionally offline')
+    parser.add_argument('mode', nargs='?', choices=['install'], help=argparse.SUPPRESS)
+    parser.add_argument('--wheelhouse', metavar='PATH',
+                        help='install offline from this wheelhouse directory or archive')
+    args, _ = parser.parse_known_args(argv)
+    return 0 if install_requirements(args.wheelhouse) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+SSO session reuse for AutoBrightspace
+
+After a successful login the Brightspace and IdP cookies are stored,
+encrypted, in the user data directory. The next login first probes them:
+expired cookies are rejected locally, the rest with a single HEAD request
+to Brightspace that does not follow redirects. If the session is still
+live, the browser is given the cookies before its first navigation and
+opens Brightspace directly, skipping the whole IdP chain.
+"""
+
+import os
+import json
+import time
+import http.client
+import http.cookies
+import email.utils
+import urllib.parse
+
+BRIGHTSPACE_HOST = 'brightspace.universiteitleiden.nl'
+PROBE_PATH = '/d2l/home'
+PROBE_TIMEOUT = 3.0
+# Cookies of these domains (and their subdomains) make up the session
+SESSION_DOMAINS = (
+    'universiteitleiden.nl',
+    'leidenuniv.nl',
+    'surfconext.nl',
+)
+# Fields Network.setCookies accepts from a Network.getAllCookies result
+COOKIE_FIELDS = ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'sameSite', 'expires')
+
+def domain_matches(cookie_domain, host):
+    """True if a cookie set for cookie_domain is sent to host"""
+    cookie_domain = cookie_domain.lstrip('.').lower()
+    return host == cookie_domain or host.endswith('.' + cookie_domain)
+
+def is_expired(cookie, now=None):
+    """True if a persistent cookie has passed its expiry; session cookies never are"""
+    expires = cookie.get('expires', -1)
+    return expires is not None and expires > 0 and expires <= (now or time.time())
+
+def cookie_params(cookies):
+    """Reduce DevTools cookies to what Network.setCookies accepts"""
+    params = []
+    for cookie in cookies:
+        param = {field: cookie[field] for field in COOKIE_FIELDS if field in cookie}
+        if param.get('expires', -1) <= 0:
+            param.pop('expires', None)  # Session cookie
+        params.append(param)
+    return params
+
+def apply_set_cookies(cookies, host, set_cookie_headers):
+    """Update cookies in place from Set-Cookie headers sent by host; returns True if any changed
+
+    Only cookies already in the list are updated, so a response can renew
+    the session but never add to it.
+    """
+    changed = False
+    for header in set_cookie_headers:
+        parsed = http.cookies.SimpleCookie()
+        try:
+            parsed.load(header)
+        except http.cookies.CookieError:
+            continue
+        for name, morsel in parsed.items():
+            for cookie in cookies:
+                if cookie['name'] == name and domain_matches(cookie.get('domain', ''), host):
+                    cookie['value'] = morsel.value
+                    if morsel['max-age']:
+                        cookie['expires'] = time.time() + int(morsel['max-age'])
+                    elif morsel['expires']:
+                        cookie['expires'] = email.utils.parsedate_to_datetime(morsel['expires']).timestamp()
+                    changed = True
+    return changed
+
+class ProbeResult:
+    """Outcome of a session probe"""
+
+    def __init__(self, status, reason='', elapsed_ms=0.0, cookies=None):
+        self.status = status      # valid, missing, expired, rejected or error
+        self.reason = reason
+        self.elapsed_ms = elapsed_ms
+        self.cookies = cookies or []
+
+    @property
+    def valid(self):
+        return self.status == 'valid'
+
+    def describe(self):
+        if self.valid:
+            return f"✓ Stored session is still valid ({self.reason}, {self.elapsed_ms:.0f} ms)"
+        if self.status == 'missing':
+            return "No stored session; full login needed"
+        return f"Stored session not usable ({self.status}: {self.reason}); full login needed"
+
+class SessionStore:
+    """Encrypted on-disk store of the SSO session cookies"""
+
+    def __init__(self, path, encrypt, decrypt):
+        self.path = path
+        self.encrypt = encrypt
+        self.decrypt = decrypt
+
+    def save(self, cookies):
+        """Store the session cookies among cookies; returns how many were kept"""
+        kept = [cookie for cookie in cookies
+                if any(domain_matches(domain, cookie.get('domain', '').lstrip('.').lower())
+                       for domain in SESSION_DOMAINS)]
+        if not kept:
+            return 0
+        data = json.dumps({'saved': time.time(), 'cookies': kept})
+        try:
+            with os.fdopen(os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+                f.write(self.encrypt(data))
+        except OSError:
+            return 0
+        return len(kept)
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.loads(self.decrypt(f.read()))
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def load(self):
+        """Return the stored cookies, or [] if there are none or they cannot be read"""
+        return self._read().get('cookies', [])
+
+    def saved_at(self):
+        """When the stored session was saved, or None"""
+        return self._read().get('saved')
+
+    def merge(self, host, set_cookie_headers):
+        """Apply a response's Set-Cookie headers for host to the stored cookies"""
+        data = self._read()
+        cookies = data.get('cookies', [])
+        changed = apply_set_cookies(cookies, host, set_cookie_headers)
+        if changed:
+            data['cookies'] = cookies
+            try:
+                with os.fdopen(os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+                    f.write(self.encrypt(json.dumps(data)))
+            except OSError:
+                pass
+        return changed
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def probe(self, host=BRIGHTSPACE_HOST, path=PROBE_PATH, timeout=PROBE_TIMEOUT):
+        """Decide whether the stored session still logs in to Brightspace"""
+        start = time.perf_counter()
+
+        def result(status, reason, cookies=None):
+            return ProbeResult(status, reason, (time.perf_counter() - start) * 1000, cookies)
+
+        cookies = self.load()
+        if not cookies:
+            return result('missing', 'no cookies stored')
+        live = [cookie for cookie in cookies if not is_expired(cookie)]
+        sent = [cookie for cookie in live if domain_matches(cookie.get('domain', ''), host)]
+        if not sent:
+            return result('expired', f"no unexpired cookies for {host}")
+
+        header = '; '.join(f"{cookie['name']}={cookie['value']}" for cookie in sent)
+        connection = http.client.HTTPSConnection(host, timeout=timeout)
+        try:
+            connection.request('HEAD', path, headers={'Cookie': header, 'User-Agent': 'AutoBrightspace'})
+            response = connection.getresponse()
+            status, location = response.status, response.getheader('Location', '')
+            set_cookies = response.msg.get_all('Set-Cookie') or []
+        except (OSError, http.client.HTTPException) as e:
+            return result('error', str(e) or type(e).__name__)
+        finally:
+            connection.close()
+
+        if 200 <= status < 300 or (status in (301, 302, 303, 307, 308) and
+                                   not is_login_redirect(location, host)):
+            if set_cookies and self.merge(host, set_cookies):
+                live = [cookie for cookie in self.load() if not is_expired(cookie)]
+            reason = f"HEAD {status}" + (f" to {urllib.parse.urlparse(location).path or '/'}" if location else '')
+            return result('valid', reason, live)
+        return result('rejected', f"HEAD {status}" + (f" to {location}" if location else ''))
+
+def is_login_redirect(location, host=BRIGHTSPACE_HOST):
+    """True if a redirect sends an unauthenticated visitor to a login page"""
+    target = urllib.parse.urlparse(urllib.parse.urljoin(f"https://{host}/", location))
+    return target.hostname != host or '/login' in target.path.lower()
@@ -0,0 +1,504 @@
+"""
+Local stand-in for the SSO hosts and the Brightspace API
+
+An HTTPS server on 127.0.0.1 that answers for every SSO host name with a
+throwaway self-signed certificate and an injected delay before each TLS
+handshake, standing in for the network round trips of a real handshake.
+It lets connection handling be measured and compared without the real
+servers: `python AutoBrightSpace.py prewarm --benchmark` runs the login's
+own preparation and pre-warming against it (see routed_to) and times the
+host chain with each pre-warm mode.
+
+With the StandInBrightspace handler it serves a few fake courses through
+the Valence API paths the sync command uses. `python stand_in_idp.py
+--port 8443` runs it over plain HTTP, for
+`python AutoBrightSpace.py sync --base-url http://127.0.0.1:8443`.
+"""
+
+import os
+import re
+import ssl
+import json
+import time
+import socket
+import hashlib
+import asyncio
+import contextlib
+import concurrent.futures
+import datetime
+import tempfile
+import threading
+import email.utils
+import http.client
+import urllib.parse
+
+# Pre-warm modes the benchmark compares; 'off' is a cold login
+BENCHMARK_MODES = ('off', 'tls', 'preconnect')
+
+def static_page(method, path, headers):
+    """Default handler: the same small page for every request"""
+    return 200, {'Content-Type': 'text/html'}, b'<html><body>stand-in</body></html>'
+
+class StandInServer:
+    """HTTP(S) server with an injected handshake latency, for local measurements
+
+    handler(method, target, headers) returns (status, headers, body) for
+    each request; headers passed to it have lower-cased names.
+    """
+
+    def __init__(self, hosts, handshake_latency=0.1, handler=static_page, tls=True, port=0):
+        self.hosts = list(hosts)
+        self.handshake_latency = handshake_latency
+        self.handler = handler
+        self.tls = tls
+        self.port = port
+        self.handshakes = 0
+        self.requests = 0
+        self._sock = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._cert_dir = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def base_url(self):
+        return f"{'https' if self.tls else 'http'}://127.0.0.1:{self.port}"
+
+    def start(self):
+        """Generate a certificate for the hosts if serving TLS and start listening"""
+        if self.tls:
+            self._cert_dir = tempfile.mkdtemp(prefix='autobrightspace-idp-')
+            cert_path, key_path = generate_certificate(self.hosts, self._cert_dir)
+            self.server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            self.server_context.load_cert_chain(cert_path, key_path)
+            self.client_context = ssl.create_default_context(cafile=cert_path)
+
+        self._sock = socket.create_server(('127.0.0.1', self.port))
+        self.port = self._sock.getsockname()[1]
+        threading.Thread(target=self._accept_loop, name='stand-in-idp', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._sock:
+            self._sock.close()
+        if self._cert_dir:
+            for name in os.listdir(self._cert_dir):
+                os.remove(os.path.join(self._cert_dir, name))
+            os.rmdir(self._cert_dir)
+            self._cert_dir = None
+
+    def connect(self, host, timeout=10):
+        """Open a TLS connection to the stand-in as if it were host"""
+        raw = socket.create_connection(('127.0.0.1', self.port), timeout=timeout)
+        raw.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return self.client_context.wrap_socket(raw, server_hostname=host)
+
+    def _accept_loop(self):
+        while not self._stopped.is_set():
+            try:
+                connection, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection):
+        try:
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            time.sleep(self.handshake_latency)
+            stream = connection
+            if self.tls:
+                stream = self.server_context.wrap_socket(connection, server_side=True)
+            with self._lock:
+                self.handshakes += 1
+            reader = stream.makefile('rb')
+            while True:
+                request = reader.readline()
+                if not request.strip():
+                    break
+                method, target = (request.decode('latin-1').split() + ['', ''])[:2]
+                headers = {}
+                while True:
+                    header = reader.readline()
+                    if not header.strip():
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0) or 0)
+                if length:
+                    reader.read(length)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                with self._lock:
+                    self.requests += 1
+
+                status, response_headers, body = self.handler(method, target, headers)
+                head = [f"HTTP/1.1 {status} {http.client.responses.get(status, 'Unknown')}",
+                        f"Date: {email.utils.formatdate(usegmt=True)}"]
+                head += [f"{name}: {value}" for name, value in response_headers.items()]
+                head += [f"Content-Length: {len(body)}",
+                         f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                stream.sendall(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') +
+                               (b'' if method == 'HEAD' else body))
+                if not keep_alive:
+                    break
+        except (OSError, ssl.SSLError, ValueError):
+            pass
+        finally:
+            connection.close()
+
+def generate_certificate(hosts, directory):
+    """Write a self-signed certificate and key for hosts; returns their paths"""
+    from cryptography import x509
+    from cryptography.x509.oid import NameOID
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'AutoBrightspace stand-in IdP')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName(host) for host in hosts]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+
+    cert_path = os.path.join(directory, 'cert.pem')
+    key_path = os.path.join(directory, 'key.pem')
+    with open(cert_path, 'wb') as f:
+        f.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, 'wb') as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path
+
+def fetch(connection, host):
+    """Send one GET over an open connection and read the whole response"""
+    connection.sendall(f"GET / HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+    reader = connection.makefile('rb')
+    length = 0
+    while True:
+        line = reader.readline()
+        if not line.strip():
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    reader.read(length)
+
+class StandInBrowser:
+    """Stands in for Chrome in the benchmark, visiting hosts over the stand-in
+
+    execute_script takes the place of driver.execute_script for
+    login_orchestrator.preconnect: every hinted origin gets a connection
+    opened in the background, and the next visit to that host reuses it, as
+    Chrome does with preconnect hints. Without a hint a visit pays its own
+    handshake.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self._preconnects = {}
+
+    def execute_script(self, script, origins):
+        for origin in origins:
+            host = urllib.parse.urlsplit(origin).hostname
+            if host in self._preconnects:
+                continue
+            future = concurrent.futures.Future()
+
+            def open_connection(host=host, future=future):
+                try:
+                    future.set_result(self.server.connect(host))
+                except OSError as e:
+                    future.set_exception(e)
+
+            self._preconnects[host] = future
+            threading.Thread(target=open_connection, daemon=True).start()
+        return len(origins)
+
+    def visit(self, host):
+        """Load a page from host, over a preconnected connection if there is one"""
+        future = self._preconnects.pop(host, None)
+        try:
+            connection = future.result() if future else self.server.connect(host)
+        except OSError:
+            connection = self.server.connect(host)
+        try:
+            fetch(connection, host)
+        finally:
+            connection.close()
+
+    def close(self):
+        for future in self._preconnects.values():
+            try:
+                future.result().close()
+            except OSError:
+                pass
+        self._preconnects.clear()
+
+@contextlib.contextmanager
+def routed_to(server):
+    """Send connections to the server's hosts to the stand-in instead
+
+    While active, asyncio.open_connection and socket.getaddrinfo resolve
+    those hosts to the stand-in and trust its certificate for them, so
+    login_orchestrator's own warm-up code runs unchanged against it.
+    Other hosts are not affected.
+    """
+    hosts = set(server.hosts)
+    original_open_connection, original_getaddrinfo = asyncio.open_connection, socket.getaddrinfo
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        return original_getaddrinfo('127.0.0.1' if host in hosts else host, port, *args, **kwargs)
+
+    async def open_connection(host=None, port=None, **kwargs):
+        if host in hosts:
+            if kwargs.get('ssl'):
+                kwargs.update(ssl=server.client_context, server_hostname=host)
+            host, port = '127.0.0.1', server.port
+        return await original_open_connection(host, port, **kwargs)
+
+    asyncio.open_connection, socket.getaddrinfo = open_connection, getaddrinfo
+    try:
+        yield
+    finally:
+        asyncio.open_connection, socket.getaddrinfo = original_open_connection, original_getaddrinfo
+
+def replay_login(server, plan, driver_start):
+    """Prepare a login with a pre-warm plan and visit the hosts in order; returns elapsed ms
+
+    This is the login flow's own path: prepare_login warms the plan's hosts
+    while a simulated driver starts, then preconnect() hands the plan's
+    hints to the stand-in browser. Only the browser's connections serve the
+    visits, so a host warmed in 'tls' mode still costs a handshake.
+    """
+    from login_orchestrator import prepare_login, preconnect, shared_event_loop
+
+    browser = StandInBrowser(server)
+
+    def start_driver():
+        time.sleep(driver_start)
+        return browser
+
+    loop = shared_event_loop()
+    with routed_to(server):
+        start = time.perf_counter()
+        prepared = loop.run(prepare_login(start_driver, hosts=plan, log=lambda message: None))
+        preconnect(browser.execute_script, plan)
+        try:
+            for host in server.hosts:
+                browser.visit(host)
+        finally:
+            browser.close()
+        elapsed = (time.perf_counter() - start) * 1000
+        if prepared.warm_task:
+            loop.run(asyncio.wait([prepared.warm_task]))  # Not to outlive the routing
+    return elapsed
+
+def benchmark(hosts, handshake_latency=0.15, driver_start=1.0, rounds=5, log=print):
+    """Time the login's host chain per pre-warm mode; returns {mode: median ms}"""
+    hosts = list(hosts)
+    log(f"Stand-in IdP: {len(hosts)} hosts, {handshake_latency * 1000:.0f} ms handshake latency, "
+        f"{driver_start * 1000:.0f} ms simulated driver start, {rounds} rounds")
+    results = {mode: [] for mode in BENCHMARK_MODES}
+    with StandInServer(hosts, handshake_latency) as server:
+        for _ in range(rounds):
+            for mode in BENCHMARK_MODES:
+                plan = {} if mode == 'off' else dict.fromkeys(hosts, mode)
+                results[mode].append(replay_login(server, plan, driver_start))
+
+    medians = {mode: sorted(times)[len(times) // 2] for mode, times in results.items()}
+    cold = medians['off']
+    for mode, ms in medians.items():
+        saved = '' if mode == 'off' else f"  ({cold - ms:.0f} ms saved)"
+        log(f"  {'no pre-warm' if mode == 'off' else mode:<12}{ms:>7.0f} ms{saved}")
+    saved = cold - medians['preconnect']
+    log(f"⚡ Preconnect saved {saved:.0f} ms ({saved / cold * 100:.0f}%) per login; "
+        f"tls only checks reachability and the clock, the browser still pays each handshake")
+    return medians
+
+def api_date(timestamp):
+    """A timestamp in the API's date format"""
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+def demo_courses():
+    """Two courses with nested modules and a few files of known content"""
+    def topic(topic_id, title, filename, size, modified):
+        data = (f"{title}\n".encode() * (size // (len(title) + 1) + 1))[:size]
+        return {'id': topic_id, 'title': title, 'filename': filename, 'data': data, 'modified': modified}
+
+    return {
+        6605: {'name': 'Algorithms and Data Structures', 'code': '4031ADS',
+               'modules': [
+                   {'id': 1, 'title': 'Week 1', 'modules': [], 'topics': [
+                       topic(11, 'Lecture 1 slides', 'lecture1.pdf', 300_000, 1_700_000_000),
+                       topic(12, 'Exercises 1', 'exercises1.pdf', 40_000, 1_700_000_100)]},
+                   {'id': 2, 'title': 'Week 2', 'topics': [
+                       topic(21, 'Lecture 2 slides', 'lecture2.pdf', 250_000, 1_700_600_000)],
+                    'modules': [
+                        {'id': 3, 'title': 'Extra material', 'modules': [], 'topics': [
+                            topic(31, 'Reading', 'reading.pdf', 120_000, 1_700_600_100)]}]}],
+               'news': [{'id': 101, 'title': 'Welcome to the course', 'body': 'Lectures start on Monday.',
+                         'date': 1_699_900_000}],
+               'assignments': [{'id': 201, 'name': 'Assignment 1: Sorting', 'due': 1_701_500_000},
+                               {'id': 202, 'name': 'Assignment 2: Graphs', 'due': None}]},
+        6606: {'name': 'Linear Algebra', 'code': '4032LA',
+               'modules': [
+                   {'id': 4, 'title': 'Lectures', 'modules': [], 'topics': [
+                       topic(41, 'Lecture notes', 'notes.pdf', 500_000, 1_701_000_000),
+                       topic(42, 'Syllabus', 'syllabus.docx', 20_000, 1_699_000_000)]}],
+               'news': [],
+               'assignments': [{'id': 203, 'name': 'Homework 1', 'due': 1_701_800_000}]},
+    }
+
+class StandInBrightspace:
+    """Handler serving a fake Valence API from a dict of courses
+
+    Enrollments are paged (page_size items per page), files support Range
+    and If-Range, and each course has announcements and assignment folders
+    that tests can add to while the server runs. If require_cookie is set, requests without that cookie
+    name are redirected to the login page like an expired session.
+    """
+
+    def __init__(self, courses=None, page_size=1, require_cookie=None):
+        self.courses = courses if courses is not None else demo_courses()
+        self.page_size = page_size
+        self.require_cookie = require_cookie
+        self.log = []               # (method, path, status) of every request
+        self._lock = threading.Lock()
+
+    def topics(self, org_unit):
+        """Yield every topic of a course, depth first"""
+        stack = list(reversed(self.courses[org_unit]['modules']))
+        while stack:
+            module = stack.pop()
+            yield from module['topics']
+            stack.extend(reversed(module.get('modules', [])))
+
+    def __call__(self, method, target, headers):
+        status, response_headers, body = self._route(method, target, headers)
+        with self._lock:
+            self.log.append((method, target, status))
+        return status, response_headers, body
+
+    def _route(self, method, target, headers):
+        path, _, query = target.partition('?')
+        params = urllib.parse.parse_qs(query)
+        if self.require_cookie and f"{self.require_cookie}=" not in headers.get('cookie', ''):
+            return 302, {'Location': '/d2l/login?sessionExpired=1'}, b''
+
+        if re.fullmatch(r'/d2l/api/lp/[\d.]+/enrollments/myenrollments/?', path):
+            return self._enrollments(params, headers)
+        match = re.fullmatch(r'/d2l/api/le/[\d.]+/(\d+)/content/toc', path)
+        if match and int(match.group(1)) in self.courses:
+            return self._json({'Modules': [self._module(module) for module in
+                                           self.courses[int(match.group(1))]['modules']]}, headers)
+        match = re.fullmatch(r'/d2l/api/le/[\d.]+/(\d+)/news/?', path)
+        if match and int(match.group(1)) in self.courses:
+            return self._json([{
+                'Id': item['id'], 'Title': item['title'], 'IsHidden': False, 'IsPublished': True,
+                'Body': {'Text': item['body'], 'Html': f"<p>{item['body']}</p>"},
+                'StartDate': api_date(item['date']),
+            } for item in self.courses[int(match.group(1))].get('news', [])], headers)
+        match = re.fullmatch(r'/d2l/api/le/[\d.]+/(\d+)/dropbox/folders/?', path)
+        if match and int(match.group(1)) in self.courses:
+            return self._json([{
+                'Id': folder['id'], 'Name': folder['name'], 'IsHidden': False,
+                'DueDate': api_date(folder['due']) if folder['due'] else None,
+            } for folder in self.courses[int(match.group(1))].get('assignments', [])], headers)
+        match = re.fullmatch(r'/d2l/api/le/[\d.]+/(\d+)/content/topics/(\d+)/file', path)
+        if match and int(match.group(1)) in self.courses:
+            for topic in self.topics(int(match.group(1))):
+                if topic['id'] == int(match.group(2)):
+                    return self._file(topic, headers)
+        return 404, {'Content-Type': 'application/json'}, b'{"Errors": [{"Message": "Not Found"}]}'
+
+    @staticmethod
+    def _json(value, headers):
+        """A JSON response with an ETag, or 304 if the request's If-None-Match has it"""
+        body = json.dumps(value).encode()
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        response_headers = {'Content-Type': 'application/json', 'ETag': etag,
+                            'Cache-Control': 'private, no-cache'}
+        if etag in [tag.strip() for tag in headers.get('if-none-match', '').split(',')]:
+            return 304, response_headers, b''
+        return 200, response_headers, body
+
+    def _enrollments(self, params, headers):
+        ids = sorted(self.courses)
+        start = int(params.get('bookmark', ['0'])[0] or 0)
+        page = ids[start:start + self.page_size]
+        items = [{'OrgUnit': {'Id': ou, 'Type': {'Id': 3, 'Code': 'Course Offering'},
+                              'Name': self.courses[ou]['name'], 'Code': self.courses[ou]['code']},
+                  'Access': {'IsActive': True, 'CanAccess': True}} for ou in page]
+        more = start + self.page_size < len(ids)
+        return self._json({'PagingInfo': {'Bookmark': str(start + self.page_size) if more else '',
+                                          'HasMoreItems': more},
+                           'Items': items}, headers)
+
+    def _module(self, module):
+        return {
+            'ModuleId': module['id'],
+            'Title': module['title'],
+            'Modules': [self._module(child) for child in module.get('modules', [])],
+            'Topics': [{
+                'TopicId': topic['id'],
+                'Identifier': str(topic['id']),
+                'TypeIdentifier': 'File',
+                'Title': topic['title'],
+                'Url': f"/content/enforced/{module['id']}/{topic['filename']}",
+                'LastModifiedDate': api_date(topic['modified']),
+            } for topic in module['topics']],
+        }
+
+    def _file(self, topic, headers):
+        data = topic['data']
+        etag = '"' + hashlib.sha1(data).hexdigest()[:16] + '"'
+        last_modified = email.utils.formatdate(topic['modified'], usegmt=True)
+        response_headers = {
+            'Content-Type': 'application/octet-stream',
+            'Content-Disposition': f'attachment; filename="{topic["filename"]}"',
+            'ETag': etag,
+            'Last-Modified': last_modified,
+            'Accept-Ranges': 'bytes',
+        }
+        match = re.fullmatch(r'bytes=(\d+)-(\d*)', headers.get('range', ''))
+        if_range = headers.get('if-range')
+        if match and (if_range is None or if_range in (etag, last_modified)):
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else len(data) - 1, len(data) - 1)
+            if start >= len(data):
+                return 416, {'Content-Range': f"bytes */{len(data)}"}, b''
+            response_headers['Content-Range'] = f"bytes {start}-{end}/{len(data)}"
+            return 206, response_headers, data[start:end + 1]
+        return 200, response_headers, data
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve a stand-in Brightspace API over plain HTTP")
+    parser.add_argument('--port', type=int, default=8443, help='port to listen on (default: 8443)')
+    args = parser.parse_args()
+
+    with StandInServer(['127.0.0.1'], handler=StandInBrightspace(), tls=False, port=args.port) as server:
+        print(f"Stand-in Brightspace at {server.base_url} (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main()
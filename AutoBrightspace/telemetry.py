@@ -0,0 +1,322 @@
+"""
+Login telemetry for AutoBrightspace
+
+Every login attempt (GUI or CLI) is appended to a local SQLite database with
+its outcome branch and per-stage timings. `python AutoBrightSpace.py stats`
+summarises the store as latency percentiles per stage and success rate over
+time, so changes to the login flow can be judged against real numbers.
+CommandRecorder adds the number and latency of WebDriver round trips.
+"""
+
+import time
+import sqlite3
+import datetime
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logins (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started REAL NOT NULL,
+    frontend TEXT NOT NULL,
+    branch TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    total_ms REAL NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS stages (
+    login_id INTEGER NOT NULL REFERENCES logins(id),
+    stage TEXT NOT NULL,
+    duration_ms REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    login_id INTEGER NOT NULL REFERENCES logins(id),
+    name TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS keepalive (
+    at REAL NOT NULL,
+    host TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    idle_s REAL,
+    session_age_s REAL,
+    interval_s REAL
+);
+CREATE INDEX IF NOT EXISTS logins_started ON logins(started);
+"""
+
+# Outcome branches of a login attempt
+SUCCESS_BRANCHES = ('already_logged_in', 'session_restored', 'mfa', 'surfconext+mfa')
+
+def percentile(values, pct):
+    """Return the pct-th percentile of values using linear interpolation"""
+    values = sorted(values)
+    if not values:
+        return 0.0
+    rank = (len(values) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+class LoginTrace:
+    """Stage timings and outcome of one login attempt"""
+
+    def __init__(self, frontend):
+        self.frontend = frontend
+        self.started = time.time()
+        self.start_counter = time.perf_counter()
+        self.last_mark = self.start_counter
+        self.stages = []
+        self.metrics = {}
+        self.branch = None
+        self.success = False
+        self.error = None
+        self.total_ms = None
+
+    def stage(self, name):
+        """Mark the end of a stage; its duration runs from the previous mark"""
+        now = time.perf_counter()
+        self.stages.append((name, (now - self.last_mark) * 1000))
+        self.last_mark = now
+
+    def count(self, name, value=1):
+        """Add to a per-login counter such as round trips saved"""
+        self.metrics[name] = self.metrics.get(name, 0) + value
+
+    def finish(self, branch, error=None):
+        """Record the outcome; only the first call counts"""
+        if self.branch is not None:
+            return False
+        self.branch = branch
+        self.success = branch in SUCCESS_BRANCHES
+        self.error = error
+        self.total_ms = (time.perf_counter() - self.start_counter) * 1000
+        return True
+
+class TelemetryStore:
+    """Append-only SQLite store of login traces"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5)
+        connection.executescript(SCHEMA)
+        return connection
+
+    def record(self, trace):
+        """Append a finished trace; telemetry failures never break a login"""
+        try:
+            with self._connect() as connection:
+                cursor = connection.execute(
+                    "INSERT INTO logins (started, frontend, branch, success, total_ms, error) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (trace.started, trace.frontend, trace.branch, int(trace.success),
+                     trace.total_ms, trace.error))
+                connection.executemany(
+                    "INSERT INTO stages (login_id, stage, duration_ms) VALUES (?, ?, ?)",
+                    [(cursor.lastrowid, name, ms) for name, ms in trace.stages])
+                connection.executemany(
+                    "INSERT INTO metrics (login_id, name, value) VALUES (?, ?, ?)",
+                    [(cursor.lastrowid, name, value) for name, value in trace.metrics.items()])
+            connection.close()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def stage_latencies(self, since=0):
+        """Return {stage: [duration_ms, ...]} including a 'total' pseudo-stage"""
+        latencies = {}
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT s.stage, s.duration_ms FROM stages s JOIN logins l ON l.id = s.login_id "
+                "WHERE l.started >= ? ORDER BY s.rowid", (since,)).fetchall()
+            rows += [('total', ms) for (ms,) in connection.execute(
+                "SELECT total_ms FROM logins WHERE started >= ? AND success = 1", (since,))]
+        connection.close()
+        for stage, ms in rows:
+            latencies.setdefault(stage, []).append(ms)
+        return latencies
+
+    def metric_averages(self, since=0):
+        """Return [(name, logins, mean value)] for the per-login counters"""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT m.name, COUNT(*), AVG(m.value) FROM metrics m JOIN logins l ON l.id = m.login_id "
+                "WHERE l.started >= ? GROUP BY m.name ORDER BY m.name", (since,)).fetchall()
+        connection.close()
+        return rows
+
+    def branch_counts(self, since=0):
+        """Return [(branch, count)] ordered by frequency"""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT branch, COUNT(*) FROM logins WHERE started >= ? "
+                "GROUP BY branch ORDER BY COUNT(*) DESC", (since,)).fetchall()
+        connection.close()
+        return rows
+
+    def success_by_day(self, since=0):
+        """Return [(day, attempts, successes)] in chronological order"""
+        days = {}
+        with self._connect() as connection:
+            for started, success in connection.execute(
+                    "SELECT started, success FROM logins WHERE started >= ? ORDER BY started", (since,)):
+                day = datetime.date.fromtimestamp(started).isoformat()
+                attempts, successes = days.get(day, (0, 0))
+                days[day] = (attempts + 1, successes + success)
+        connection.close()
+        return [(day, attempts, successes) for day, (attempts, successes) in days.items()]
+
+    def record_refresh(self, host, outcome, idle_s=None, session_age_s=None, interval_s=None):
+        """Append one keep-alive refresh; outcome is alive, expired or error"""
+        try:
+            with self._connect() as connection:
+                connection.execute(
+                    "INSERT INTO keepalive (at, host, outcome, idle_s, session_age_s, interval_s) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (time.time(), host, outcome, idle_s, session_age_s, interval_s))
+            connection.close()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def expiry_gaps(self, limit=20):
+        """Idle seconds before the most recent refreshes that found the session expired"""
+        try:
+            with self._connect() as connection:
+                rows = connection.execute(
+                    "SELECT idle_s FROM keepalive WHERE outcome = 'expired' AND idle_s IS NOT NULL "
+                    "ORDER BY at DESC LIMIT ?", (limit,)).fetchall()
+            connection.close()
+        except sqlite3.Error:
+            return []
+        return [idle for (idle,) in rows]
+
+    def refresh_counts(self, since=0):
+        """Return [(host, outcome, count)] of keep-alive refreshes"""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT host, outcome, COUNT(*) FROM keepalive WHERE at >= ? "
+                "GROUP BY host, outcome ORDER BY host, outcome", (since,)).fetchall()
+        connection.close()
+        return rows
+
+    def session_lifetimes(self, since=0):
+        """Age in seconds of each session when a refresh found it expired"""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT session_age_s FROM keepalive WHERE at >= ? AND outcome = 'expired' "
+                "AND session_age_s IS NOT NULL", (since,)).fetchall()
+        connection.close()
+        return [age for (age,) in rows]
+
+def print_stats(store, days=30):
+    """Print latency percentiles per stage and success rate over time"""
+    since = time.time() - days * 86400
+    branches = store.branch_counts(since)
+    attempts = sum(count for _, count in branches)
+
+    print(f"=== Login Statistics (last {days} days) ===")
+    if not attempts:
+        print("No logins recorded yet. Run a login first.")
+        return
+
+    successes = sum(count for branch, count in branches if branch in SUCCESS_BRANCHES)
+    print(f"Attempts: {attempts}   Success rate: {successes / attempts * 100:.1f}%")
+
+    print("\nLatency per stage (ms):")
+    print(f"{'Stage':<20} {'n':>5} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for stage, values in store.stage_latencies(since).items():
+        print(f"{stage:<20} {len(values):>5} {percentile(values, 50):>9.0f} "
+              f"{percentile(values, 95):>9.0f} {percentile(values, 99):>9.0f}")
+
+    metrics = store.metric_averages(since)
+    if metrics:
+        print("\nPer-login counters (mean):")
+        for name, logins, mean in metrics:
+            print(f"  {name:<32} {mean:>9.1f}  ({logins} logins)")
+
+    print("\nOutcomes:")
+    for branch, count in branches:
+        print(f"  {branch:<20} {count:>5}  ({count / attempts * 100:.0f}%)")
+
+    print("\nSuccess rate by day:")
+    for day, day_attempts, day_successes in store.success_by_day(since):
+        rate = day_successes / day_attempts * 100
+        print(f"  {day}  {day_successes:>3}/{day_attempts:<3} {rate:5.1f}%  {'█' * round(rate / 10)}")
+
+    print_keepalive_stats(store, since)
+
+def print_keepalive_stats(store, since=0):
+    """Print the refresh hit rate per host and observed session lifetimes"""
+    counts = store.refresh_counts(since)
+    if not counts:
+        return
+    print("\nSession keep-alive:")
+    hosts = {}
+    for host, outcome, count in counts:
+        hosts.setdefault(host, {})[outcome] = count
+    for host, outcomes in hosts.items():
+        total = sum(outcomes.values())
+        alive = outcomes.get('alive', 0)
+        print(f"  {host:<40} {alive:>4}/{total:<4} refreshes hit a live session ({alive / total * 100:.0f}%)")
+    lifetimes = store.session_lifetimes(since)
+    if lifetimes:
+        print(f"  Session lifetime (min): p50 {percentile(lifetimes, 50) / 60:.0f}, "
+              f"min {min(lifetimes) / 60:.0f}, max {max(lifetimes) / 60:.0f} ({len(lifetimes)} sessions)")
+
+class CommandRecorder:
+    """Count and time every WebDriver command a driver sends to chromedriver"""
+
+    def __init__(self):
+        self.commands = {}
+        self._lock = threading.Lock()
+
+    def attach(self, driver):
+        """Wrap the driver's command executor; returns the recorder"""
+        executor = driver.command_executor
+        original = executor.execute
+
+        def execute(command, params):
+            start = time.perf_counter()
+            try:
+                return original(command, params)
+            finally:
+                self.add(command, (time.perf_counter() - start) * 1000)
+
+        executor.execute = execute
+        return self
+
+    def add(self, command, ms):
+        with self._lock:
+            self.commands.setdefault(command, []).append(ms)
+
+    def totals(self):
+        """Return (command count, total milliseconds)"""
+        with self._lock:
+            return (sum(len(times) for times in self.commands.values()),
+                    sum(sum(times) for times in self.commands.values()))
+
+    def histogram(self, width=20):
+        """Per-command count and latency lines, slowest total first"""
+        with self._lock:
+            rows = sorted(self.commands.items(), key=lambda item: sum(item[1]), reverse=True)
+        if not rows:
+            return []
+        longest = max(sum(times) for _, times in rows) or 1
+        lines = []
+        for command, times in rows:
+            total = sum(times)
+            bar = '█' * max(1, round(total / longest * width))
+            lines.append(f"{command:<24} {len(times):>4} × {total / len(times):>6.0f} ms "
+                         f"(p95 {percentile(times, 95):>5.0f}, total {total:>6.0f} ms) {bar}")
+        return lines
+
+    def add_to_trace(self, trace):
+        """Store the command counts and time as per-login telemetry counters"""
+        count, total = self.totals()
+        trace.count('webdriver.commands', count)
+        trace.count('webdriver.total_ms', round(total, 1))
+        with self._lock:
+            for command, times in self.commands.items():
+                trace.count(f'webdriver.{command}', len(times))